@@ -1,32 +1,115 @@
+import re
+
 from django.contrib import admin
-from .models import User, Book, BookIssue, Notification
+from django.db import transaction
+from .catalog_import import ISBN_STRIP_RE, InvalidRecord, normalize_isbn
+from .models import User, Book, BookIssue, Hold, Notification
+from .notifications import settle_unread
+from .pagination import EstimatedCountPaginator
+
+ISBN_TERM_RE = re.compile(r'^(?:\d{9}[\dX]|\d{13})$')
+
+
+def isbn_candidates(term):
+    """The stored forms an ISBN search term can match: as typed and as ISBN-13; empty if not an ISBN."""
+    isbn = ISBN_STRIP_RE.sub('', term).upper()
+    if not ISBN_TERM_RE.match(isbn):
+        return []
+    try:
+        return sorted({isbn, normalize_isbn(isbn)})
+    except InvalidRecord:
+        return [isbn]
+
+
+class LibraryAdmin(admin.ModelAdmin):
+    """
+    Changelists that stay fast on millions of rows.
+
+    Counts come from EstimatedCountPaginator, with no second count of the
+    whole table. A search for an email address or an ISBN is an exact match
+    on ``email_lookup`` or ``isbn_lookup``, which are unique indexes, instead
+    of ``icontains`` over every row; other terms go through ``search_fields``,
+    or with ``search_through`` set, through the admin search of that foreign
+    key's model as a ``<fk>__in`` subquery rather than a join of every row.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    email_lookup = None
+    isbn_lookup = None
+    search_through = None
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if self.email_lookup and '@' in term and ' ' not in term:
+            return queryset.filter(**{self.email_lookup: User.objects.normalize_email(term)}), False
+        isbns = isbn_candidates(term) if self.isbn_lookup else []
+        if isbns:
+            return queryset.filter(**{f'{self.isbn_lookup}__in': isbns}), False
+        if term and self.search_through:
+            related = self.model._meta.get_field(self.search_through).related_model
+            matches, _ = self.admin_site._registry[related].get_search_results(
+                request, related._default_manager.all(), search_term
+            )
+            return queryset.filter(**{f'{self.search_through}__in': matches.values('pk')}), False
+        return super().get_search_results(request, queryset, search_term)
+
 
 # Register your models here.
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(LibraryAdmin):
     list_display = ('email', 'first_name', 'last_name', 'user_type')
     list_filter = ('user_type',)
-    search_fields = ('email', 'first_name', 'last_name')
+    search_fields = ('first_name', 'last_name')
+    email_lookup = 'email'
     ordering = ('email',)
 
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(LibraryAdmin):
     list_display = ('title', 'author', 'isbn', 'publication_date', 'available_copies', 'total_copies')
     list_filter = ('publication_date',)
-    search_fields = ('title', 'author', 'isbn')
+    search_fields = ('title', 'author')
+    isbn_lookup = 'isbn'
     ordering = ('title',)
 
-class BookIssueAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Copies added by hand go to the hold queue first, like returned ones
+        obj.serve_holds()
+
+class BookIssueAdmin(LibraryAdmin):
     list_display = ('book', 'user', 'status', 'issue_date', 'due_date', 'return_date')
-    list_filter = ('status',)
-    search_fields = ('book__title', 'user__email')
-    date_hierarchy = 'request_date'
+    list_select_related = ('book', 'user')
+    # Range filters on the request_date index; date_hierarchy would list
+    # the distinct years and months of every loan on each page load
+    list_filter = ('status', ('request_date', admin.DateFieldListFilter))
+    # Title, author or ISBN, searched by BookAdmin
+    search_fields = ('book__title', 'book__author', 'book__isbn')
+    search_through = 'book'
+    email_lookup = 'user__email'
+    autocomplete_fields = ('book', 'user')
+
+class HoldAdmin(LibraryAdmin):
+    list_display = ('book', 'user', 'created_at')
+    list_select_related = ('book', 'user')
+    # Title, author or ISBN, searched by BookAdmin
+    search_fields = ('book__title', 'book__author', 'book__isbn')
+    search_through = 'book'
+    email_lookup = 'user__email'
+    autocomplete_fields = ('book', 'user')
 
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LibraryAdmin):
     list_display = ('user', 'message', 'created_at', 'is_read', 'notification_type')
-    list_filter = ('is_read', 'notification_type')
-    search_fields = ('user__email', 'message')
-    date_hierarchy = 'created_at'
+    list_select_related = ('user',)
+    list_filter = ('is_read', 'notification_type', ('created_at', admin.DateFieldListFilter))
+    search_fields = ('message',)
+    email_lookup = 'user__email'
+    autocomplete_fields = ('user', 'book_issue')
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            settle_unread(queryset)
+            super().delete_queryset(request, queryset)
 
 admin.site.register(User, UserAdmin)
 admin.site.register(Book, BookAdmin)
 admin.site.register(BookIssue, BookIssueAdmin)
+admin.site.register(Hold, HoldAdmin)
 admin.site.register(Notification, NotificationAdmin)
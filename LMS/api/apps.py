@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if getattr(settings, 'REQUEST_METRICS', False):
+            # Connect before any connection opens, so queries made from every
+            # thread (including async views' worker threads) are counted
+            from .metrics import connection_opened
+            connection_created.connect(connection_opened, dispatch_uid='api.metrics')
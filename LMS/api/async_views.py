@@ -0,0 +1,185 @@
+"""
+Async versions of the read-heavy endpoints, served in place of the DRF views
+when ``ASYNC_READ_VIEWS`` is set (see lms_project/settings_asgi.py).
+
+They return the same JSON as the DRF views and use the async ORM, so under
+an ASGI server only the queries themselves run in a worker thread, rather
+than the whole sync DRF view. Writes to the same URLs are handed to the DRF
+views.
+"""
+import asyncio
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, NotFound
+from rest_framework.request import Request
+
+from .authentication import SignedTokenAuthentication
+from .cache import STAFF_STATS_KEY, staff_stats_timeout
+from .models import User, Book, BookIssue, Notification
+from .notifications import NOTIFICATION_CHANNEL
+from .pagination import KeysetPagination
+from .pubsub import get_pubsub
+from .serializers import BookSerializer, BookIssueSerializer, NotificationSerializer
+from .views import (
+    BookViewSet, book_listing, book_payloads, catalog_totals, issue_stat_counts, member_stat_fields, staff_stats
+)
+
+
+async def aauthenticate(request):
+    """The token user if a Bearer token is sent, else the session user."""
+    auth = await SignedTokenAuthentication().aauthenticate(request)
+    if auth is not None:
+        return auth[0]
+    return await request.auser()
+
+
+def async_read_view(write_view=None):
+    """
+    Turn an async GET handler into a view that authenticates like the DRF
+    views and passes any other method to ``write_view``.
+    """
+    def decorator(handler):
+        @csrf_exempt
+        @functools.wraps(handler)
+        async def view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                if write_view is None:
+                    return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+                return await sync_to_async(write_view)(request, *args, **kwargs)
+
+            try:
+                user = await aauthenticate(request)
+            except AuthenticationFailed as e:
+                return JsonResponse({'detail': str(e.detail)}, status=403)
+            if not user.is_authenticated:
+                return JsonResponse({'detail': str(NotAuthenticated.default_detail)}, status=403)
+            request.user = user
+            return await handler(request, *args, **kwargs)
+        return view
+    return decorator
+
+
+async def paginated_response(request, queryset, serializer_class):
+    paginator = KeysetPagination()
+    page = await paginator.apaginate_queryset(queryset, Request(request))
+    if page is None:
+        items = [item async for item in queryset.aiterator()]
+        return JsonResponse(serializer_class(items, many=True).data, safe=False)
+    return JsonResponse(paginator.get_paginated_data(serializer_class(page, many=True).data))
+
+
+def cached_book_list(request):
+    """BookViewSet.list's response data, through the same listing and payload caches."""
+    page = book_listing(request, Book.objects.all(), KeysetPagination())
+    if page is None:
+        return BookSerializer(Book.objects.all(), many=True).data
+    return {'next': page['next'], 'previous': page['previous'], 'results': book_payloads(page['ids'])}
+
+
+@async_read_view(write_view=BookViewSet.as_view({'post': 'create'}))
+async def book_list(request):
+    # The book cache API is synchronous; hits cost no query either way
+    return JsonResponse(await sync_to_async(cached_book_list)(Request(request)), safe=False)
+
+
+@async_read_view(write_view=BookViewSet.as_view({
+    'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
+}))
+async def book_detail(request, pk):
+    payloads = await sync_to_async(book_payloads)([pk])
+    if not payloads:
+        return JsonResponse({'detail': str(NotFound.default_detail)}, status=404)
+    return JsonResponse(payloads[0])
+
+
+@async_read_view()
+async def my_issues(request):
+    queryset = BookIssue.objects.select_related('book', 'user').filter(user=request.user)
+    return await paginated_response(request, queryset, BookIssueSerializer)
+
+
+@async_read_view()
+async def notification_list(request):
+    queryset = Notification.objects.filter(user=request.user)
+    return await paginated_response(request, queryset, NotificationSerializer)
+
+
+@async_read_view()
+async def notification_stream(request):
+    """
+    Server-sent events stream of the user's new notifications.
+
+    Idle streams touch neither the database nor the cache: they wait on the
+    pub/sub channel that post_save and notify_bulk publish to. Reconnecting
+    clients send ``Last-Event-ID`` (or ``?since=<id>``) and get what they
+    missed with one query. Streams end after ``NOTIFICATION_STREAM_TIMEOUT``
+    seconds and EventSource reconnects, which re-checks the session.
+    """
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+    # Subscribe before the catch-up query so nothing created in between is lost
+    subscription = await get_pubsub().subscribe(NOTIFICATION_CHANNEL.format(request.user.pk))
+    response = StreamingHttpResponse(
+        notification_events(request.user, subscription, last_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def sse_event(notification):
+    return f"id: {notification['id']}\nevent: notification\ndata: {json.dumps(notification)}\n\n"
+
+
+async def notification_events(user, subscription, last_id):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.NOTIFICATION_STREAM_TIMEOUT
+    try:
+        yield 'retry: 5000\n\n'
+        if last_id is not None:
+            missed = Notification.objects.filter(user=user, pk__gt=last_id).order_by('pk')
+            async for notification in missed.aiterator():
+                last_id = notification.pk
+                yield sse_event(NotificationSerializer(notification).data)
+
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                message = await asyncio.wait_for(
+                    subscription.get(), min(settings.NOTIFICATION_STREAM_KEEPALIVE, remaining)
+                )
+            except asyncio.TimeoutError:
+                # Comment line; keeps proxies from closing an idle connection
+                yield ': keepalive\n\n'
+                continue
+            if last_id is None or message['id'] > last_id:
+                last_id = message['id']
+                yield sse_event(message)
+    finally:
+        await subscription.close()
+
+
+@async_read_view()
+async def dashboard_stats(request):
+    if request.user.user_type in ['STAFF', 'ADMIN']:
+        stats = await cache.aget(STAFF_STATS_KEY)
+        if stats is None:
+            stats = staff_stats(
+                await catalog_totals().afirst(),
+                await BookIssue.objects.aaggregate(**issue_stat_counts()),
+                await User.objects.filter(user_type='MEMBER').acount()
+            )
+            await cache.aset(STAFF_STATS_KEY, stats, staff_stats_timeout())
+        return JsonResponse(stats)
+
+    stats = await User.objects.filter(pk=request.user.pk).values(**member_stat_fields()).afirst()
+    return JsonResponse(stats)
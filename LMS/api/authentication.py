@@ -1,4 +1,10 @@
-from rest_framework.authentication import SessionAuthentication
+from django.conf import settings
+from django.core import signing
+from django.utils.crypto import constant_time_compare
+from rest_framework.authentication import BaseAuthentication, SessionAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from .backends import CachedModelBackend
 
 class CsrfExemptSessionAuthentication(SessionAuthentication):
     """
@@ -6,4 +12,63 @@ class CsrfExemptSessionAuthentication(SessionAuthentication):
     """
     def enforce_csrf(self, request):
         # Do not enforce CSRF
-        return 
\ No newline at end of file
+        return
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Stateless ``Authorization: Bearer <token>`` authentication.
+    
+    Tokens are signed with SECRET_KEY and carry the user id and part of the
+    session auth hash, so checking one needs no session lookup, and changing
+    the password revokes every token issued before. Off unless
+    ``SIGNED_TOKEN_AUTH`` is set.
+    """
+    keyword = 'Bearer'
+    salt = 'api.authentication.SignedTokenAuthentication'
+    
+    @classmethod
+    def issue_token(cls, user):
+        return signing.dumps({'uid': user.pk, 'hash': token_hash(user)}, salt=cls.salt, compress=True)
+    
+    def authenticate(self, request):
+        payload = self.token_payload(request)
+        if payload is None:
+            return None
+        return (self.check_user(payload, CachedModelBackend().get_user(payload.get('uid'))), None)
+    
+    async def aauthenticate(self, request):
+        """``authenticate`` for async views, which take a plain HttpRequest."""
+        payload = self.token_payload(request)
+        if payload is None:
+            return None
+        return (self.check_user(payload, await CachedModelBackend().aget_user(payload.get('uid'))), None)
+    
+    def token_payload(self, request):
+        if not getattr(settings, 'SIGNED_TOKEN_AUTH', False):
+            return None
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed('Invalid token header')
+        
+        try:
+            return signing.loads(
+                auth[1].decode(), salt=self.salt, max_age=getattr(settings, 'SIGNED_TOKEN_MAX_AGE', None)
+            )
+        except (signing.BadSignature, UnicodeDecodeError):
+            raise AuthenticationFailed('Invalid or expired token')
+    
+    def check_user(self, payload, user):
+        if user is None or not constant_time_compare(payload.get('hash', ''), token_hash(user)):
+            raise AuthenticationFailed('Invalid or expired token')
+        return user
+    
+    def authenticate_header(self, request):
+        return self.keyword
+
+def token_hash(user):
+    return user.get_session_auth_hash()[:16]
+
+# Session first, so unauthenticated requests still get 403 rather than 401
+API_AUTHENTICATION_CLASSES = [CsrfExemptSessionAuthentication, SignedTokenAuthentication]
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password, verify_password
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+
+from .cache import USER_KEY, user_cache_timeout
+from .hashers import hashing_pool
+
+UserModel = get_user_model()
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that serves ``get_user`` from the cache and hashes on the
+    bounded pool from hashers.py.
+
+    Session and token authentication call ``get_user`` on every request, so
+    caching it removes the user query. Entries are dropped whenever the user
+    is saved or deleted (see signals.py); ``USER_CACHE_TIMEOUT`` bounds how
+    long a queryset ``update()``, which sends no signal, can go unnoticed.
+
+    Credentials it rejects raise PermissionDenied, which ends
+    ``authenticate()``: ModelBackend stays listed after it only to keep
+    sessions logged in through it valid, and would hash them a second time.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        pool = hashing_pool()
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            pool.run(make_password, password)
+            raise PermissionDenied
+
+        is_correct, must_update = pool.run(verify_password, password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            raise PermissionDenied
+        if must_update:
+            # Move the stored hash to the preferred hasher and work factor
+            user.password = pool.run(make_password, password)
+            user.save(update_fields=['password'])
+        return user
+
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, user_cache_timeout())
+        return user
+
+    async def aget_user(self, user_id):
+        key = USER_KEY.format(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await cache.aset(key, user, user_cache_timeout())
+        return user
@@ -0,0 +1,324 @@
+"""
+Benchmark suite used by ``python manage.py run_benchmarks``.
+
+``generate_dataset`` fills an empty database with a reproducible synthetic
+library (the sample catalog and test accounts plus generated books, members
+and a loan history) and ``run_scenario`` drives one scenario through the
+full Django stack with concurrent in-process clients, timing each request
+and counting its queries.
+
+Scenarios are planned up front from a seeded RNG and split between the
+workers round-robin, so two runs against the same dataset issue the same
+requests as the same users.
+"""
+import contextlib
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client
+from django.utils import timezone
+
+from .models import User, Book, BookIssue
+
+SCALES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+# Share of the generated loan history in each status
+STATUS_WEIGHTS = {'RETURNED': 70, 'ISSUED': 12, 'OVERDUE': 5, 'REQUESTED': 8, 'REJECTED': 5}
+
+STAFF_ACCOUNTS = 10
+INSERT_BATCH = 10_000
+
+WORDS = (
+    'river', 'shadow', 'garden', 'winter', 'empire', 'silent', 'golden', 'journey', 'secret', 'ocean',
+    'forest', 'machine', 'letters', 'island', 'history', 'stars', 'kingdom', 'city', 'broken', 'light',
+)
+SURNAMES = ('Smith', 'Okafor', 'Tanaka', 'Garcia', 'Novak', 'Haddad', 'Kumar', 'Larsen', 'Moreau', 'Silva')
+GENRES = ('Fiction', 'Fantasy', 'Science Fiction', 'History', 'Biography', 'Poetry', 'Mystery', 'Science')
+
+
+def parse_scale(value):
+    """Loan count for '10k', '1m', '10m' or a plain number."""
+    return SCALES.get(value.lower()) or int(value)
+
+
+def dataset_size(loans):
+    return {
+        'loans': loans,
+        'books': max(loans // 50, 500),
+        'members': max(loans // 20, 100),
+        'staff': STAFF_ACCOUNTS,
+    }
+
+
+def member_email(i):
+    return f'bench-member-{i}@example.invalid'
+
+
+def staff_email(i):
+    return f'bench-staff-{i}@example.invalid'
+
+
+def generate_dataset(loans, seed=0, stdout=None):
+    """
+    Populate the (empty) default database for a benchmark at ``loans`` loans.
+
+    Loans are written with executemany rather than the ORM: they carry
+    historical request dates, which ``auto_now_add`` would overwrite, and
+    skipping per-row signals is what makes the 10m scale practical. The
+    denormalized columns are settled afterwards in bulk.
+    """
+    from add_sample_books import add_sample_books
+    from create_test_users import create_test_users
+
+    write = stdout.write if stdout else (lambda message: None)
+    size = dataset_size(loans)
+    rng = random.Random(seed)
+    now = timezone.now()
+    started = time.monotonic()
+
+    # The demo catalog and accounts from the setup scripts, so the database
+    # can also be served and driven by `manage.py loadtest`
+    with contextlib.redirect_stdout(StringIO()):
+        add_sample_books()
+        create_test_users()
+
+    unusable = make_password(None)
+    User.objects.bulk_create(
+        [
+            User(
+                email=staff_email(i), username=f'bench-staff-{i}', password=unusable,
+                first_name='Bench', last_name=f'Staff {i}', user_type='STAFF'
+            )
+            for i in range(size['staff'])
+        ] + [
+            User(
+                email=member_email(i), username=f'bench-member-{i}', password=unusable,
+                first_name='Bench', last_name=f'Member {i}', user_type='MEMBER'
+            )
+            for i in range(size['members'])
+        ],
+        batch_size=INSERT_BATCH
+    )
+    member_ids = list(
+        User.objects.filter(email__startswith='bench-member-').order_by('pk').values_list('pk', flat=True)
+    )
+    write(f"Created {size['members']} members and {size['staff']} staff")
+
+    Book.objects.bulk_create(
+        (
+            Book(
+                title=f"The {rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}",
+                author=f"{rng.choice(WORDS).title()} {rng.choice(SURNAMES)}",
+                isbn=f'979{i:010d}',
+                publication_date=now.date() - timedelta(days=rng.randrange(365 * 80)),
+                genre=rng.choice(GENRES),
+                description=' '.join(rng.choices(WORDS, k=12)),
+            )
+            for i in range(size['books'])
+        ),
+        batch_size=INSERT_BATCH
+    )
+    book_ids = list(Book.objects.filter(isbn__startswith='979').order_by('pk').values_list('pk', flat=True))
+    write(f"Created {size['books']} books")
+
+    active = insert_loans(loans, member_ids, book_ids, rng, now, write)
+    settle_books(book_ids, active, rng)
+    call_command('reconcile_loan_counts', stdout=StringIO())
+    call_command('rebuild_catalog_stats', stdout=StringIO())
+    write(f"Generated {loans} loans in {time.monotonic() - started:.1f}s")
+    return size
+
+
+def insert_loans(loans, member_ids, book_ids, rng, now, write):
+    """Insert the loan history; returns the ISSUED/OVERDUE count per book."""
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    columns = ['book_id', 'user_id', 'request_date', 'issue_date', 'due_date', 'return_date', 'status', 'reissue_count']
+    table = connection.ops.quote_name(BookIssue._meta.db_table)
+    sql = (
+        f"INSERT INTO {table} ({', '.join(connection.ops.quote_name(c) for c in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    adapt = connection.ops.adapt_datetimefield_value
+    active = Counter()
+    started = time.monotonic()
+
+    for start in range(0, loans, INSERT_BATCH):
+        rows = []
+        for n in range(start, min(start + INSERT_BATCH, loans)):
+            # The member cycles fastest, so no (member, book) pair repeats and
+            # the one-active-loan-per-book constraint always holds
+            user_id = member_ids[n % len(member_ids)]
+            book_id = book_ids[(n // len(member_ids)) % len(book_ids)]
+            status = rng.choices(statuses, weights)[0]
+            issued = returned = due = None
+            if status == 'REQUESTED':
+                requested = now - timedelta(minutes=rng.randrange(7 * 24 * 60))
+            elif status == 'ISSUED':
+                issued = now - timedelta(minutes=rng.randrange(13 * 24 * 60))
+            elif status == 'OVERDUE':
+                issued = now - timedelta(days=15, minutes=rng.randrange(45 * 24 * 60))
+            else:
+                requested = now - timedelta(days=30, minutes=rng.randrange(3 * 365 * 24 * 60))
+                if status == 'RETURNED':
+                    issued = requested + timedelta(days=1)
+                    returned = issued + timedelta(days=rng.randrange(1, 21))
+            if issued:
+                due = issued + timedelta(days=14)
+                if status != 'RETURNED':
+                    requested = issued - timedelta(days=1)
+                    active[book_id] += 1
+            rows.append((
+                book_id, user_id, adapt(requested), adapt(issued), adapt(due), adapt(returned),
+                status, rng.randrange(4) if issued else 0,
+            ))
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        done = start + len(rows)
+        if done % (INSERT_BATCH * 10) == 0 or done == loans:
+            write(f"  {done} loans ({done / max(time.monotonic() - started, 1e-6):.0f} loans/s)")
+    return active
+
+
+def settle_books(book_ids, active, rng):
+    """Size each book's stock to its open loans, leaving some fully lent out."""
+    books = []
+    for book_id in book_ids:
+        spare = rng.choice((0, 1, 2, 3, 4))
+        books.append(Book(pk=book_id, total_copies=active[book_id] + spare, available_copies=spare))
+    Book.objects.bulk_update(books, ['total_copies', 'available_copies'], batch_size=INSERT_BATCH)
+
+
+# Scenario planners: each returns the requests to make as (role, method, path)
+
+def sample_ids(queryset, count, rng):
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:count * 10])
+    return rng.sample(ids, min(count, len(ids)))
+
+
+def plan_browse(requests, rng):
+    book_ids = sample_ids(Book.objects.all(), requests, rng)
+    plan = []
+    for i in range(requests):
+        roll = rng.random()
+        if roll < 0.4:
+            plan.append(('member', 'GET', '/api/books/?page_size=20'))
+        elif roll < 0.8 and book_ids:
+            plan.append(('member', 'GET', f'/api/books/{rng.choice(book_ids)}/'))
+        else:
+            plan.append(('member', 'GET', f'/api/books/search/?q={rng.choice(WORDS)}'))
+    return plan
+
+
+def plan_request(requests, rng):
+    book_ids = sample_ids(Book.objects.filter(available_copies__gt=0), requests, rng)
+    return [('member', 'POST', f'/api/books/{pk}/request_issue/') for pk in book_ids]
+
+
+def plan_loan_action(action, **filters):
+    def plan(requests, rng):
+        ids = sample_ids(BookIssue.objects.filter(**filters), requests, rng)
+        return [('staff', 'POST', f'/api/book-issues/{pk}/{action}/') for pk in ids]
+    return plan
+
+
+def plan_overdue(requests, rng):
+    return [('staff', 'GET', '/api/book-issues/overdue/?page_size=50')] * requests
+
+
+def plan_dashboard(requests, rng):
+    return [('staff' if i % 4 == 0 else 'member', 'GET', '/api/dashboard-stats/') for i in range(requests)]
+
+
+# Run in this order, so approve, reissue and return find the loans that
+# the earlier scenarios left behind
+SCENARIOS = {
+    'browse': plan_browse,
+    'request': plan_request,
+    'approve': plan_loan_action('approve', status='REQUESTED', book__available_copies__gt=0),
+    'reissue': plan_loan_action('reissue', status='ISSUED', reissue_count__lt=3),
+    'return': plan_loan_action('return_book', status__in=['ISSUED', 'OVERDUE']),
+    'overdue': plan_overdue,
+    'dashboard': plan_dashboard,
+}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run_scenario(name, requests, concurrency, seed=0):
+    """Plan and run one scenario; returns its summary dict."""
+    plan = SCENARIOS[name](requests, random.Random(f'{seed}:{name}'))
+    members = list(User.objects.filter(email__in=[member_email(i) for i in range(concurrency)]).order_by('pk'))
+    staff = list(User.objects.filter(email__in=[staff_email(i) for i in range(STAFF_ACCOUNTS)]).order_by('pk'))
+    if len(members) < concurrency or not staff:
+        raise ValueError(f"The dataset needs at least {concurrency} members and one staff account")
+
+    results = [[] for _ in range(concurrency)]
+    ready = threading.Barrier(concurrency + 1)
+
+    def worker(i):
+        clients = {'member': Client(raise_request_exception=False), 'staff': Client(raise_request_exception=False)}
+        clients['member'].force_login(members[i])
+        clients['staff'].force_login(staff[i % len(staff)])
+        counter = QueryCounter()
+        try:
+            with connection.execute_wrapper(counter):
+                ready.wait()
+                for role, method, path in plan[i::concurrency]:
+                    queries = counter.count
+                    started = time.perf_counter()
+                    try:
+                        status = getattr(clients[role], method.lower())(path).status_code
+                    except Exception:
+                        status = None
+                    results[i].append((time.perf_counter() - started, status, counter.count - queries))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return summarize([result for worker_results in results for result in worker_results], elapsed)
+
+
+def summarize(results, elapsed):
+    latencies = sorted(latency for latency, _, _ in results)
+    statuses = Counter(str(status) for _, status, _ in results)
+    summary = {
+        'requests': len(results),
+        'errors': sum(1 for _, status, _ in results if status is None or status >= 500),
+        'statuses': dict(sorted(statuses.items())),
+        'seconds': round(elapsed, 3),
+        'throughput': round(len(results) / elapsed, 1) if elapsed else 0.0,
+        'queries_per_request': round(statistics.mean(q for _, _, q in results), 2) if results else 0.0,
+        'max_queries': max((q for _, _, q in results), default=0),
+    }
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        summary.update({
+            'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+            'p50_ms': round(cuts[49] * 1000, 2),
+            'p95_ms': round(cuts[94] * 1000, 2),
+            'p99_ms': round(cuts[98] * 1000, 2),
+        })
+    return summary
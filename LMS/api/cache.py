@@ -0,0 +1,148 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+
+STAFF_STATS_KEY = 'dashboard-stats:staff'
+
+# Book payloads are stored under ``book:<id>:<book version>:<generation>``.
+# Saving a book or changing its copies bumps that book's version; bulk
+# imports bump the generation, which retires every cached payload at once.
+# Listing pages are cached as lists of ids under the membership version,
+# which only changes when books are added or removed.
+BOOK_VERSION_KEY = 'book-version:{}'
+BOOK_PAYLOAD_KEY = 'book:{}:{}:{}'
+BOOK_GENERATION_KEY = 'book-generation'
+BOOK_MEMBERSHIP_KEY = 'book-membership'
+BOOK_LISTING_KEY = 'book-listing:{}:{}:{}'
+USER_KEY = 'user:{}'
+
+
+def staff_stats_timeout():
+    return getattr(settings, 'DASHBOARD_STATS_CACHE_TIMEOUT', 30)
+
+
+def invalidate(func):
+    """
+    Run an invalidation now and again once the current transaction commits,
+    so a reader that refilled the cache from pre-commit data is corrected.
+    """
+    func()
+    transaction.on_commit(func)
+
+
+def invalidate_staff_stats():
+    invalidate(lambda: cache.delete(STAFF_STATS_KEY))
+
+
+def user_cache_timeout():
+    return getattr(settings, 'USER_CACHE_TIMEOUT', 60)
+
+
+def invalidate_user(user_id):
+    key = USER_KEY.format(user_id)
+    invalidate(lambda: cache.delete(key))
+
+
+def book_cache():
+    return caches[getattr(settings, 'BOOK_CACHE_ALIAS', 'default')]
+
+
+def book_cache_timeout():
+    return getattr(settings, 'BOOK_CACHE_TIMEOUT', 300)
+
+
+def _initial_version():
+    # Never reuse a version after a version key is evicted: a stale payload
+    # stored under the old number would become visible again
+    return time.time_ns()
+
+
+def _versions(keys):
+    store = book_cache()
+    versions = store.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            store.add(key, _initial_version(), None)
+            versions[key] = store.get(key)
+    return versions
+
+
+def _bump(key):
+    store = book_cache()
+    try:
+        store.incr(key)
+    except ValueError:
+        store.set(key, _initial_version(), None)
+
+
+def bump_book_versions(book_ids):
+    keys = [BOOK_VERSION_KEY.format(book_id) for book_id in book_ids]
+
+    def bump():
+        for key in keys:
+            _bump(key)
+    invalidate(bump)
+
+
+def bump_book_membership():
+    invalidate(lambda: _bump(BOOK_MEMBERSHIP_KEY))
+
+
+def bump_book_generation():
+    def bump():
+        _bump(BOOK_GENERATION_KEY)
+        _bump(BOOK_MEMBERSHIP_KEY)
+    invalidate(bump)
+
+
+def _payload_keys(book_ids):
+    version_keys = [BOOK_VERSION_KEY.format(book_id) for book_id in book_ids]
+    versions = _versions(version_keys + [BOOK_GENERATION_KEY])
+    generation = versions[BOOK_GENERATION_KEY]
+    return {
+        BOOK_PAYLOAD_KEY.format(book_id, versions[version_key], generation): book_id
+        for book_id, version_key in zip(book_ids, version_keys)
+    }
+
+
+def get_book_payloads(book_ids):
+    """
+    Look up cached serialized books.
+
+    Returns ``(hits, misses)``: a dict of id to payload, and a dict of id to
+    the cache key a freshly serialized payload should be stored under. The
+    miss keys are taken before the caller reads the database, so a version
+    bump in between leaves the refilled entry unreachable rather than stale.
+    """
+    if not book_ids:
+        return {}, {}
+    keys = _payload_keys(book_ids)
+    cached = book_cache().get_many(list(keys))
+    hits = {keys[key]: payload for key, payload in cached.items()}
+    misses = {book_id: key for key, book_id in keys.items() if key not in cached}
+    return hits, misses
+
+
+def set_book_payloads(miss_keys, payloads):
+    book_cache().set_many(
+        {miss_keys[book_id]: payload for book_id, payload in payloads.items() if book_id in miss_keys},
+        book_cache_timeout()
+    )
+
+
+def book_listing_key(url):
+    """Cache key for one listing page; like payload keys, take it before reading the database."""
+    versions = _versions([BOOK_MEMBERSHIP_KEY, BOOK_GENERATION_KEY])
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return BOOK_LISTING_KEY.format(versions[BOOK_MEMBERSHIP_KEY], versions[BOOK_GENERATION_KEY], digest)
+
+
+def get_book_listing(key):
+    return book_cache().get(key)
+
+
+def set_book_listing(key, page):
+    book_cache().set(key, page, book_cache_timeout())
@@ -0,0 +1,175 @@
+import csv
+import datetime
+import json
+import re
+
+from .models import Book
+
+ISBN_STRIP_RE = re.compile(r'[\s-]')
+YEAR_RE = re.compile(r'\d{4}')
+MARC_FIELD_RE = re.compile(r'^=(\d{3})  (.*)$')
+
+UPDATE_FIELDS = ['title', 'author', 'publication_date', 'genre', 'description']
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def normalize_isbn(value):
+    """
+    Return the ISBN-13 for an ISBN-10 or ISBN-13 string, validating its check digit.
+    """
+    isbn = ISBN_STRIP_RE.sub('', str(value or '')).upper()
+    if len(isbn) == 10:
+        if not (isbn[:9].isdigit() and (isbn[9].isdigit() or isbn[9] == 'X')):
+            raise InvalidRecord(f"Malformed ISBN-10 '{value}'")
+        total = sum((10 - i) * int(c) for i, c in enumerate(isbn[:9]))
+        total += 10 if isbn[9] == 'X' else int(isbn[9])
+        if total % 11:
+            raise InvalidRecord(f"Bad ISBN-10 check digit in '{value}'")
+        isbn = '978' + isbn[:9]
+        return isbn + str(isbn13_check_digit(isbn))
+    if len(isbn) == 13 and isbn.isdigit():
+        if int(isbn[12]) != isbn13_check_digit(isbn):
+            raise InvalidRecord(f"Bad ISBN-13 check digit in '{value}'")
+        return isbn
+    raise InvalidRecord(f"Malformed ISBN '{value}'")
+
+
+def isbn13_check_digit(isbn):
+    total = sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(isbn[:12]))
+    return (10 - total % 10) % 10
+
+
+def parse_date(value):
+    value = str(value or '').strip()
+    if not value:
+        raise InvalidRecord('Missing publication date')
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        pass
+    year = YEAR_RE.search(value)
+    if not year:
+        raise InvalidRecord(f"Unparseable publication date '{value}'")
+    return datetime.date(int(year.group()), 1, 1)
+
+
+def build_book(record, default_copies=1):
+    """Validate a raw record dict and return an unsaved Book."""
+    if isinstance(record, InvalidRecord):
+        raise record
+    if not isinstance(record, dict):
+        raise InvalidRecord('Record is not an object')
+    title = str(record.get('title') or '').strip()
+    author = str(record.get('author') or '').strip()
+    if not title or not author:
+        raise InvalidRecord('Missing title or author')
+    try:
+        # 0 is a valid count (a title listed before any copy arrives)
+        total_copies = record.get('total_copies')
+        total_copies = default_copies if total_copies in (None, '') else int(total_copies)
+        available_copies = record.get('available_copies')
+        available_copies = total_copies if available_copies in (None, '') else int(available_copies)
+    except (TypeError, ValueError):
+        raise InvalidRecord('Copies must be integers')
+    if total_copies < 0 or not 0 <= available_copies <= total_copies:
+        raise InvalidRecord('Invalid copy counts')
+
+    return Book(
+        title=title[:200],
+        author=author[:100],
+        isbn=normalize_isbn(record.get('isbn')),
+        publication_date=parse_date(record.get('publication_date')),
+        genre=str(record.get('genre') or 'General').strip()[:50],
+        description=str(record.get('description') or '').strip(),
+        total_copies=total_copies,
+        available_copies=available_copies,
+    )
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def read_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                # Yielded rather than raised so one bad line doesn't end the import
+                yield InvalidRecord(f"Invalid JSON: {e}")
+
+
+def read_marc(stream):
+    """
+    Read MARC mnemonic (.mrk) text: one ``=TAG  IIsubfields`` line per field,
+    records separated by blank lines or ``=LDR`` lines.
+    """
+    fields = {}
+    for line in stream:
+        line = line.rstrip('\n')
+        if not line.strip() or line.startswith('=LDR'):
+            if fields:
+                yield marc_record(fields)
+                fields = {}
+            continue
+        match = MARC_FIELD_RE.match(line)
+        if match:
+            fields.setdefault(match.group(1), []).append(marc_subfields(match.group(2)))
+    if fields:
+        yield marc_record(fields)
+
+
+def marc_subfields(data):
+    # Two indicator characters, then $-prefixed subfields
+    subfields = {}
+    for chunk in data[2:].split('$')[1:]:
+        if chunk:
+            subfields.setdefault(chunk[0], chunk[1:].strip())
+    return subfields
+
+
+def marc_record(fields):
+    def first(tag, code):
+        for subfields in fields.get(tag, []):
+            if subfields.get(code):
+                return subfields[code]
+        return ''
+
+    title = ' '.join(filter(None, [first('245', 'a'), first('245', 'b')]))
+    return {
+        'isbn': first('020', 'a').split(' ')[0],
+        'title': title.rstrip(' /:;,.'),
+        'author': first('100', 'a').rstrip(' ,'),
+        'publication_date': first('264', 'c') or first('260', 'c'),
+        'genre': (first('655', 'a') or first('650', 'a')).rstrip(' .'),
+        'description': first('520', 'a'),
+    }
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+    'marc': read_marc,
+}
+
+
+def upsert_books(books):
+    """
+    Insert new books and update catalog metadata of existing ISBNs in one statement.
+
+    Copy counts of existing books are left alone, since outstanding loans
+    depend on them.
+    """
+    # A conflicting row may only be updated once per statement
+    unique = {book.isbn: book for book in books}
+    return Book.objects.bulk_create(
+        unique.values(),
+        update_conflicts=True,
+        unique_fields=['isbn'],
+        update_fields=UPDATE_FIELDS,
+    )
@@ -0,0 +1,117 @@
+"""
+The catalog summary table: book and copy counts for the whole catalog, per
+genre and per author, kept in CatalogStat so analytics never scan api_book.
+
+The table is kept current incrementally. Book saves and deletes are applied
+by the signal handlers in signals.py, and the stock updates in BookIssue call
+``record_stock_change`` inside their own transaction. Bulk loads that bypass
+both (import_books, the benchmark generator) call ``rebuild`` afterwards, as
+does the ``rebuild_catalog_stats`` command for repairing drift.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Book, CatalogStat
+
+# The counters on each row, in the order the delta tuples below use
+STAT_FIELDS = ('books', 'available_books', 'total_copies', 'available_copies')
+
+# What a book contributes is decided by these fields alone
+BOOK_FIELDS = ('genre', 'author', 'total_copies', 'available_copies')
+
+
+def contribution(genre, author, total_copies, available_copies):
+    """The summary rows one book counts towards and what it adds to each."""
+    counts = (1, int(available_copies > 0), total_copies, available_copies)
+    return {('all', ''): counts, ('genre', genre): counts, ('author', author): counts}
+
+
+def book_deltas(before, after):
+    """Row deltas for a book going from ``before`` to ``after`` (BOOK_FIELDS tuples, None if absent)."""
+    deltas = defaultdict(lambda: (0, 0, 0, 0))
+    for values, sign in [(before, -1), (after, 1)]:
+        if values is None:
+            continue
+        for row, counts in contribution(*values).items():
+            deltas[row] = tuple(total + sign * count for total, count in zip(deltas[row], counts))
+    return deltas
+
+
+def apply_deltas(deltas):
+    """Add ``{(dimension, key): delta}`` to the table, one UPDATE per distinct delta."""
+    deltas = {row: delta for row, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    # Only a book arriving in a genre or author can need a new row
+    new_rows = [CatalogStat(dimension=dimension, key=key) for (dimension, key), delta in deltas.items() if delta[0] > 0]
+    if new_rows:
+        CatalogStat.objects.bulk_create(new_rows, ignore_conflicts=True)
+
+    # A book counts once in each dimension, so a single change usually moves
+    # its three rows by the same delta: one UPDATE for all of them
+    grouped = defaultdict(lambda: defaultdict(list))
+    for (dimension, key), delta in deltas.items():
+        grouped[delta][dimension].append(key)
+    for delta, keys in grouped.items():
+        rows = Q()
+        for dimension, dimension_keys in keys.items():
+            rows |= Q(dimension=dimension, key__in=dimension_keys)
+        CatalogStat.objects.filter(rows).update(**{
+            field: F(field) + change for field, change in zip(STAT_FIELDS, delta) if change
+        })
+
+    # Genres and authors whose last book left; the 'all' row always stays
+    emptied = defaultdict(list)
+    for (dimension, key), delta in deltas.items():
+        if delta[0] < 0 and dimension != 'all':
+            emptied[dimension].append(key)
+    for dimension, keys in emptied.items():
+        CatalogStat.objects.filter(dimension=dimension, key__in=keys, books__lte=0).delete()
+
+
+def record_book_change(before, after):
+    """Apply a Book row changing from ``before`` to ``after`` (see book_deltas)."""
+    if before != after:
+        apply_deltas(book_deltas(before, after))
+
+
+def record_stock_change(per_book):
+    """
+    Apply ``{book_id: change}`` to available_copies, made by a queryset
+    update. Call after the update, in the same transaction: the new values
+    are read back and the old ones derived from them.
+    """
+    deltas = defaultdict(lambda: (0, 0, 0, 0))
+    books = Book.objects.filter(pk__in=list(per_book)).values_list('pk', *BOOK_FIELDS)
+    for pk, genre, author, total_copies, available_copies in books:
+        before = (genre, author, total_copies, available_copies - per_book[pk])
+        after = (genre, author, total_copies, available_copies)
+        for row, delta in book_deltas(before, after).items():
+            deltas[row] = tuple(a + b for a, b in zip(deltas[row], delta))
+    apply_deltas(deltas)
+
+
+def stat_aggregates():
+    return {
+        'books': Count('pk'),
+        'available_books': Count('pk', filter=Q(available_copies__gt=0)),
+        'total_copies': Coalesce(Sum('total_copies'), 0),
+        'available_copies': Coalesce(Sum('available_copies'), 0),
+    }
+
+
+def rebuild(batch_size=1000):
+    """Recompute the whole table from api_book; returns the number of rows written."""
+    with transaction.atomic():
+        rows = [CatalogStat(dimension='all', key='', **Book.objects.aggregate(**stat_aggregates()))]
+        for dimension in ['genre', 'author']:
+            rows += [
+                CatalogStat(dimension=dimension, key=row.pop(dimension), **row)
+                for row in Book.objects.order_by().values(dimension).annotate(**stat_aggregates())
+            ]
+        CatalogStat.objects.all().delete()
+        CatalogStat.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
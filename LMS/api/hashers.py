@@ -0,0 +1,92 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the work factor taken from ``PASSWORD_PBKDF2_ITERATIONS``.
+
+    The algorithm name is unchanged, so changing the setting doesn't break
+    stored hashes: each one is rehashed at the new cost on its next login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', None) or PBKDF2PasswordHasher.iterations
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with costs taken from ``PASSWORD_ARGON2_PARAMS``
+    (``time_cost``, ``memory_cost``, ``parallelism``). Needs argon2-cffi.
+    """
+
+    def cost(self, name):
+        return getattr(settings, 'PASSWORD_ARGON2_PARAMS', {}).get(name, getattr(Argon2PasswordHasher, name))
+
+    @property
+    def time_cost(self):
+        return self.cost('time_cost')
+
+    @property
+    def memory_cost(self):
+        return self.cost('memory_cost')
+
+    @property
+    def parallelism(self):
+        return self.cost('parallelism')
+
+
+class HashingPoolBusy(Exception):
+    pass
+
+
+class HashingPool:
+    """
+    Bounded thread pool for password hashing.
+
+    At most ``workers`` hashes run at once (hashlib and argon2 release the
+    GIL, so one per core is enough) and at most ``backlog`` more wait for a
+    thread. Beyond that, callers wait up to ``timeout`` seconds for a slot and
+    then get HashingPoolBusy, instead of every request thread piling onto the
+    CPU during a login rush.
+    """
+
+    def __init__(self, workers, backlog, timeout=None):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self.slots = threading.BoundedSemaphore(workers + backlog)
+        self.timeout = timeout
+
+    def submit(self, func, *args):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise HashingPoolBusy('Too many logins in progress')
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def run(self, func, *args):
+        return self.submit(func, *args).result()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hashing_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool(
+                getattr(settings, 'PASSWORD_HASHING_WORKERS', None) or os.cpu_count() or 1,
+                getattr(settings, 'PASSWORD_HASHING_BACKLOG', 64),
+                getattr(settings, 'PASSWORD_HASHING_TIMEOUT', 5),
+            )
+        return _pool
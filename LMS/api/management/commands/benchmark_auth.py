@@ -0,0 +1,79 @@
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.authentication import SignedTokenAuthentication
+from api.cache import USER_KEY
+from api.models import User
+
+MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+CACHED_BACKEND = 'api.backends.CachedModelBackend'
+
+# (label, session engine, auth backend, use a signed token instead of the session)
+SCENARIOS = [
+    ('db sessions', 'django.contrib.sessions.backends.db', MODEL_BACKEND, False),
+    ('cached_db sessions', 'django.contrib.sessions.backends.cached_db', MODEL_BACKEND, False),
+    ('cached_db sessions + cached user', 'django.contrib.sessions.backends.cached_db', CACHED_BACKEND, False),
+    ('signed cookies + cached user', 'django.contrib.sessions.backends.signed_cookies', CACHED_BACKEND, False),
+    ('signed token + cached user', 'django.contrib.sessions.backends.cached_db', CACHED_BACKEND, True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare queries and latency per authenticated request for each session '
+        'engine and authentication path, against /api/users/current_user/'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per scenario')
+
+    def handle(self, *args, **options):
+        # Everything is rolled back; the throwaway user never becomes visible
+        with transaction.atomic():
+            user = User.objects.create_user(email='auth-benchmark@example.invalid', username='auth-benchmark')
+            try:
+                for label, engine, backend, token in SCENARIOS:
+                    queries, median_ms = self.run_scenario(user, engine, backend, token, options['requests'])
+                    self.stdout.write(f"{label:<34} {queries:5.2f} queries/request {median_ms:8.3f} ms median")
+            finally:
+                cache.delete(USER_KEY.format(user.pk))
+                transaction.set_rollback(True)
+
+    def run_scenario(self, user, engine, backend, token, requests):
+        with override_settings(
+            SESSION_ENGINE=engine,
+            AUTHENTICATION_BACKENDS=[backend],
+            SIGNED_TOKEN_AUTH=token,
+            ALLOWED_HOSTS=['testserver'],
+        ):
+            client = Client()
+            headers = {}
+            if token:
+                headers['Authorization'] = f'Bearer {SignedTokenAuthentication.issue_token(user)}'
+            else:
+                client.force_login(user, backend=backend)
+            cache.delete(USER_KEY.format(user.pk))
+
+            # Warm-up request fills the session and user caches
+            self.get(client, headers)
+            timings = []
+            with CaptureQueriesContext(connection) as ctx:
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    self.get(client, headers)
+                    timings.append(time.perf_counter() - started)
+
+            if not token:
+                client.logout()
+            return len(ctx.captured_queries) / requests, statistics.median(timings) * 1000
+
+    def get(self, client, headers):
+        response = client.get('/api/users/current_user/', headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(f"Benchmark request failed with {response.status_code}")
@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+
+from django.contrib.auth.hashers import get_hasher, verify_password
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from api.hashers import HashingPool
+
+PASSWORD = 'correct horse battery staple'
+
+
+class Command(BaseCommand):
+    help = (
+        'Microbenchmark of password verification, the CPU cost of a login, '
+        'through the bounded hashing pool for several hasher settings. It '
+        'times verify_password only, not the login view or its queries'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', default='default,600000,300000',
+            help="Comma-separated PBKDF2 iteration counts to compare ('default' = Django's)"
+        )
+        parser.add_argument('--argon2', action='store_true', help='Also measure Argon2id (needs argon2-cffi)')
+        parser.add_argument('--workers', type=int, default=None, help='Hashing pool threads (defaults to the CPU count)')
+        parser.add_argument('--clients', type=int, default=None, help='Concurrent client threads (defaults to 4 x workers)')
+        parser.add_argument('--seconds', type=float, default=3.0, help='Duration of each run')
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        workers = options['workers'] or cores
+        clients = options['clients'] or workers * 4
+
+        scenarios = []
+        for value in options['iterations'].split(','):
+            value = value.strip()
+            if value != 'default' and not value.isdigit():
+                raise CommandError(f"Invalid iteration count '{value}'")
+            iterations = None if value == 'default' else int(value)
+            scenarios.append((
+                f"pbkdf2_sha256 {value}",
+                {'PASSWORD_PBKDF2_ITERATIONS': iterations},
+            ))
+        if options['argon2']:
+            scenarios.append((
+                'argon2id',
+                {'PASSWORD_HASHERS': ['api.hashers.TunableArgon2PasswordHasher']},
+            ))
+
+        self.stdout.write(f"{cores} CPU(s), {workers} hashing thread(s), {clients} concurrent clients\n")
+        for label, overrides in scenarios:
+            with override_settings(**overrides):
+                hasher = get_hasher()
+                try:
+                    encoded = hasher.encode(PASSWORD, hasher.salt())
+                except ValueError as e:
+                    raise CommandError(str(e))
+                rate = self.measure(encoded, workers, clients, options['seconds'])
+            self.stdout.write(
+                f"{label:<24} {rate:8.1f} verifies/s  {rate / min(workers, cores):8.1f} verifies/s/core  "
+                f"{1000 * min(workers, cores) / rate if rate else float('inf'):7.1f} ms CPU/verify"
+            )
+
+    def measure(self, encoded, workers, clients, seconds):
+        pool = HashingPool(workers, clients)
+        deadline = time.monotonic() + seconds
+        counts = [0] * clients
+        failed = threading.Event()
+
+        def client(i):
+            while time.monotonic() < deadline and not failed.is_set():
+                is_correct, _ = pool.run(verify_password, PASSWORD, encoded)
+                if not is_correct:
+                    failed.set()
+                counts[i] += 1
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        pool.executor.shutdown()
+        if failed.is_set():
+            raise CommandError(f"The password did not verify against its own {encoded.split('$')[0]} hash")
+        return sum(counts) / elapsed
@@ -0,0 +1,181 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.sqlite3.base import SQLiteCursorWrapper
+from django.db.models import Q
+
+from api.models import BookIssue, Notification
+
+# Fixed "now" inside the synthetic data's date range
+BENCHMARK_NOW = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class Command(BaseCommand):
+    help = (
+        'Build a synthetic SQLite loan table and compare query plans and latency '
+        'of the hot BookIssue/Notification queries without and with the model indexes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loans', type=int, default=1_000_000, help='Synthetic BookIssue rows (e.g. 10000000)')
+        parser.add_argument('--notifications', type=int, default=None, help='Synthetic Notification rows (defaults to --loans)')
+        parser.add_argument('--users', type=int, default=50_000)
+        parser.add_argument('--books', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+        parser.add_argument('--db', help='SQLite file to build (defaults to a temporary file that is removed afterwards)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('benchmark_indexes generates SQLite DDL and needs a SQLite default database')
+        if options['loans'] > options['users'] * options['books']:
+            raise CommandError('--loans cannot exceed --users * --books')
+
+        notifications = options['notifications'] if options['notifications'] is not None else options['loans']
+        baseline_sql, index_sql = self.schema_sql()
+
+        path = options['db'] or tempfile.mkstemp(suffix='.sqlite3')[1]
+        if os.path.exists(path):
+            os.remove(path)
+        db = sqlite3.connect(path)
+        try:
+            db.executescript(';\n'.join(baseline_sql) + ';')
+            self.populate(db, options['loans'], notifications, options['users'], options['books'])
+
+            queries = self.hot_queries()
+            rng = random.Random(0)
+            before = self.run_queries(db, queries, options, rng)
+
+            started = time.monotonic()
+            db.executescript(';\n'.join(index_sql) + ';')
+            db.execute('ANALYZE')
+            self.stdout.write(f"Built {len(index_sql)} indexes in {time.monotonic() - started:.1f}s\n")
+
+            rng = random.Random(0)
+            after = self.run_queries(db, queries, options, rng)
+        finally:
+            db.close()
+            if not options['db']:
+                os.remove(path)
+
+        for name, _, _ in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, results in (('before', before), ('after', after)):
+                median_ms, plan = results[name]
+                self.stdout.write(f"  {label:<6} {median_ms:9.3f} ms  {plan}")
+
+    def schema_sql(self):
+        """Split the models' CREATE statements into table DDL and the Meta indexes/constraints."""
+        with connection.schema_editor(collect_sql=True) as editor:
+            editor.create_model(BookIssue)
+            editor.create_model(Notification)
+        # Index statements are deferred until the editor exits
+        statements = [sql.rstrip(';') for sql in editor.collected_sql]
+
+        names = [
+            item.name
+            for model in (BookIssue, Notification)
+            for item in model._meta.indexes + model._meta.constraints
+        ]
+        baseline = [sql for sql in statements if not any(f'"{name}"' in sql for name in names)]
+        indexes = [sql for sql in statements if any(f'"{name}"' in sql for name in names)]
+        return baseline, indexes
+
+    def populate(self, db, loans, notifications, users, books):
+        started = time.monotonic()
+        # user cycles fastest so (user, book) pairs never repeat, keeping the
+        # partial unique constraint buildable
+        db.execute(f"""
+            WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < {loans - 1})
+            INSERT INTO api_bookissue
+                (user_id, book_id, request_date, issue_date, due_date, return_date, status, reissue_count)
+            SELECT
+                n % {users} + 1,
+                (n / {users}) % {books} + 1,
+                datetime('2021-01-01', '+' || (n * 37 % 3000000) || ' minutes'),
+                datetime('2021-01-01', '+' || (n * 37 % 3000000 + 60) || ' minutes'),
+                datetime('2021-01-15', '+' || (n * 37 % 3000000) || ' minutes'),
+                NULL,
+                CASE n % 20
+                    WHEN 0 THEN 'REQUESTED'
+                    WHEN 1 THEN 'OVERDUE'
+                    WHEN 2 THEN 'REJECTED'
+                    WHEN 3 THEN 'ISSUED'
+                    WHEN 4 THEN 'ISSUED'
+                    ELSE 'RETURNED'
+                END,
+                n % 4
+            FROM seq
+        """)
+        db.execute(f"""
+            WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < {notifications - 1})
+            INSERT INTO api_notification (user_id, message, created_at, is_read, notification_type, book_issue_id)
+            SELECT
+                n % {users} + 1,
+                'Synthetic notification',
+                datetime('2021-01-01', '+' || (n * 37 % 3000000) || ' minutes'),
+                n % 3 != 0,
+                'ISSUED',
+                NULL
+            FROM seq
+        """)
+        db.commit()
+        db.execute('ANALYZE')
+        self.stdout.write(
+            f"Generated {loans} loans and {notifications} notifications in {time.monotonic() - started:.1f}s\n"
+        )
+
+    def hot_queries(self):
+        """The ORM queries behind the hot endpoints, as (name, queryset factory, wrapper)."""
+        active = ['REQUESTED', 'ISSUED']
+        return [
+            ('request_issue: active loan for user and book', lambda user, book: (
+                BookIssue.objects.filter(user_id=user, book_id=book, status__in=active).order_by().values('pk')[:1]
+            ), None),
+            ('sweep_overdue: past-due batch', lambda user, book: (
+                BookIssue.objects.filter(status='ISSUED', due_date__lt=BENCHMARK_NOW)
+                .order_by().values_list('pk', flat=True)[:1000]
+            ), None),
+            ('overdue: first page', lambda user, book: (
+                BookIssue.objects.filter(Q(status='OVERDUE') | Q(status='ISSUED', due_date__lt=BENCHMARK_NOW))[:51]
+            ), None),
+            ('dashboard_stats: member count by status', lambda user, book: (
+                BookIssue.objects.filter(user_id=user, status='ISSUED').order_by().values('pk')
+            ), 'SELECT COUNT(*) FROM ({})'),
+            ('my_issues: first page', lambda user, book: (
+                BookIssue.objects.filter(user_id=user)[:51]
+            ), None),
+            ('book-issues: staff first page', lambda user, book: (
+                BookIssue.objects.all()[:51]
+            ), None),
+            ('notifications: first page', lambda user, book: (
+                Notification.objects.filter(user_id=user)[:51]
+            ), None),
+        ]
+
+    def run_queries(self, db, queries, options, rng):
+        # Django's cursor wrapper translates the ORM's %s placeholders
+        cursor = db.cursor(SQLiteCursorWrapper)
+        results = {}
+        for name, factory, wrapper in queries:
+            timings = []
+            plan = None
+            for _ in range(options['repeat']):
+                queryset = factory(rng.randint(1, options['users']), rng.randint(1, options['books']))
+                sql, params = queryset.query.sql_with_params()
+                if wrapper:
+                    sql = wrapper.format(sql)
+                if plan is None:
+                    rows = cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+                    plan = '; '.join(row[-1] for row in rows)
+                started = time.perf_counter()
+                cursor.execute(sql, params).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = (statistics.median(timings), plan)
+        return results
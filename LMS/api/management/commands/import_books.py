@@ -0,0 +1,110 @@
+import itertools
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.cache import bump_book_generation, invalidate_staff_stats
+from api.catalog_import import READERS, InvalidRecord, build_book, upsert_books
+from api.catalog_stats import rebuild as rebuild_catalog_stats
+
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.mrk': 'marc',
+    '.marc': 'marc',
+}
+
+
+class Command(BaseCommand):
+    help = 'Stream books from a CSV, JSON-lines or MARC mnemonic file and upsert them by ISBN'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument('--format', choices=sorted(READERS), help='Defaults to the file extension')
+        parser.add_argument('--batch', type=int, default=2000, help='Records per upsert statement')
+        parser.add_argument('--copies', type=int, default=1, help='Copies for records that do not specify total_copies')
+        parser.add_argument('--checkpoint', help='Checkpoint file (defaults to <path>.checkpoint)')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and start from the top')
+        parser.add_argument('--max-errors', type=int, default=20, help='Invalid records to print before going quiet')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+        fmt = options['format'] or EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if not fmt:
+            raise CommandError('Cannot infer the format from the file extension; pass --format')
+
+        checkpoint_path = options['checkpoint'] or f"{path}.checkpoint"
+        resume_from = 0 if options['restart'] else self.read_checkpoint(checkpoint_path, path)
+        if resume_from:
+            self.stdout.write(f"Resuming after record {resume_from} (checkpoint {checkpoint_path})")
+
+        started = time.monotonic()
+        position = resume_from
+        imported = invalid = batches = 0
+
+        with open(path, newline='', encoding='utf-8') as stream:
+            records = itertools.islice(READERS[fmt](stream), resume_from, None)
+            while True:
+                chunk = list(itertools.islice(records, options['batch']))
+                if not chunk:
+                    break
+
+                books = []
+                for offset, record in enumerate(chunk, start=position + 1):
+                    try:
+                        books.append(build_book(record, options['copies']))
+                    except InvalidRecord as e:
+                        invalid += 1
+                        if invalid <= options['max_errors']:
+                            self.stderr.write(f"Record {offset}: {e}")
+
+                with transaction.atomic():
+                    upsert_books(books)
+                # bulk_create sends no signals; retire every cached book and listing at once
+                bump_book_generation()
+                position += len(chunk)
+                imported += len(books)
+                # Written after the commit: a crash in between only replays one idempotent batch
+                self.write_checkpoint(checkpoint_path, path, position)
+
+                batches += 1
+                if batches % 10 == 0:
+                    rate = imported / max(time.monotonic() - started, 1e-6)
+                    self.stdout.write(
+                        f"{position} records read, {imported} upserted, {invalid} invalid ({rate:.0f} books/s)"
+                    )
+
+        # Nor does the catalog summary see them; one rebuild at the end
+        rebuild_catalog_stats()
+        invalidate_staff_stats()
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} books from {position - resume_from} records "
+            f"({invalid} invalid) in {elapsed:.1f}s, {imported / max(elapsed, 1e-6):.0f} books/s"
+        ))
+
+    def read_checkpoint(self, checkpoint_path, path):
+        if not os.path.exists(checkpoint_path):
+            return 0
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('size') != os.path.getsize(path):
+            raise CommandError(
+                f"{path} changed since checkpoint {checkpoint_path} was written; pass --restart to start over"
+            )
+        return checkpoint['position']
+
+    def write_checkpoint(self, checkpoint_path, path, position):
+        tmp_path = f"{checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'path': os.path.abspath(path), 'size': os.path.getsize(path), 'position': position}, f)
+        os.replace(tmp_path, checkpoint_path)
@@ -0,0 +1,103 @@
+import http.client
+import json
+import statistics
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = '/api/books/,/api/book-issues/my_issues/,/api/notifications/,/api/dashboard-stats/'
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive a running server with concurrent authenticated GETs and report '
+        'req/s and latency percentiles, e.g. to compare the WSGI and ASGI profiles'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Server base URL')
+        parser.add_argument('--email', required=True, help='Account to log in as')
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--paths', default=DEFAULT_PATHS, help='Comma-separated paths requested round-robin')
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent connections')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http':
+            raise CommandError('Only http:// URLs are supported')
+        paths = [path.strip() for path in options['paths'].split(',') if path.strip()]
+        cookie = self.login(url, options['email'], options['password'])
+
+        latencies = {path: [] for path in paths}
+        errors = []
+        deadline = time.monotonic() + options['duration']
+
+        def worker(start):
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+            i = start
+            while time.monotonic() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                started = time.perf_counter()
+                try:
+                    conn.request('GET', path, headers={'Cookie': cookie})
+                    response = conn.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException) as e:
+                    errors.append(str(e))
+                    conn.close()
+                    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+                    continue
+                if response.status != 200:
+                    errors.append(f"{path}: HTTP {response.status}")
+                else:
+                    latencies[path].append(time.perf_counter() - started)
+            conn.close()
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        everything = [latency for path in paths for latency in latencies[path]]
+        if not everything:
+            raise CommandError(f"No successful requests ({len(errors)} errors, first: {errors[:1]})")
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{options['url']}: {len(everything)} requests, {len(errors)} errors in {elapsed:.1f}s, "
+            f"concurrency {options['concurrency']}"
+        ))
+        self.report('all', everything, elapsed)
+        for path in paths:
+            if latencies[path]:
+                self.report(path, latencies[path], elapsed)
+
+    def login(self, url, email, password):
+        conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        conn.request(
+            'POST', '/api/login/', body=json.dumps({'email': email, 'password': password}),
+            headers={'Content-Type': 'application/json'}
+        )
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        if response.status != 200:
+            raise CommandError(f"Login failed with HTTP {response.status}")
+        cookies = SimpleCookie()
+        for header in response.headers.get_all('Set-Cookie') or []:
+            cookies.load(header)
+        return '; '.join(f"{name}={morsel.value}" for name, morsel in cookies.items())
+
+    def report(self, label, latencies, elapsed):
+        latencies = sorted(latencies)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f"  {label:<32} {len(latencies) / elapsed:8.1f} req/s  "
+            f"p50 {statistics.median(latencies) * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms"
+        )
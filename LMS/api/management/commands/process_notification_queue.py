@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.notifications import process_fanout_queue
+
+
+class Command(BaseCommand):
+    help = 'Expand queued staff notifications (NOTIFICATION_QUEUE_FANOUT) into per-staff rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=100, help='Fan-outs to process per pass')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the queue instead of exiting')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_fanout_queue(limit=options['batch'])
+            if processed:
+                self.stdout.write(f"Processed {processed} queued notifications")
+            if not options['loop']:
+                break
+            if processed < options['batch']:
+                time.sleep(options['interval'])
@@ -0,0 +1,74 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.notifications import expire_notifications, trim_notifications, users_over_cap
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete read notifications older than the retention period and trim users '
+        'over the per-user cap, in batches, archiving them to gzip JSON-lines files'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.NOTIFICATION_RETENTION_DAYS,
+            help='Remove read notifications older than this many days'
+        )
+        parser.add_argument(
+            '--max-per-user', type=int, default=settings.NOTIFICATION_MAX_PER_USER,
+            help='Keep at most this many notifications per user (0 = no cap)'
+        )
+        parser.add_argument('--batch', type=int, default=1000, help='Notifications to remove per transaction')
+        parser.add_argument(
+            '--archive-dir', default=settings.NOTIFICATION_ARCHIVE_DIR,
+            help='Directory for notifications-<date>.jsonl.gz archives'
+        )
+        parser.add_argument('--no-archive', action='store_true', help='Delete without archiving')
+        parser.add_argument('--loop', action='store_true', help='Keep purging periodically instead of exiting')
+        parser.add_argument('--interval', type=float, default=3600.0, help='Seconds between runs with --loop')
+
+    def handle(self, *args, **options):
+        archive_dir = None if options['no_archive'] else options['archive_dir']
+        while True:
+            self.purge(options, archive_dir)
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def purge(self, options, archive_dir):
+        started = time.monotonic()
+        cutoff = timezone.now() - timedelta(days=options['days'])
+
+        expired = self.drain(lambda: expire_notifications(cutoff, options['batch'], archive_dir))
+        self.stdout.write(f"Removed {expired} read notifications older than {options['days']} days")
+
+        trimmed = 0
+        if options['max_per_user']:
+            users = users_over_cap(options['max_per_user'])
+            for user_id in users:
+                trimmed += self.drain(
+                    lambda: trim_notifications(user_id, options['max_per_user'], options['batch'], archive_dir)
+                )
+            self.stdout.write(
+                f"Removed {trimmed} notifications from {len(users)} users over {options['max_per_user']}"
+            )
+
+        elapsed = time.monotonic() - started
+        destination = f"archived to {archive_dir}" if archive_dir else 'not archived'
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {expired + trimmed} notifications ({destination}) in {elapsed:.2f}s"
+        ))
+        return expired + trimmed
+
+    def drain(self, remove_batch):
+        total = 0
+        while True:
+            removed = remove_batch()
+            if not removed:
+                return total
+            total += removed
@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from api.models import LOAN_COUNTERS, BookIssue, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the per-user loan counters from BookIssue in batches, '
+        'report any drift and correct it'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1000, help='Users to check per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without correcting it')
+        parser.add_argument('--show', type=int, default=10, help='Drifted users to list')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        fields = list(LOAN_COUNTERS.values())
+        checked = drifted = 0
+        last_pk = 0
+
+        while True:
+            with transaction.atomic():
+                # Locked so loans can't change between the count and the write
+                users = list(
+                    User.objects.select_for_update()
+                    .filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .only('pk', 'email', *fields)[:options['batch']]
+                )
+                if not users:
+                    break
+                last_pk = users[-1].pk
+
+                counts = {
+                    row.pop('user'): row
+                    for row in BookIssue.objects.filter(user__in=users)
+                    .order_by()
+                    .values('user')
+                    .annotate(**{
+                        field: Count('pk', filter=Q(status=status))
+                        for status, field in LOAN_COUNTERS.items()
+                    })
+                }
+
+                wrong = []
+                for user in users:
+                    actual = counts.get(user.pk, dict.fromkeys(fields, 0))
+                    diff = {
+                        field: (getattr(user, field), actual[field])
+                        for field in fields if getattr(user, field) != actual[field]
+                    }
+                    if not diff:
+                        continue
+                    if drifted < options['show']:
+                        self.stdout.write(f"{user.email}: " + ', '.join(
+                            f"{field} {stored} -> {actual}" for field, (stored, actual) in diff.items()
+                        ))
+                    drifted += 1
+                    for field, (_, value) in diff.items():
+                        setattr(user, field, value)
+                    wrong.append(user)
+
+                if wrong and not options['dry_run']:
+                    User.objects.bulk_update(wrong, fields)
+            checked += len(users)
+
+        elapsed = time.monotonic() - started
+        action = 'found' if options['dry_run'] else 'corrected'
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} users, {action} drift on {drifted} ({elapsed:.2f}s)"
+        ))
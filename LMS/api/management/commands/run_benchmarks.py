@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+
+from api.benchmarks import SCENARIOS, dataset_size, generate_dataset, parse_scale, run_scenario
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic library in a throwaway test database, drive the benchmark '
+        'scenarios against it with concurrent in-process clients and write the results as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', default='10k', help='Loans to generate: 10k, 1m, 10m or a number')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the dataset and the request plans')
+        parser.add_argument(
+            '--scenarios', default=','.join(SCENARIOS), help='Comma-separated scenarios, run in the order given'
+        )
+        parser.add_argument('--requests', type=int, default=500, help='Requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--output', help='Results file (default benchmarks/<scale>-<timestamp>.json)')
+        parser.add_argument('--compare', help='Earlier results file to report changes against')
+        parser.add_argument(
+            '--data-dir', help='Keep the generated SQLite dataset here and start later runs from a copy of it'
+        )
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))} (choose from {', '.join(SCENARIOS)})")
+        try:
+            loans = parse_scale(options['scale'])
+        except ValueError:
+            raise CommandError(f"Invalid --scale {options['scale']!r}")
+        if options['data_dir'] and connection.vendor != 'sqlite':
+            raise CommandError('--data-dir copies the SQLite database file and needs a SQLite default database')
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                previous = json.load(f)['scenarios']
+
+        # Same isolation as the test runner: a fresh test database and private
+        # caches, so nothing from the development database or cache leaks in
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        request_logger = logging.getLogger('django.request')
+        log_level = request_logger.level
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                CACHES={
+                    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'benchmark-{alias}'}
+                    for alias in settings.CACHES
+                },
+                REQUEST_METRICS_SLOW_MS=None,
+            ):
+                dataset = self.prepare_dataset(loans, options)
+                # Expected 4xx responses (e.g. no copies left) would otherwise be
+                # logged one by one. Set after generating, which reconfigures logging.
+                request_logger.setLevel(logging.ERROR)
+                results = {}
+                for name in scenarios:
+                    results[name] = run_scenario(name, options['requests'], options['concurrency'], options['seed'])
+                    self.report(name, results[name], (previous or {}).get(name))
+        finally:
+            request_logger.setLevel(log_level)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        started = timezone.now()
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'benchmarks', f"{options['scale']}-{started:%Y%m%d-%H%M%S}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump({
+                'created': started.isoformat(),
+                'commit': self.git_commit(),
+                'environment': {
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'database': connection.vendor,
+                    'cpus': os.cpu_count(),
+                },
+                'scale': options['scale'],
+                'seed': options['seed'],
+                'dataset': dataset,
+                'concurrency': options['concurrency'],
+                'requests_per_scenario': options['requests'],
+                'scenarios': results,
+            }, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}"))
+
+    def prepare_dataset(self, loans, options):
+        snapshot = None
+        if options['data_dir']:
+            os.makedirs(options['data_dir'], exist_ok=True)
+            snapshot = os.path.join(options['data_dir'], f"lms-{loans}-seed{options['seed']}.sqlite3")
+            if os.path.exists(snapshot):
+                connection.close()
+                shutil.copyfile(snapshot, connection.settings_dict['NAME'])
+                call_command('migrate', verbosity=0)
+                self.stdout.write(f"Restored the dataset from {snapshot}")
+                return dataset_size(loans)
+
+        size = generate_dataset(loans, options['seed'], self.stdout)
+        if snapshot:
+            connection.close()
+            shutil.copyfile(connection.settings_dict['NAME'], snapshot)
+            self.stdout.write(f"Saved the dataset to {snapshot}")
+        return size
+
+    def report(self, name, result, previous):
+        line = (
+            f"{name:<10} {result['requests']:6} requests {result['throughput']:8.1f} req/s  "
+            f"p50 {result.get('p50_ms', 0):7.1f} ms  p95 {result.get('p95_ms', 0):7.1f} ms  "
+            f"p99 {result.get('p99_ms', 0):7.1f} ms  {result['queries_per_request']:5.2f} queries/request"
+        )
+        if result['errors']:
+            line += f"  {result['errors']} errors"
+        if previous and previous.get('throughput') and previous.get('p95_ms'):
+            line += (
+                f"  (throughput {self.change(result['throughput'], previous['throughput'])}, "
+                f"p95 {self.change(result.get('p95_ms', 0), previous['p95_ms'])})"
+            )
+        self.stdout.write(line)
+
+    def change(self, current, previous):
+        return f"{(current - previous) / previous * 100:+.1f}%"
+
+    def git_commit(self):
+        try:
+            result = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True
+            )
+        except OSError:
+            return None
+        return result.stdout.strip() or None
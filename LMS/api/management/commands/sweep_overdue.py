@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import BookIssue
+
+
+class Command(BaseCommand):
+    help = 'Mark past-due ISSUED loans as OVERDUE in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1000, help='Loans to update per UPDATE statement')
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping periodically instead of exiting')
+        parser.add_argument('--interval', type=float, default=300.0, help='Seconds between sweeps with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            self.sweep(options['batch'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def sweep(self, batch_size):
+        now = timezone.now()
+        started = time.monotonic()
+        total = batches = 0
+
+        while True:
+            updated = BookIssue.sweep_overdue(now=now, batch_size=batch_size)
+            if not updated:
+                break
+            total += updated
+            batches += 1
+            rate = total / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f"Batch {batches}: {updated} loans marked overdue "
+                f"({total} total, {rate:.0f} loans/s)"
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Marked {total} loans overdue in {batches} batches ({elapsed:.2f}s)"
+        ))
+        return total
@@ -0,0 +1,218 @@
+"""
+Per-request instrumentation: wall time, database queries, database time and
+response size for each view, kept as in-process histograms.
+
+RequestMetricsMiddleware records every request while ``REQUEST_METRICS`` is
+on, and ``metrics_view`` serves the histograms in the Prometheus text format.
+Each server process keeps its own histograms, so with several workers each
+scrape sees one worker. Requests slower than ``REQUEST_METRICS_SLOW_MS`` are
+logged to the ``api.metrics`` logger together with their SQL.
+
+Queries are counted by a database execute wrapper that reads the current
+request from a context variable, so queries made from async views (which run
+in worker threads) are attributed to the right request.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# name, help, buckets; in the order RequestMetricsMiddleware.record observes them
+HISTOGRAMS = (
+    ('lms_request_duration_seconds', 'Wall time per request', SECONDS_BUCKETS),
+    ('lms_request_queries', 'Database queries per request', QUERY_BUCKETS),
+    ('lms_request_db_seconds', 'Database time per request', SECONDS_BUCKETS),
+    ('lms_response_bytes', 'Response body size (streaming responses excluded)', BYTES_BUCKETS),
+)
+
+# Statements kept per request for the slow request log
+MAX_LOGGED_QUERIES = 50
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf overflow; made cumulative on render
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+        self.responses = Counter()
+
+    def record(self, view, method, status, values):
+        key = (view, method)
+        with self.lock:
+            histograms = self.series.get(key)
+            if histograms is None:
+                histograms = self.series[key] = [Histogram(buckets) for _, _, buckets in HISTOGRAMS]
+            for histogram, value in zip(histograms, values):
+                if value is not None:
+                    histogram.observe(value)
+            self.responses[key + (status,)] += 1
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+            self.responses.clear()
+
+    def render(self):
+        with self.lock:
+            series = {key: [(list(h.counts), h.sum) for h in histograms] for key, histograms in self.series.items()}
+            responses = dict(self.responses)
+
+        lines = [
+            '# HELP lms_requests_total Requests by view, method and status',
+            '# TYPE lms_requests_total counter',
+        ]
+        for (view, method, status), count in sorted(responses.items()):
+            lines.append(f'lms_requests_total{{{labels(view, method)},status="{status}"}} {count}')
+
+        for i, (name, help_text, buckets) in enumerate(HISTOGRAMS):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (view, method), histograms in sorted(series.items()):
+                counts, total = histograms[i]
+                base = labels(view, method)
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{base},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{base}}} {total}')
+                lines.append(f'{name}_count{{{base}}} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def labels(view, method):
+    view = view.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'view="{view}",method="{method}"'
+
+
+registry = MetricsRegistry()
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'sql')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.sql = []
+
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.db_time += elapsed
+        if len(stats.sql) < MAX_LOGGED_QUERIES:
+            stats.sql.append((sql, elapsed))
+
+
+def instrument(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def connection_opened(sender, connection, **kwargs):
+    instrument(connection)
+
+
+class RequestMetricsMiddleware:
+    """Records each request into ``registry``; removed when REQUEST_METRICS is off."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        slow_ms = getattr(settings, 'REQUEST_METRICS_SLOW_MS', None)
+        self.slow = None if slow_ms is None else slow_ms / 1000
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Connections opened after startup are instrumented by connection_opened
+        # (see apps.py); this covers ones opened earlier in this thread
+        for connection in connections.all(initialized_only=True):
+            instrument(connection)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, stats, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        # Named by route rather than path so ids don't multiply the series
+        view = match.view_name if match else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        registry.record(
+            view, request.method, response.status_code, (elapsed, stats.queries, stats.db_time, size)
+        )
+
+        if self.slow is not None and elapsed >= self.slow:
+            logger.warning(
+                "Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms\n%s",
+                request.method, request.get_full_path(), view, elapsed * 1000,
+                stats.queries, stats.db_time * 1000,
+                '\n'.join(f"  {duration * 1000:7.1f} ms  {sql}" for sql, duration in stats.sql)
+            )
+
+
+def metrics_view(request):
+    """Prometheus text exposition of ``registry``, for REQUEST_METRICS_ALLOWED_IPS or staff."""
+    if request.META.get('REMOTE_ADDR') not in settings.REQUEST_METRICS_ALLOWED_IPS:
+        if getattr(request.user, 'user_type', None) not in ['STAFF', 'ADMIN']:
+            return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
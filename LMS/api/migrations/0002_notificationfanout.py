@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 02:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('ISSUE_REQUEST', 'Issue Request'), ('ISSUED', 'Issued'), ('RETURNED', 'Returned'), ('OVERDUE', 'Overdue')], max_length=15),
+        ),
+        migrations.CreateModel(
+            name='NotificationFanout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message', models.TextField()),
+                ('notification_type', models.CharField(choices=[('ISSUE_REQUEST', 'Issue Request'), ('ISSUED', 'Issued'), ('RETURNED', 'Returned'), ('OVERDUE', 'Overdue')], max_length=15)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('book_issue', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.bookissue')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
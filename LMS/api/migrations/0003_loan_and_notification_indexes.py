@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_notificationfanout'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookissue',
+            index=models.Index(fields=['status', 'due_date'], name='bookissue_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookissue',
+            index=models.Index(fields=['user', 'status'], name='bookissue_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookissue',
+            index=models.Index(fields=['user', '-request_date'], name='bookissue_user_request_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookissue',
+            index=models.Index(fields=['-request_date'], name='bookissue_request_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookissue',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['REQUESTED', 'ISSUED'])), fields=('user', 'book'), name='unique_active_loan_per_user_book'),
+        ),
+    ]
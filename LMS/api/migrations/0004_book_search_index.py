@@ -0,0 +1,79 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE api_book_fts USING fts5(
+        title, author, isbn, genre, description,
+        content='api_book', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER api_book_fts_insert AFTER INSERT ON api_book BEGIN
+        INSERT INTO api_book_fts(rowid, title, author, isbn, genre, description)
+        VALUES (new.id, new.title, new.author, new.isbn, new.genre, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER api_book_fts_delete AFTER DELETE ON api_book BEGIN
+        INSERT INTO api_book_fts(api_book_fts, rowid, title, author, isbn, genre, description)
+        VALUES ('delete', old.id, old.title, old.author, old.isbn, old.genre, old.description);
+    END
+    """,
+    # Only searchable columns, so available_copies updates skip the index
+    """
+    CREATE TRIGGER api_book_fts_update AFTER UPDATE OF title, author, isbn, genre, description ON api_book BEGIN
+        INSERT INTO api_book_fts(api_book_fts, rowid, title, author, isbn, genre, description)
+        VALUES ('delete', old.id, old.title, old.author, old.isbn, old.genre, old.description);
+        INSERT INTO api_book_fts(rowid, title, author, isbn, genre, description)
+        VALUES (new.id, new.title, new.author, new.isbn, new.genre, new.description);
+    END
+    """,
+    "INSERT INTO api_book_fts(api_book_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS api_book_fts_update',
+    'DROP TRIGGER IF EXISTS api_book_fts_delete',
+    'DROP TRIGGER IF EXISTS api_book_fts_insert',
+    'DROP TABLE IF EXISTS api_book_fts',
+]
+
+# Must match PostgresSearchBackend.vector()
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX book_search_gin ON api_book USING gin ((
+        setweight(to_tsvector('english'::regconfig, COALESCE((title)::text, '')), 'A')
+        || setweight(to_tsvector('english'::regconfig, COALESCE((isbn)::text, '')), 'A')
+        || setweight(to_tsvector('english'::regconfig, COALESCE((author)::text, '')), 'B')
+        || setweight(to_tsvector('english'::regconfig, COALESCE((genre)::text, '')), 'C')
+        || setweight(to_tsvector('english'::regconfig, COALESCE((description)::text, '')), 'D')
+    ))
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS book_search_gin',
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_loan_and_notification_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run_for_vendor({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2 on 2026-10-18 03:29
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_loans(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    BookIssue = apps.get_model('api', 'BookIssue')
+
+    def loans(status):
+        return Coalesce(Subquery(
+            BookIssue.objects.filter(user=OuterRef('pk'), status=status)
+            .order_by()
+            .values('user')
+            .annotate(count=Count('pk'))
+            .values('count')
+        ), 0)
+
+    User.objects.update(
+        requested_loan_count=loans('REQUESTED'),
+        issued_loan_count=loans('ISSUED'),
+        overdue_loan_count=loans('OVERDUE'),
+        returned_loan_count=loans('RETURNED'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_notification_retention_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='issued_loan_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='overdue_loan_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='requested_loan_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='returned_loan_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_loans, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-18 03:50
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def build_stats(apps, schema_editor):
+    Book = apps.get_model('api', 'Book')
+    CatalogStat = apps.get_model('api', 'CatalogStat')
+    counts = {
+        'books': Count('pk'),
+        'available_books': Count('pk', filter=Q(available_copies__gt=0)),
+        'total_copies': Coalesce(Sum('total_copies'), 0),
+        'available_copies': Coalesce(Sum('available_copies'), 0),
+    }
+
+    rows = [CatalogStat(dimension='all', key='', **Book.objects.aggregate(**counts))]
+    for dimension in ['genre', 'author']:
+        rows += [
+            CatalogStat(dimension=dimension, key=row.pop(dimension), **row)
+            for row in Book.objects.order_by().values(dimension).annotate(**counts)
+        ]
+    CatalogStat.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_hold_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('all', 'All books'), ('genre', 'Genre'), ('author', 'Author')], max_length=10)),
+                ('key', models.CharField(blank=True, max_length=100)),
+                ('books', models.IntegerField(default=0)),
+                ('available_books', models.IntegerField(default=0)),
+                ('total_copies', models.IntegerField(default=0)),
+                ('available_copies', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['dimension', 'key'],
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'key'), name='unique_catalog_stat')],
+            },
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_catalog_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookissue',
+            index=models.Index(fields=['status', '-request_date'], name='bookissue_status_request_idx'),
+        ),
+    ]
@@ -1,8 +1,15 @@
-from django.db import models
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import AbstractUser, BaseUserManager, Group, Permission
 from django.utils import timezone
 from datetime import timedelta
 
+from .cache import bump_book_versions, invalidate_staff_stats
+
 # Create your models here.
 
 class UserManager(BaseUserManager):
@@ -40,6 +47,13 @@ class User(AbstractUser):
     
     email = models.EmailField(unique=True)
     user_type = models.CharField(max_length=10, choices=USER_TYPE_CHOICES, default='MEMBER')
+    # Denormalized; maintained by api.notifications, never set directly
+    unread_notification_count = models.PositiveIntegerField(default=0)
+    # Denormalized loan counts by status; maintained by BookIssue, never set directly
+    requested_loan_count = models.PositiveIntegerField(default=0)
+    issued_loan_count = models.PositiveIntegerField(default=0)
+    overdue_loan_count = models.PositiveIntegerField(default=0)
+    returned_loan_count = models.PositiveIntegerField(default=0)
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name']
@@ -73,6 +87,47 @@ class Book(models.Model):
     @property
     def is_available(self):
         return self.available_copies > 0
+    
+    def serve_holds(self):
+        """
+        Issue copies in stock to the oldest holds, for stock that arrived
+        without a return (a staff edit of the copy counts). Returns the new
+        loans.
+        """
+        if not Hold.objects.filter(book_id=self.pk).exists():
+            return []
+        with transaction.atomic():
+            # The lock return_book and request_issue take around the queue
+            available = Book.objects.select_for_update().values_list(
+                'available_copies', flat=True
+            ).get(pk=self.pk)
+            loans = Hold.promote(self.pk, available) if available > 0 else []
+            if loans:
+                BookIssue._adjust_available_copies({self.pk: len(loans)}, -1)
+        self.available_copies = available - len(loans)
+        return loans
+
+# The User counter for each BookIssue status; rejected requests aren't counted
+LOAN_COUNTERS = {
+    'REQUESTED': 'requested_loan_count',
+    'ISSUED': 'issued_loan_count',
+    'OVERDUE': 'overdue_loan_count',
+    'RETURNED': 'returned_loan_count',
+}
+
+def over_loan_limit(user_id, book_id):
+    """
+    Whether the member has reached MEMBER_LOAN_LIMIT before taking
+    ``book_id``: active requests and loans plus holds on other books.
+    """
+    if settings.MEMBER_LOAN_LIMIT is None:
+        return False
+    # Read the counters fresh; request.user may come from the user cache
+    loans = User.objects.filter(pk=user_id).values_list(
+        F('requested_loan_count') + F('issued_loan_count') + F('overdue_loan_count'), flat=True
+    ).first() or 0
+    holds = Hold.objects.filter(user_id=user_id).exclude(book_id=book_id).count()
+    return loans + holds >= settings.MEMBER_LOAN_LIMIT
 
 class BookIssue(models.Model):
     STATUS_CHOICES = (
@@ -94,58 +149,406 @@ class BookIssue(models.Model):
     
     class Meta:
         ordering = ['-request_date']
+        indexes = [
+            # overdue listing and the sweep_overdue command
+            models.Index(fields=['status', 'due_date'], name='bookissue_status_due_idx'),
+            # member dashboard counts
+            models.Index(fields=['user', 'status'], name='bookissue_user_status_idx'),
+            # keyset pagination of the issue lists
+            models.Index(fields=['user', '-request_date'], name='bookissue_user_request_idx'),
+            models.Index(fields=['-request_date'], name='bookissue_request_idx'),
+            # admin changelist filtered by status, newest first
+            models.Index(fields=['status', '-request_date'], name='bookissue_status_request_idx'),
+        ]
+        constraints = [
+            # Also serves the active-loan lookup in request_issue
+            models.UniqueConstraint(
+                fields=['user', 'book'],
+                condition=models.Q(status__in=['REQUESTED', 'ISSUED']),
+                name='unique_active_loan_per_user_book'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.book.title} - {self.user.get_full_name()} ({self.status})"
     
     def issue_book(self, issued_by):
-        if self.book.available_copies <= 0:
-            raise ValueError("No copies available for issue")
+        from .catalog_stats import record_stock_change
         
-        self.issue_date = timezone.now()
-        self.due_date = timezone.now() + timedelta(days=14)  # 2 weeks by default
-        self.status = 'ISSUED'
-        self.save()
+        # Both the status transition and the stock decrement are conditional
+        # UPDATEs, so concurrent approvals can neither double-issue a request
+        # nor drive available_copies below zero.
+        now = timezone.now()
+        due_date = now + timedelta(days=14)  # 2 weeks by default
+        
+        with transaction.atomic():
+            claimed = BookIssue.objects.filter(pk=self.pk, status='REQUESTED').update(
+                status='ISSUED', issue_date=now, due_date=due_date
+            )
+            if not claimed:
+                raise ValueError("Only requested books can be issued")
+            
+            # Update available copies
+            decremented = Book.objects.filter(pk=self.book_id, available_copies__gt=0).update(
+                available_copies=F('available_copies') - 1
+            )
+            if not decremented:
+                raise ValueError("No copies available for issue")
+            record_stock_change({self.book_id: -1})
+            
+            self._move_loan_counts({self.user_id: 1}, 'REQUESTED', 'ISSUED')
         
-        # Update available copies
-        self.book.available_copies -= 1
-        self.book.save()
+        # Queryset updates bypass post_save, so invalidate by hand
+        invalidate_staff_stats()
+        bump_book_versions([self.book_id])
+        
+        self.issue_date = now
+        self.due_date = due_date
+        self.status = 'ISSUED'
+        self.book.refresh_from_db(fields=['available_copies'])
         
         return True
     
     def return_book(self):
-        if self.status != 'ISSUED' and self.status != 'OVERDUE':
-            raise ValueError("Book not issued or already returned")
+        from .catalog_stats import record_stock_change
+        
+        now = timezone.now()
         
-        self.return_date = timezone.now()
+        with transaction.atomic():
+            # Lock the row to learn which counter the loan leaves
+            previous = BookIssue.objects.select_for_update().filter(
+                pk=self.pk, status__in=['ISSUED', 'OVERDUE']
+            ).values_list('status', flat=True).first()
+            if previous is None:
+                raise ValueError("Book not issued or already returned")
+            
+            BookIssue.objects.filter(pk=self.pk).update(status='RETURNED', return_date=now)
+            self._move_loan_counts({self.user_id: 1}, previous, 'RETURNED')
+            
+            # Lock the book first; request_issue joins the queue under the same
+            # lock, so a hold can't slip in after the queue was found empty
+            list(Book.objects.select_for_update().filter(pk=self.book_id).values_list('pk'))
+            # The freed copy goes to the oldest hold, else back into stock
+            if not Hold.promote(self.book_id, 1, now):
+                Book.objects.filter(pk=self.book_id).update(
+                    available_copies=F('available_copies') + 1
+                )
+                record_stock_change({self.book_id: 1})
+        
+        invalidate_staff_stats()
+        bump_book_versions([self.book_id])
+        
+        self.return_date = now
         self.status = 'RETURNED'
-        self.save()
+        self.book.refresh_from_db(fields=['available_copies'])
+        
+        return True
+    
+    def reject_request(self):
+        with transaction.atomic():
+            claimed = BookIssue.objects.filter(pk=self.pk, status='REQUESTED').update(status='REJECTED')
+            if not claimed:
+                raise ValueError("Only requested books can be rejected")
+            self._move_loan_counts({self.user_id: 1}, 'REQUESTED', 'REJECTED')
         
-        # Update available copies
-        self.book.available_copies += 1
-        self.book.save()
+        invalidate_staff_stats()
+        self.status = 'REJECTED'
         
         return True
     
     def reissue_book(self):
-        if self.status != 'ISSUED' and self.status != 'OVERDUE':
-            raise ValueError("Book not issued or already returned")
-        
-        if self.reissue_count >= 3:
+        # One conditional UPDATE, so a stale instance can't write back a
+        # status the loan has since left (e.g. reopen a returned loan)
+        extended = BookIssue.objects.filter(
+            pk=self.pk, status__in=['ISSUED', 'OVERDUE'], reissue_count__lt=3
+        ).update(
+            due_date=F('due_date') + timedelta(days=7),  # Extend by 1 week
+            reissue_count=F('reissue_count') + 1
+        )
+        if not extended:
+            current = BookIssue.objects.filter(pk=self.pk).values_list('status', flat=True).first()
+            if current not in ['ISSUED', 'OVERDUE']:
+                raise ValueError("Book not issued or already returned")
             raise ValueError("Maximum reissue limit reached")
         
-        self.due_date = self.due_date + timedelta(days=7)  # Extend by 1 week
-        self.reissue_count += 1
-        self.save()
+        invalidate_staff_stats()
+        self.refresh_from_db(fields=['status', 'due_date', 'reissue_count'])
         
         return True
     
     def check_if_overdue(self):
         if self.status == 'ISSUED' and self.due_date and timezone.now() > self.due_date:
+            with transaction.atomic():
+                if not BookIssue.objects.filter(pk=self.pk, status='ISSUED').update(status='OVERDUE'):
+                    return False
+                self._move_loan_counts({self.user_id: 1}, 'ISSUED', 'OVERDUE')
+            invalidate_staff_stats()
             self.status = 'OVERDUE'
-            self.save()
             return True
         return False
+    
+    @classmethod
+    def bulk_issue(cls, ids, issued_by):
+        """
+        Issue many requests in one transaction with set-based updates.
+        
+        Requests are served oldest first while copies last. Returns the ids
+        that were issued and a dict of error messages for the rest.
+        """
+        now = timezone.now()
+        errors = {}
+        
+        with transaction.atomic():
+            requested = list(
+                cls.objects.select_for_update()
+                .filter(pk__in=ids, status='REQUESTED')
+                .order_by('request_date', 'pk')
+                .values_list('pk', 'book_id', 'user_id')
+            )
+            available = dict(
+                Book.objects.select_for_update()
+                .filter(pk__in={book_id for _, book_id, _ in requested})
+                .values_list('pk', 'available_copies')
+            )
+            
+            issued = []
+            per_book = Counter()
+            per_user = Counter()
+            for pk, book_id, user_id in requested:
+                if per_book[book_id] < available[book_id]:
+                    issued.append(pk)
+                    per_book[book_id] += 1
+                    per_user[user_id] += 1
+                else:
+                    errors[pk] = "No copies available for issue"
+            
+            cls.objects.filter(pk__in=issued).update(
+                status='ISSUED', issue_date=now, due_date=now + timedelta(days=14)
+            )
+            cls._adjust_available_copies(per_book, -1)
+            cls._move_loan_counts(per_user, 'REQUESTED', 'ISSUED')
+        
+        for pk in set(ids) - set(issued) - set(errors):
+            errors[pk] = "Only requested books can be issued"
+        invalidate_staff_stats()
+        return issued, errors
+    
+    @classmethod
+    def bulk_return(cls, ids):
+        """Return many issued books in one transaction; see bulk_issue."""
+        now = timezone.now()
+        
+        with transaction.atomic():
+            returnable = list(
+                cls.objects.select_for_update()
+                .filter(pk__in=ids, status__in=['ISSUED', 'OVERDUE'])
+                .values_list('pk', 'book_id', 'user_id', 'status')
+            )
+            returned = [pk for pk, _, _, _ in returnable]
+            cls.objects.filter(pk__in=returned).update(status='RETURNED', return_date=now)
+            freed = Counter(book_id for _, book_id, _, _ in returnable)
+            list(Book.objects.select_for_update().filter(pk__in=freed).values_list('pk'))
+            for book_id in Hold.objects.filter(book_id__in=freed).values_list('book_id', flat=True).distinct():
+                freed[book_id] -= len(Hold.promote(book_id, freed[book_id], now))
+            cls._adjust_available_copies(+freed, 1)
+            for previous in ['ISSUED', 'OVERDUE']:
+                cls._move_loan_counts(
+                    Counter(user_id for _, _, user_id, status in returnable if status == previous),
+                    previous, 'RETURNED'
+                )
+        
+        errors = {pk: "Book not issued or already returned" for pk in set(ids) - set(returned)}
+        invalidate_staff_stats()
+        return returned, errors
+    
+    @classmethod
+    def bulk_reject(cls, ids):
+        """Reject many requests in one transaction; see bulk_issue."""
+        with transaction.atomic():
+            requested = list(
+                cls.objects.select_for_update()
+                .filter(pk__in=ids, status='REQUESTED')
+                .values_list('pk', 'user_id')
+            )
+            rejected = [pk for pk, _ in requested]
+            cls.objects.filter(pk__in=rejected).update(status='REJECTED')
+            cls._move_loan_counts(Counter(user_id for _, user_id in requested), 'REQUESTED', 'REJECTED')
+        
+        errors = {pk: "Only requested books can be rejected" for pk in set(ids) - set(rejected)}
+        invalidate_staff_stats()
+        return rejected, errors
+    
+    @staticmethod
+    def _adjust_available_copies(per_book, sign):
+        from .catalog_stats import record_stock_change
+        
+        # One UPDATE per distinct count rather than one per book
+        by_count = defaultdict(list)
+        for book_id, count in per_book.items():
+            by_count[count].append(book_id)
+        for count, book_ids in by_count.items():
+            Book.objects.filter(pk__in=book_ids).update(
+                available_copies=F('available_copies') + sign * count
+            )
+        record_stock_change({book_id: sign * count for book_id, count in per_book.items()})
+        bump_book_versions(per_book)
+    
+    @staticmethod
+    def _move_loan_counts(per_user, previous, status):
+        """
+        Move ``per_user`` loans from the ``previous`` status counter to the
+        ``status`` one on each User; either may be None for created and
+        deleted loans. Like _adjust_available_copies, one UPDATE per distinct
+        count, and part of the caller's transaction.
+        """
+        by_count = defaultdict(list)
+        for user_id, count in per_user.items():
+            if count:
+                by_count[count].append(user_id)
+        for count, user_ids in by_count.items():
+            changes = {}
+            if previous in LOAN_COUNTERS:
+                field = LOAN_COUNTERS[previous]
+                changes[field] = Greatest(F(field) - count, 0)
+            if status in LOAN_COUNTERS:
+                field = LOAN_COUNTERS[status]
+                changes[field] = F(field) + count
+            if changes:
+                User.objects.filter(pk__in=user_ids).update(**changes)
+    
+    @classmethod
+    def sweep_overdue(cls, now=None, batch_size=1000):
+        """
+        Mark one batch of past-due ISSUED loans as OVERDUE with a single UPDATE.
+        
+        Returns the number of loans updated; call repeatedly until it returns 0.
+        """
+        now = now or timezone.now()
+        with transaction.atomic():
+            due = list(
+                cls.objects.select_for_update()
+                .filter(status='ISSUED', due_date__lt=now)
+                .order_by()
+                .values_list('pk', 'user_id')[:batch_size]
+            )
+            if not due:
+                return 0
+            updated = cls.objects.filter(pk__in=[pk for pk, _ in due]).update(status='OVERDUE')
+            cls._move_loan_counts(Counter(user_id for _, user_id in due), 'ISSUED', 'OVERDUE')
+        invalidate_staff_stats()
+        return updated
+
+class HoldQuerySet(models.QuerySet):
+    def with_position(self):
+        """Annotate each hold's 1-based place in its book's queue."""
+        ahead = (
+            Hold.objects.filter(book=OuterRef('book'), pk__lte=OuterRef('pk'))
+            .order_by()
+            .values('book')
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        return self.annotate(position=Subquery(ahead))
+
+class Hold(models.Model):
+    """
+    A member's place in the FIFO queue for a book with no copies left.
+    
+    The queue order is the primary key, so joining the queue is an INSERT,
+    the head is a seek on (book, id) and serving it is a DELETE; a position
+    is a count over the same index (see with_position). return_book and
+    bulk_return hand freed copies to the head of the queue in their own
+    transaction.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='holds')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='holds')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = HoldQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['pk']
+        indexes = [
+            models.Index(fields=['book', 'id'], name='hold_queue_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'book'], name='unique_hold_per_user_book'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.book.title}"
+    
+    @classmethod
+    def promote(cls, book_id, copies, now=None):
+        """
+        Issue up to ``copies`` freed copies of a book to the oldest holds, as
+        part of the caller's transaction, and notify the holders. Holders at
+        MEMBER_LOAN_LIMIT are passed over but keep their place. Returns the
+        new loans; the caller puts any copies left over back into stock.
+        """
+        from .notifications import notify_bulk
+        
+        now = now or timezone.now()
+        loans = []
+        passed_over = []
+        while len(loans) < copies:
+            hold = cls.objects.select_for_update().filter(book_id=book_id).exclude(
+                pk__in=passed_over
+            ).order_by('pk').first()
+            if hold is None:
+                break
+            # Members who got a copy some other way meanwhile just leave the queue
+            if BookIssue.objects.filter(
+                user_id=hold.user_id, book_id=book_id, status__in=['REQUESTED', 'ISSUED']
+            ).exists():
+                hold.delete()
+                continue
+            if over_loan_limit(hold.user_id, book_id):
+                passed_over.append(hold.pk)
+                continue
+            hold.delete()
+            loans.append(BookIssue.objects.create(
+                book_id=book_id, user_id=hold.user_id, status='ISSUED',
+                issue_date=now, due_date=now + timedelta(days=14)
+            ))
+        
+        if loans:
+            title = Book.objects.values_list('title', flat=True).get(pk=book_id)
+            notify_bulk([
+                Notification(
+                    user_id=loan.user_id, book_issue=loan, notification_type='ISSUED',
+                    message=f"'{title}' is now issued to you from your hold. Due date: {loan.due_date.strftime('%Y-%m-%d')}"
+                )
+                for loan in loans
+            ])
+        return loans
+
+class CatalogStat(models.Model):
+    """
+    Book and copy counts for the whole catalog (dimension 'all'), one genre or
+    one author. Maintained by api.catalog_stats, never set directly.
+    """
+    DIMENSION_CHOICES = (
+        ('all', 'All books'),
+        ('genre', 'Genre'),
+        ('author', 'Author'),
+    )
+    
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=100, blank=True)
+    books = models.IntegerField(default=0)
+    available_books = models.IntegerField(default=0)
+    total_copies = models.IntegerField(default=0)
+    available_copies = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['dimension', 'key']
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key'], name='unique_catalog_stat'),
+        ]
+    
+    def __str__(self):
+        return f"{self.dimension}:{self.key} ({self.books} books)"
 
 class Notification(models.Model):
     NOTIFICATION_TYPES = (
@@ -164,6 +567,37 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+            # Retention scans for old read rows (see purge_notifications)
+            models.Index(
+                fields=['created_at'], condition=models.Q(is_read=True), name='notification_read_created_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.notification_type} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+    
+    def delete(self, *args, **kwargs):
+        from .notifications import settle_unread
+        
+        # Bulk and cascade deletes settle the counter themselves (see settle_unread)
+        with transaction.atomic():
+            settle_unread(Notification.objects.filter(pk=self.pk))
+            return super().delete(*args, **kwargs)
+
+class NotificationFanout(models.Model):
+    """
+    A pending staff-wide notification, expanded into one Notification per
+    staff member by the ``process_notification_queue`` worker.
+    """
+    message = models.TextField()
+    notification_type = models.CharField(max_length=15, choices=Notification.NOTIFICATION_TYPES)
+    book_issue = models.ForeignKey(BookIssue, on_delete=models.CASCADE, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.notification_type} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
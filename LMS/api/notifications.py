@@ -0,0 +1,215 @@
+import gzip
+import json
+import os
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import User, Notification, NotificationFanout
+from .pubsub import get_pubsub
+from .serializers import NotificationSerializer
+
+FANOUT_BATCH_SIZE = 500
+NOTIFICATION_CHANNEL = 'notifications:{}'
+ARCHIVE_FIELDS = ['id', 'user_id', 'message', 'created_at', 'is_read', 'notification_type', 'book_issue_id']
+
+
+def notify(user, message, notification_type, book_issue=None):
+    """Send a notification to a single user."""
+    return Notification.objects.create(
+        user=user,
+        message=message,
+        notification_type=notification_type,
+        book_issue=book_issue
+    )
+
+
+def notify_staff(message, notification_type, book_issue=None):
+    """
+    Send a notification to every STAFF/ADMIN user.
+
+    With ``NOTIFICATION_QUEUE_FANOUT`` enabled this only records a single
+    NotificationFanout row, leaving the per-staff inserts to the
+    ``process_notification_queue`` worker.
+    """
+    if getattr(settings, 'NOTIFICATION_QUEUE_FANOUT', False):
+        NotificationFanout.objects.create(
+            message=message,
+            notification_type=notification_type,
+            book_issue=book_issue
+        )
+        return []
+    return fan_out(message, notification_type, book_issue.pk if book_issue else None)
+
+
+def notify_bulk(notifications):
+    """Insert unsaved Notification instances with batched INSERTs."""
+    created = Notification.objects.bulk_create(notifications, batch_size=FANOUT_BATCH_SIZE)
+    # bulk_create sends no post_save, so do what the signal handler would
+    record_created(created)
+    return created
+
+
+def record_created(notifications):
+    """Count new notifications as unread and push them to open streams."""
+    adjust_unread_counts(Counter(n.user_id for n in notifications if not n.is_read), 1)
+    publish(notifications)
+
+
+def mark_as_read(user, notification_ids=None):
+    """
+    Mark the user's unread notifications (all, or those in ``notification_ids``)
+    as read and decrement the unread counter by as many. Returns that number.
+    """
+    with transaction.atomic():
+        unread = Notification.objects.filter(user=user, is_read=False)
+        if notification_ids is not None:
+            unread = unread.filter(pk__in=notification_ids)
+        updated = unread.update(is_read=True)
+        adjust_unread_counts({user.pk: updated}, -1)
+    return updated
+
+
+def adjust_unread_counts(per_user, sign):
+    # One UPDATE per distinct count rather than one per user
+    by_count = defaultdict(list)
+    for user_id, count in per_user.items():
+        if count:
+            by_count[count].append(user_id)
+    for count, user_ids in by_count.items():
+        User.objects.filter(pk__in=user_ids).update(
+            unread_notification_count=Greatest(F('unread_notification_count') + sign * count, 0)
+        )
+
+
+def settle_unread(notifications):
+    """
+    Take the unread rows of ``notifications`` off their recipients' unread
+    counters, before the rows are deleted. Notification deletes fire no
+    signals, so queryset deletes stay single statements; every path that
+    deletes them in bulk settles the counters with this (or by hand) first.
+    """
+    adjust_unread_counts(Counter(notifications.filter(is_read=False).values_list('user_id', flat=True)), -1)
+
+
+def unread_count(user):
+    # Read fresh: the counter changes by queryset updates, which the cached
+    # request.user (see backends.py) doesn't see
+    return User.objects.filter(pk=user.pk).values_list('unread_notification_count', flat=True).first() or 0
+
+
+def publish(notifications):
+    """Push notifications to their recipients' open streams once the transaction commits."""
+    messages = [
+        (NOTIFICATION_CHANNEL.format(notification.user_id), dict(NotificationSerializer(notification).data))
+        for notification in notifications
+    ]
+
+    def send():
+        pubsub = get_pubsub()
+        for channel, message in messages:
+            pubsub.publish(channel, message)
+    transaction.on_commit(send)
+
+
+def fan_out(message, notification_type, book_issue_id=None):
+    staff_ids = User.objects.filter(user_type__in=['STAFF', 'ADMIN']).values_list('id', flat=True)
+    return notify_bulk([
+        Notification(
+            user_id=staff_id,
+            message=message,
+            notification_type=notification_type,
+            book_issue_id=book_issue_id
+        )
+        for staff_id in staff_ids
+    ])
+
+
+def process_fanout_queue(limit=100):
+    """
+    Expand up to ``limit`` queued fan-outs, oldest first.
+
+    Each entry is expanded and deleted in its own transaction, so a crash
+    never loses or duplicates a fan-out. Returns the number processed.
+    """
+    processed = 0
+    while processed < limit:
+        with transaction.atomic():
+            entry = (
+                NotificationFanout.objects.select_for_update(skip_locked=True)
+                .order_by('id')
+                .first()
+            )
+            if entry is None:
+                break
+            fan_out(entry.message, entry.notification_type, entry.book_issue_id)
+            entry.delete()
+        processed += 1
+    return processed
+
+
+def expire_notifications(cutoff, batch_size=1000, archive_dir=None):
+    """
+    Remove one batch of read notifications created before ``cutoff``.
+
+    Returns the number removed; call repeatedly until it returns 0.
+    """
+    ids = list(
+        Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+        .order_by()
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    return remove_notifications(ids, archive_dir)
+
+
+def users_over_cap(cap):
+    return list(
+        Notification.objects.order_by().values('user')
+        .annotate(count=Count('pk')).filter(count__gt=cap)
+        .values_list('user', flat=True)
+    )
+
+
+def trim_notifications(user_id, cap, batch_size=1000, archive_dir=None):
+    """
+    Remove one batch of a user's notifications beyond the newest ``cap``,
+    read or not. Returns the number removed; call until it returns 0.
+    """
+    ids = list(
+        Notification.objects.filter(user_id=user_id)
+        .order_by('-created_at', '-pk')
+        .values_list('pk', flat=True)[cap:cap + batch_size]
+    )
+    return remove_notifications(ids, archive_dir)
+
+
+def remove_notifications(ids, archive_dir=None):
+    if not ids:
+        return 0
+    with transaction.atomic():
+        rows = list(Notification.objects.filter(pk__in=ids).values(*ARCHIVE_FIELDS))
+        if archive_dir:
+            # Written before the delete commits: a crash in between archives a
+            # batch twice rather than losing it
+            archive_rows(rows, archive_dir)
+        # Settled from the rows already read; the delete is one statement
+        adjust_unread_counts(Counter(row['user_id'] for row in rows if not row['is_read']), -1)
+        Notification.objects.filter(pk__in=ids).delete()
+    return len(rows)
+
+
+def archive_rows(rows, archive_dir):
+    """Append rows to the day's gzip JSON-lines archive as one gzip member."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"notifications-{timezone.now():%Y-%m-%d}.jsonl.gz")
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='ab') as archive:
+            for row in rows:
+                archive.write(json.dumps(row, default=str).encode() + b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    return path
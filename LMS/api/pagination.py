@@ -0,0 +1,98 @@
+from asgiref.sync import sync_to_async
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over each list's natural ordering.
+
+    The ordering comes from the view's ``ordering`` attribute, then the model's
+    ``Meta.ordering``, falling back to newest-first by primary key. Clients can
+    pass ``?page_size=all`` to opt out of pagination for exports.
+
+    ``apaginate_queryset`` is the same pagination for async views: DRF's
+    ``paginate_queryset`` run in a worker thread, where its one query runs.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-pk'
+    all_pages_value = 'all'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.page_size_query_param) == self.all_pages_value:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'ordering', None) or queryset.model._meta.ordering or self.ordering
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+
+def estimated_count(queryset):
+    """
+    Rows in the table behind an unfiltered ``queryset`` without counting them:
+    the planner's ``reltuples`` on PostgreSQL, the highest primary key on
+    SQLite (an upper bound, exact until rows are deleted). None when the
+    database keeps no such figure.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        # -1 until the table is first vacuumed or analyzed
+        return int(row[0]) if row and row[0] >= 0 else None
+    if connection.vendor == 'sqlite' and queryset.model._meta.pk.get_internal_type().endswith('AutoField'):
+        return queryset.order_by().aggregate(last=Max('pk'))['last'] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that never counts a whole large table.
+
+    An unfiltered changelist takes its size from ``estimated_count``; a
+    filtered or searched one counts at most ``count_limit`` rows. Tables and
+    results under the limit get their exact count, so small lists paginate
+    as before; past it, the page links end at the estimate or the limit.
+    """
+    count_limit = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return super().count
+        if not queryset.query.has_filters():
+            estimate = estimated_count(queryset)
+            if estimate is not None and estimate > self.count_limit:
+                return estimate
+        return queryset.order_by()[:self.count_limit].count()
+
+    def page(self, number):
+        page = super().page(number)
+        rows = page.object_list
+        # Past the first page, find the page's keys first, which the ordering
+        # index alone can answer, then load just those rows and their joins
+        # instead of joining every row the OFFSET skips
+        if hasattr(rows, 'query') and rows.query.low_mark:
+            page.object_list = self.object_list.filter(pk__in=list(rows.values_list('pk', flat=True)))
+        return page
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BasePubSub:
+    """
+    Publish/subscribe channel for pushing events to open streams.
+
+    ``publish`` is called from ordinary (sync) request code; ``subscribe``
+    is awaited by async stream views and returns a Subscription whose ``get``
+    they await. Once ``subscribe`` returns, every later ``publish`` to the
+    channel reaches the subscription. Messages are JSON-serializable dicts.
+    """
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    async def subscribe(self, channel):
+        raise NotImplementedError
+
+
+class Subscription:
+    def __init__(self, unsubscribe=None):
+        self.queue = asyncio.Queue()
+        self.loop = asyncio.get_running_loop()
+        self.unsubscribe = unsubscribe
+
+    def put(self, message):
+        # Safe to call from any thread
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def close(self):
+        if self.unsubscribe:
+            await self.unsubscribe()
+
+
+class InProcessPubSub(BasePubSub):
+    """
+    Delivers messages to subscribers in the same process only, so it suits a
+    single ASGI worker process (or the development server). Run several
+    workers with a shared backend such as RedisPubSub.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscribers = list(self.subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+
+    async def subscribe(self, channel):
+        subscription = None
+
+        async def unsubscribe():
+            with self.lock:
+                subscribers = self.subscribers.get(channel, set())
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self.subscribers.pop(channel, None)
+
+        subscription = Subscription(unsubscribe)
+        with self.lock:
+            self.subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+
+class RedisPubSub(BasePubSub):
+    """
+    Redis pub/sub backend for multi-process deployments. Needs redis-py
+    (``pip install redis``) and ``NOTIFICATION_PUBSUB_URL``.
+    """
+
+    def __init__(self):
+        import redis
+
+        self.url = settings.NOTIFICATION_PUBSUB_URL
+        self.client = redis.Redis.from_url(self.url)
+
+    def publish(self, channel, message):
+        self.client.publish(channel, json.dumps(message))
+
+    async def subscribe(self, channel):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+
+        async def unsubscribe():
+            reader.cancel()
+            await pubsub.unsubscribe(channel)
+            await pubsub.aclose()
+            await client.aclose()
+
+        subscription = Subscription(unsubscribe)
+        # Wait for the server to confirm, so the caller's catch-up query
+        # can't run before messages start arriving
+        await pubsub.subscribe(channel)
+        await pubsub.get_message(timeout=None)
+
+        async def read():
+            async for item in pubsub.listen():
+                subscription.queue.put_nowait(json.loads(item['data']))
+
+        reader = asyncio.ensure_future(read())
+        return subscription
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_pubsub():
+    """The process-wide backend named by ``NOTIFICATION_PUBSUB_BACKEND``."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            path = getattr(settings, 'NOTIFICATION_PUBSUB_BACKEND', 'api.pubsub.InProcessPubSub')
+            _backend = import_string(path)()
+        return _backend
@@ -0,0 +1,221 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils.module_loading import import_string
+
+from .models import Book
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+class BaseSearchBackend:
+    """
+    Catalog search over title, author, ISBN, genre and description.
+
+    ``search`` returns ranked Book ids for one page of results plus the total
+    match count; ``facets`` returns genre and availability counts for every
+    match. Every query term is prefix-matched and all terms must match.
+    """
+
+    def search(self, query, genre=None, available=None, limit=20, offset=0):
+        raise NotImplementedError
+
+    def facets(self, query):
+        raise NotImplementedError
+
+    def rebuild(self):
+        """Rebuild the index from the Book table."""
+
+    def filtered_books(self, genre=None, available=None):
+        books = Book.objects.all()
+        if genre:
+            books = books.filter(genre=genre)
+        if available is True:
+            books = books.filter(available_copies__gt=0)
+        elif available is False:
+            books = books.filter(available_copies=0)
+        return books
+
+    def facet_counts(self, books):
+        rows = books.order_by().values('genre').annotate(
+            count=Count('pk'),
+            available=Count('pk', filter=Q(available_copies__gt=0))
+        )
+        return self.format_facets((row['genre'], row['count'], row['available']) for row in rows)
+
+    def format_facets(self, rows):
+        genres = []
+        available = total = 0
+        for genre, count, available_count in rows:
+            genres.append({'value': genre, 'count': count})
+            total += count
+            available += available_count or 0
+        genres.sort(key=lambda facet: (-facet['count'], facet['value']))
+        return {
+            'genre': genres,
+            'availability': {'available': available, 'unavailable': total - available},
+        }
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    SQLite FTS5 backend.
+
+    ``api_book_fts`` is an external-content FTS5 table over ``api_book`` kept
+    in sync by triggers (see migration 0004), so bulk inserts and queryset
+    updates are indexed without any Python-side hooks.
+    """
+    # bm25 column weights: title, author, isbn, genre, description
+    weights = (10.0, 5.0, 10.0, 2.0, 1.0)
+
+    def match_expression(self, query):
+        # Quote every term so user input cannot inject FTS5 query syntax
+        return ' '.join(f'"{term}"*' for term in tokenize(query))
+
+    def search(self, query, genre=None, available=None, limit=20, offset=0):
+        match = self.match_expression(query)
+        if not match:
+            return [], 0
+
+        filters = []
+        if genre:
+            # The column phrase lets FTS narrow the matches; the join keeps it exact
+            genre_terms = ' '.join(tokenize(genre))
+            if genre_terms:
+                match += f' genre : "{genre_terms}"'
+            filters.append('b.genre = %s')
+        params = [match] + ([genre] if genre else [])
+        if available is True:
+            filters.append('b.available_copies > 0')
+        elif available is False:
+            filters.append('b.available_copies = 0')
+        where = ' AND '.join(['api_book_fts MATCH %s'] + filters)
+        joined = f'FROM api_book_fts JOIN api_book b ON b.id = api_book_fts.rowid WHERE {where}'
+        weights = ', '.join(str(weight) for weight in self.weights)
+
+        with connection.cursor() as cursor:
+            # Every match is ranked, so any page agrees with the count
+            cursor.execute(
+                f'SELECT b.id {joined} ORDER BY bm25(api_book_fts, {weights}), b.id LIMIT %s OFFSET %s',
+                params + [limit, offset]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if offset == 0 and len(ids) < limit:
+                return ids, len(ids)
+            if filters:
+                cursor.execute(f'SELECT COUNT(*) {joined}', params)
+            else:
+                cursor.execute('SELECT COUNT(*) FROM api_book_fts WHERE api_book_fts MATCH %s', params)
+            return ids, cursor.fetchone()[0]
+
+    def facets(self, query):
+        match = self.match_expression(query)
+        if not match:
+            return self.format_facets([])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT b.genre, COUNT(*), SUM(b.available_copies > 0) '
+                'FROM api_book_fts JOIN api_book b ON b.id = api_book_fts.rowid '
+                'WHERE api_book_fts MATCH %s GROUP BY b.genre',
+                [match]
+            )
+            return self.format_facets(cursor.fetchall())
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO api_book_fts(api_book_fts) VALUES ('rebuild')")
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    PostgreSQL full-text backend, served by the ``book_search_gin`` index
+    (see migration 0004). The vector expression here must match the index.
+    """
+    config = 'english'
+
+    def vector(self):
+        from django.contrib.postgres.search import SearchVector
+
+        return (
+            SearchVector('title', weight='A', config=self.config)
+            + SearchVector('isbn', weight='A', config=self.config)
+            + SearchVector('author', weight='B', config=self.config)
+            + SearchVector('genre', weight='C', config=self.config)
+            + SearchVector('description', weight='D', config=self.config)
+        )
+
+    def matching(self, query, books):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        terms = tokenize(query)
+        if not terms:
+            return None
+        search_query = SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms), search_type='raw', config=self.config
+        )
+        vector = self.vector()
+        return books.annotate(search=vector).filter(search=search_query).annotate(
+            rank=SearchRank(vector, search_query)
+        )
+
+    def search(self, query, genre=None, available=None, limit=20, offset=0):
+        books = self.matching(query, self.filtered_books(genre, available))
+        if books is None:
+            return [], 0
+        ids = list(books.order_by('-rank', 'pk').values_list('pk', flat=True)[offset:offset + limit])
+        return ids, books.count()
+
+    def facets(self, query):
+        books = self.matching(query, Book.objects.all())
+        if books is None:
+            return self.format_facets([])
+        return self.facet_counts(books)
+
+
+class ORMSearchBackend(BaseSearchBackend):
+    """Unindexed ``icontains`` fallback for databases without a full-text backend."""
+    fields = ['title', 'author', 'isbn', 'genre', 'description']
+
+    def matching(self, query, books):
+        terms = tokenize(query)
+        if not terms:
+            return None
+        for term in terms:
+            match = Q()
+            for field in self.fields:
+                match |= Q(**{f'{field}__icontains': term})
+            books = books.filter(match)
+        return books
+
+    def search(self, query, genre=None, available=None, limit=20, offset=0):
+        books = self.matching(query, self.filtered_books(genre, available))
+        if books is None:
+            return [], 0
+        ids = list(books.order_by('title', 'pk').values_list('pk', flat=True)[offset:offset + limit])
+        return ids, books.count()
+
+    def facets(self, query):
+        books = self.matching(query, Book.objects.all())
+        if books is None:
+            return self.format_facets([])
+        return self.facet_counts(books)
+
+
+DEFAULT_BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    """The backend named by ``BOOK_SEARCH_BACKEND``, or the default for the database vendor."""
+    path = getattr(settings, 'BOOK_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    return DEFAULT_BACKENDS.get(connection.vendor, ORMSearchBackend)()
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import User, Book, BookIssue, Notification
+from .models import User, Book, BookIssue, CatalogStat, Hold, Notification
 from django.contrib.auth import authenticate
 
 class UserSerializer(serializers.ModelSerializer):
@@ -50,7 +50,33 @@ class BookIssueSerializer(serializers.ModelSerializer):
             'request_date', 'issue_date', 'due_date', 'return_date', 
             'status', 'reissue_count'
         ]
-        read_only_fields = ['issue_date', 'due_date', 'return_date', 'reissue_count']
+        # Status changes go through the issue actions, which keep stock,
+        # holds and the counters in step
+        read_only_fields = ['issue_date', 'due_date', 'return_date', 'status', 'reissue_count']
+    
+    def run_validators(self, value):
+        # The one-active-loan validator is conditioned on status, which
+        # clients can't send: new loans start REQUESTED, others keep theirs
+        if self.instance is not None:
+            status = self.instance.status
+        else:
+            status = BookIssue._meta.get_field('status').default
+        super().run_validators({'status': status, **value})
+
+class HoldSerializer(serializers.ModelSerializer):
+    book_title = serializers.ReadOnlyField(source='book.title')
+    # Annotated by Hold.objects.with_position()
+    position = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = Hold
+        fields = ['id', 'book', 'user', 'book_title', 'created_at', 'position']
+        read_only_fields = ['book', 'user']
+
+class CatalogStatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CatalogStat
+        fields = ['dimension', 'key', 'books', 'available_books', 'total_copies', 'available_copies']
 
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,87 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .catalog_stats import BOOK_FIELDS, record_book_change
+from .cache import bump_book_membership, bump_book_versions, invalidate_staff_stats, invalidate_user
+from .models import User, Book, BookIssue, Notification
+from .notifications import record_created, settle_unread
+
+
+@receiver([post_save, post_delete], sender=Book)
+@receiver([post_save, post_delete], sender=BookIssue)
+def catalog_changed(sender, **kwargs):
+    invalidate_staff_stats()
+
+
+@receiver(post_save, sender=BookIssue)
+def loan_saved(sender, instance, created=False, **kwargs):
+    # Status transitions adjust the counters where they happen (see models.py)
+    if created:
+        BookIssue._move_loan_counts({instance.user_id: 1}, None, instance.status)
+
+
+@receiver(post_delete, sender=BookIssue)
+def loan_deleted(sender, instance, **kwargs):
+    BookIssue._move_loan_counts({instance.user_id: 1}, instance.status, None)
+
+
+@receiver(pre_delete, sender=BookIssue)
+def loan_deleting(sender, instance, **kwargs):
+    # The loan's notifications go in the cascade, as one DELETE without signals
+    settle_unread(Notification.objects.filter(book_issue=instance))
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, created=False, **kwargs):
+    bump_book_versions([instance.pk])
+    if created:
+        bump_book_membership()
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    bump_book_versions([instance.pk])
+    bump_book_membership()
+
+
+@receiver([pre_save, pre_delete], sender=Book)
+def book_changing(sender, instance, **kwargs):
+    # The stored row, since the instance may be stale; the post_ handlers apply the difference
+    instance._catalog_before = None
+    if instance.pk is not None:
+        instance._catalog_before = Book.objects.filter(pk=instance.pk).values_list(*BOOK_FIELDS).first()
+
+
+@receiver(post_save, sender=Book)
+def book_stats_saved(sender, instance, update_fields=None, **kwargs):
+    before = getattr(instance, '_catalog_before', None)
+    after = [getattr(instance, field) for field in BOOK_FIELDS]
+    if before is not None and update_fields is not None:
+        # Fields left out of update_fields keep their stored values
+        after = [value if field in update_fields else stored for field, value, stored in zip(BOOK_FIELDS, after, before)]
+    record_book_change(before, tuple(after))
+
+
+@receiver(post_delete, sender=Book)
+def book_stats_deleted(sender, instance, **kwargs):
+    record_book_change(getattr(instance, '_catalog_before', None), None)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=User)
+def member_changed(sender, update_fields=None, **kwargs):
+    # Logins save last_login only and do not affect the member count
+    if update_fields is None or 'user_type' in update_fields:
+        invalidate_staff_stats()
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=Notification)
+def notification_created(sender, instance, created=False, **kwargs):
+    if created:
+        record_created([instance])
+
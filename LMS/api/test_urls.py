@@ -0,0 +1,6 @@
+"""URLconf for the async view tests: the async read views in front of the usual routes."""
+from django.urls import include, path
+
+from . import urls as api_urls
+
+urlpatterns = [path('api/', include(api_urls.async_urlpatterns + api_urls.urlpatterns))]
@@ -1,3 +1,1674 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import gzip
+import json
+import math
+import os
+import tempfile
+import threading
+from array import array
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.contrib.auth.hashers import verify_password
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import analytics, exports
+from .authentication import SignedTokenAuthentication
+from .benchmarks import generate_dataset, run_scenario
+from .catalog_import import InvalidRecord, build_book, normalize_isbn
+from .catalog_stats import rebuild as rebuild_catalog_stats
+from .hashers import HashingPool
+from .metrics import registry
+from .models import User, Book, BookIssue, CatalogStat, Hold, Notification, NotificationFanout
+from .notifications import notify, notify_bulk, notify_staff, remove_notifications
+from .pagination import EstimatedCountPaginator
+from .pubsub import InProcessPubSub
+
+
+# URLconf for AsyncReadViewTests: the async read views in front of the usual routes
+ASYNC_URLCONF = 'api.test_urls'
+
+
+def make_book(**kwargs):
+    data = {
+        'title': 'The Hobbit',
+        'author': 'J.R.R. Tolkien',
+        'isbn': '9780547928227',
+        'publication_date': datetime.date(1937, 9, 21),
+        'genre': 'Fantasy',
+        'total_copies': 5,
+        'available_copies': 5,
+    }
+    data.update(kwargs)
+    return Book.objects.create(**data)
+
+
+def make_user(email, user_type='MEMBER'):
+    return User.objects.create_user(
+        email=email,
+        username=email.split('@')[0],
+        first_name='Test',
+        last_name=user_type.title(),
+        user_type=user_type
+    )
+
+
+def run_concurrently(targets):
+    """Run each callable in its own thread, collecting results and exceptions."""
+    results = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(targets))
+
+    def worker(target):
+        barrier.wait()
+        try:
+            outcome = target()
+        except Exception as e:
+            outcome = e
+        finally:
+            connection.close()
+        with lock:
+            results.append(outcome)
+
+    threads = [threading.Thread(target=worker, args=(target,)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class IssueReturnTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('staff@example.com', 'STAFF')
+        self.member = make_user('member@example.com')
+        self.book = make_book(total_copies=1, available_copies=1)
+
+    def test_issue_and_return_adjust_available_copies(self):
+        issue = BookIssue.objects.create(book=self.book, user=self.member)
+        issue.issue_book(self.staff)
+        self.assertEqual(issue.book.available_copies, 0)
+        self.assertEqual(BookIssue.objects.get(pk=issue.pk).status, 'ISSUED')
+
+        issue.return_book()
+        self.assertEqual(issue.book.available_copies, 1)
+        self.assertEqual(BookIssue.objects.get(pk=issue.pk).status, 'RETURNED')
+
+    def test_issue_rejected_when_no_copies_left(self):
+        first = BookIssue.objects.create(book=self.book, user=self.member)
+        second = BookIssue.objects.create(book=self.book, user=self.staff)
+        first.issue_book(self.staff)
+
+        with self.assertRaises(ValueError):
+            second.issue_book(self.staff)
+        self.assertEqual(BookIssue.objects.get(pk=second.pk).status, 'REQUESTED')
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+
+    def test_stale_instance_cannot_issue_twice(self):
+        issue = BookIssue.objects.create(book=self.book, user=self.member)
+        stale = BookIssue.objects.get(pk=issue.pk)
+        issue.issue_book(self.staff)
+
+        with self.assertRaises(ValueError):
+            stale.issue_book(self.staff)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+
+
+class ActiveLoanConstraintTests(TestCase):
+    def setUp(self):
+        self.member = make_user('member@example.com')
+        self.book = make_book()
+
+    def test_second_active_loan_for_same_book_rejected(self):
+        BookIssue.objects.create(book=self.book, user=self.member, status='ISSUED')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            BookIssue.objects.create(book=self.book, user=self.member)
+
+    def test_finished_loans_do_not_block_new_requests(self):
+        BookIssue.objects.create(book=self.book, user=self.member, status='RETURNED')
+        BookIssue.objects.create(book=self.book, user=self.member, status='REJECTED')
+        BookIssue.objects.create(book=self.book, user=self.member)
+
+    def test_request_issue_reports_duplicate(self):
+        client = APIClient()
+        client.force_login(self.member)
+        self.assertEqual(client.post(f'/api/books/{self.book.pk}/request_issue/').status_code, 200)
+        response = client.post(f'/api/books/{self.book.pk}/request_issue/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(BookIssue.objects.count(), 1)
+
+
+class IndexBenchmarkTests(TransactionTestCase):
+    # The SQLite schema editor cannot run inside TestCase's transaction
+    def test_index_benchmark_runs(self):
+        out = StringIO()
+        call_command('benchmark_indexes', loans=500, users=50, books=50, repeat=1, stdout=out)
+        self.assertIn('bookissue_status_due_idx', out.getvalue())
+
+
+class BenchmarkSuiteTests(TransactionTestCase):
+    # Scenario workers use their own connections, so the data must be committed
+    def setUp(self):
+        cache.clear()
+
+    def test_generated_dataset_is_consistent_and_scenarios_run(self):
+        size = generate_dataset(1000, seed=1)
+        self.assertEqual(BookIssue.objects.count(), 1000)
+        self.assertEqual(User.objects.filter(email__startswith='bench-member-').count(), size['members'])
+        self.assertFalse(Book.objects.filter(available_copies__gt=F('total_copies')).exists())
+        out = StringIO()
+        call_command('reconcile_loan_counts', dry_run=True, stdout=out)
+        self.assertIn('found drift on 0', out.getvalue())
+
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name in ['browse', 'request', 'return', 'dashboard']:
+                result = run_scenario(name, requests=12, concurrency=3, seed=1)
+                self.assertEqual(result['requests'], 12, name)
+                self.assertEqual(result['errors'], 0, name)
+                self.assertIn('p95_ms', result)
+                self.assertGreater(result['queries_per_request'], 0)
+
+
+class BulkIssueActionTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('staff@example.com', 'STAFF')
+        self.members = [make_user(f'member{i}@example.com') for i in range(4)]
+        self.book = make_book(total_copies=3, available_copies=3)
+        self.other = make_book(isbn='9780441013593', total_copies=1, available_copies=1)
+        self.client = APIClient()
+        self.client.force_login(self.staff)
+        # Fill the session and user caches so query counts compare like for like
+        self.client.get('/api/users/current_user/')
+
+    def post(self, action, ids):
+        return self.client.post(f'/api/book-issues/{action}/', {'ids': ids}, format='json')
+
+    def test_bulk_approve_serves_oldest_requests_while_copies_last(self):
+        requests = [BookIssue.objects.create(book=self.book, user=member) for member in self.members]
+        other = BookIssue.objects.create(book=self.other, user=self.members[0])
+        ids = [issue.pk for issue in requests] + [other.pk, 999999]
+
+        response = self.post('bulk_approve', ids)
+        self.assertEqual(response.status_code, 200)
+        results = {r['id']: r for r in response.json()['results']}
+
+        self.assertEqual([results[issue.pk]['success'] for issue in requests], [True, True, True, False])
+        self.assertEqual(results[requests[3].pk]['error'], 'No copies available for issue')
+        self.assertEqual(results[other.pk]['issue']['status'], 'ISSUED')
+        self.assertEqual(results[999999]['error'], 'Book issue not found')
+        self.book.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.book.available_copies, self.other.available_copies), (0, 0))
+        self.assertEqual(Notification.objects.filter(notification_type='ISSUED').count(), 4)
+
+        again = self.post('bulk_approve', [requests[0].pk]).json()['results'][0]
+        self.assertEqual(again['error'], 'Only requested books can be issued')
+
+    def test_bulk_return_and_reject(self):
+        issued = [BookIssue.objects.create(book=self.book, user=member) for member in self.members[:3]]
+        BookIssue.bulk_issue([issue.pk for issue in issued], self.staff)
+        pending = BookIssue.objects.create(book=self.other, user=self.members[3])
+
+        results = self.post('bulk_return', [issue.pk for issue in issued] + [pending.pk]).json()['results']
+        self.assertEqual([r['success'] for r in results], [True, True, True, False])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 3)
+
+        results = self.post('bulk_reject', [pending.pk, issued[0].pk]).json()['results']
+        self.assertEqual([r['success'] for r in results], [True, False])
+        self.assertEqual(BookIssue.objects.get(pk=pending.pk).status, 'REJECTED')
+
+    def test_failed_notifications_roll_back_the_batch(self):
+        requests = [BookIssue.objects.create(book=self.book, user=member) for member in self.members[:2]]
+
+        with mock.patch('api.views.notify_bulk', side_effect=RuntimeError('broker down')):
+            with self.assertRaises(RuntimeError):
+                self.post('bulk_approve', [issue.pk for issue in requests])
+
+        self.assertEqual(set(BookIssue.objects.values_list('status', flat=True)), {'REQUESTED'})
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 3)
+        self.assertEqual(User.objects.get(pk=self.members[0].pk).requested_loan_count, 1)
+
+    def test_bulk_queries_do_not_grow_with_batch_size(self):
+        def approve_queries(count):
+            ids = []
+            for i in range(count):
+                book = make_book(isbn=f'97811111{len(ids) + count:05d}', total_copies=1, available_copies=1)
+                ids.append(BookIssue.objects.create(book=book, user=self.members[0]).pk)
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.post('bulk_approve', ids).status_code, 200)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(approve_queries(2), approve_queries(30))
+
+    def test_validation_and_permissions(self):
+        self.assertEqual(self.post('bulk_approve', []).status_code, 400)
+        self.assertEqual(self.post('bulk_approve', ['1']).status_code, 400)
+        self.client.force_login(self.members[0])
+        self.assertEqual(self.post('bulk_return', [1]).status_code, 403)
+
+    def test_status_cannot_be_written_directly(self):
+        issue = BookIssue.objects.create(book=self.book, user=self.members[0])
+        response = self.client.patch(f'/api/book-issues/{issue.pk}/', {'status': 'ISSUED'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        issue.refresh_from_db()
+        self.book.refresh_from_db()
+        self.assertEqual(issue.status, 'REQUESTED')
+        self.assertEqual(self.book.available_copies, 3)
+
+        # The one-active-loan check still applies without a status in the request
+        response = self.client.post('/api/book-issues/', {
+            'book': self.book.pk, 'user': self.members[0].pk, 'status': 'RETURNED'
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BookIssueQueryCountTests(TestCase):
+    """List endpoints must cost a constant number of queries regardless of row count."""
+
+    def setUp(self):
+        self.staff = make_user('staff@example.com', 'STAFF')
+        self.member = make_user('member@example.com')
+        self.client = APIClient()
+        self.next_isbn = 9780000000000
+
+    def add_issues(self, count, **fields):
+        for _ in range(count):
+            self.next_isbn += 1
+            book = make_book(isbn=str(self.next_isbn))
+            BookIssue.objects.create(book=book, user=self.member, **fields)
+
+    def count_queries(self, user, url):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, user, url, **fields):
+        self.add_issues(2, **fields)
+        small = self.count_queries(user, url)
+        self.add_issues(20, **fields)
+        large = self.count_queries(user, url)
+        self.assertEqual(small, large)
+
+    def test_staff_list(self):
+        self.assertConstantQueries(self.staff, '/api/book-issues/')
+
+    def test_member_list(self):
+        self.assertConstantQueries(self.member, '/api/book-issues/')
+
+    def test_my_issues(self):
+        self.assertConstantQueries(self.member, '/api/book-issues/my_issues/')
+
+    def test_overdue(self):
+        self.assertConstantQueries(
+            self.staff, '/api/book-issues/overdue/',
+            status='OVERDUE', due_date=timezone.now() - datetime.timedelta(days=1)
+        )
+
+    def test_overdue_is_read_only(self):
+        self.add_issues(3, status='ISSUED', due_date=timezone.now() - datetime.timedelta(days=1))
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/api/book-issues/overdue/').json()['results'], [])
+        self.assertEqual(BookIssue.objects.filter(status='OVERDUE').count(), 0)
+
+        call_command('sweep_overdue', stdout=StringIO())
+        self.assertEqual(len(self.client.get('/api/book-issues/overdue/').json()['results']), 3)
+
+    def test_overdue_pages_oldest_due_first(self):
+        now = timezone.now()
+        for days in [2, 5, 1, 4, 3]:
+            self.add_issues(1, status='OVERDUE', due_date=now - datetime.timedelta(days=days))
+        self.client.force_login(self.staff)
+        first = self.client.get('/api/book-issues/overdue/', {'page_size': 3}).json()
+        second = self.client.get(first['next']).json()
+        due_dates = [issue['due_date'] for issue in first['results'] + second['results']]
+        self.assertEqual(len(due_dates), 5)
+        self.assertEqual(due_dates, sorted(due_dates))
+        self.assertIsNone(second['next'])
+
+
+class OverdueSweepTests(TestCase):
+    def test_sweep_marks_only_past_due_issued_loans(self):
+        member = make_user('member@example.com')
+        now = timezone.now()
+        for i in range(5):
+            BookIssue.objects.create(
+                book=make_book(isbn=f'978000000000{i}'), user=member,
+                status='ISSUED', due_date=now - datetime.timedelta(days=1)
+            )
+        current = BookIssue.objects.create(
+            book=make_book(isbn='9780000000010'), user=member,
+            status='ISSUED', due_date=now + datetime.timedelta(days=1)
+        )
+        returned = BookIssue.objects.create(
+            book=make_book(isbn='9780000000011'), user=member,
+            status='RETURNED', due_date=now - datetime.timedelta(days=1)
+        )
+
+        out = StringIO()
+        call_command('sweep_overdue', batch=2, stdout=out)
+
+        self.assertIn('Marked 5 loans overdue in 3 batches', out.getvalue())
+        self.assertEqual(BookIssue.objects.filter(status='OVERDUE').count(), 5)
+        self.assertEqual(BookIssue.objects.get(pk=current.pk).status, 'ISSUED')
+        self.assertEqual(BookIssue.objects.get(pk=returned.pk).status, 'RETURNED')
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = make_user('staff@example.com', 'STAFF')
+        self.member = make_user('member@example.com')
+        self.book = make_book(total_copies=2, available_copies=2)
+        self.issue = BookIssue.objects.create(book=self.book, user=self.member)
+        self.client = APIClient()
+
+    def get_stats(self, user):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/dashboard-stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [q['sql'] for q in ctx.captured_queries]
+
+    def test_member_stats_read_the_user_counters(self):
+        stats, queries = self.get_stats(self.member)
+        self.assertEqual(stats, {
+            'total_issued': 0, 'total_requested': 1, 'total_returned': 0, 'overdue_books': 0
+        })
+        self.assertFalse([q for q in queries if 'api_bookissue' in q])
+        self.assertEqual(len([q for q in queries if '"total_issued"' in q]), 1)
+
+    def test_staff_stats_are_cached_until_inventory_changes(self):
+        stats, queries = self.get_stats(self.staff)
+        self.assertEqual(stats['pending_requests'], 1)
+        self.assertEqual(stats['available_books'], 1)
+        self.assertEqual(stats['total_users'], 1)
+        # Book counts come from the catalog summary, not a scan of api_book
+        self.assertFalse([q for q in queries if '"api_book"' in q])
+
+        _, cached_queries = self.get_stats(self.staff)
+        self.assertFalse([q for q in cached_queries if 'api_book' in q])
+
+        self.issue.issue_book(self.staff)
+        stats, _ = self.get_stats(self.staff)
+        self.assertEqual(stats['pending_requests'], 0)
+        self.assertEqual(stats['issued_books'], 1)
+
+        make_user('another@example.com')
+        stats, _ = self.get_stats(self.staff)
+        self.assertEqual(stats['total_users'], 2)
+
+
+class BookCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = make_user('staff@example.com', 'STAFF')
+        self.member = make_user('member@example.com')
+        self.book = make_book(total_copies=2, available_copies=2)
+        self.client = APIClient()
+        self.client.force_login(self.member)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [q['sql'] for q in ctx.captured_queries if 'api_book' in q['sql']]
+
+    def test_detail_and_listing_are_served_from_cache(self):
+        detail_url = f'/api/books/{self.book.pk}/'
+        self.get(detail_url)
+        self.get('/api/books/')
+
+        detail, queries = self.get(detail_url)
+        self.assertEqual(detail['title'], 'The Hobbit')
+        self.assertEqual(queries, [])
+        listing, queries = self.get('/api/books/')
+        self.assertEqual([book['id'] for book in listing['results']], [self.book.pk])
+        self.assertEqual(queries, [])
+
+    def test_issue_return_and_save_refresh_the_payload(self):
+        detail_url = f'/api/books/{self.book.pk}/'
+        self.get(detail_url)
+
+        issue = BookIssue.objects.create(book=self.book, user=self.member)
+        issue.issue_book(self.staff)
+        self.assertEqual(self.get(detail_url)[0]['available_copies'], 1)
+        issue.return_book()
+        self.assertEqual(self.get(detail_url)[0]['available_copies'], 2)
+
+        BookIssue.bulk_issue([BookIssue.objects.create(book=self.book, user=self.staff).pk], self.staff)
+        self.assertEqual(self.get('/api/books/')[0]['results'][0]['available_copies'], 1)
+
+        self.book.refresh_from_db()
+        self.book.title = 'The Hobbit, or There and Back Again'
+        self.book.save()
+        self.assertEqual(self.get(detail_url)[0]['title'], self.book.title)
+
+    def test_create_and_delete_refresh_the_listing(self):
+        self.get('/api/books/')
+        second = make_book(title='Dune', isbn='9780441172719')
+        ids = [book['id'] for book in self.get('/api/books/')[0]['results']]
+        self.assertEqual(ids, [second.pk, self.book.pk])
+
+        second.delete()
+        ids = [book['id'] for book in self.get('/api/books/')[0]['results']]
+        self.assertEqual(ids, [self.book.pk])
+        self.assertEqual(self.client.get(f'/api/books/{second.pk}/').status_code, 404)
+
+    def test_import_retires_cached_books(self):
+        self.get(f'/api/books/{self.book.pk}/')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'books.jsonl')
+            with open(path, 'w') as f:
+                f.write(json.dumps({
+                    'title': 'The Hobbit (Illustrated)', 'author': 'J.R.R. Tolkien',
+                    'isbn': self.book.isbn, 'publication_date': '1937'
+                }) + '\n')
+            call_command('import_books', path, stdout=StringIO())
+        detail, _ = self.get(f'/api/books/{self.book.pk}/')
+        self.assertEqual(detail['title'], 'The Hobbit (Illustrated)')
+
+
+class AuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.member = make_user('member@example.com')
+        self.client = APIClient()
+
+    def test_cached_sessions_and_user_need_no_queries(self):
+        self.client.force_login(self.member)
+        self.client.get('/api/users/current_user/')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/users/current_user/')
+        self.assertEqual(response.json()['email'], 'member@example.com')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        self.member.user_type = 'STAFF'
+        self.member.save()
+        self.assertEqual(self.client.get('/api/users/current_user/').json()['user_type'], 'STAFF')
+
+    @override_settings(SIGNED_TOKEN_AUTH=True, PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_signed_token_authenticates_until_password_changes(self):
+        self.member.set_password('correct horse battery')
+        self.member.save()
+        response = self.client.post(
+            '/api/login/', {'email': 'member@example.com', 'password': 'correct horse battery'}, format='json'
+        )
+        token = response.json()['token']
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(client.get('/api/users/current_user/').json()['email'], 'member@example.com')
+
+        self.member.set_password('another password')
+        self.member.save()
+        self.assertEqual(client.get('/api/users/current_user/').status_code, 403)
+
+    @override_settings(SIGNED_TOKEN_AUTH=True)
+    def test_tampered_token_is_rejected(self):
+        token = SignedTokenAuthentication.issue_token(self.member)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token[:-1]}x')
+        self.assertEqual(self.client.get('/api/users/current_user/').status_code, 403)
+
+    def test_tokens_are_ignored_unless_enabled(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {SignedTokenAuthentication.issue_token(self.member)}')
+        self.assertEqual(self.client.get('/api/users/current_user/').status_code, 403)
+
+    def login(self, password):
+        return self.client.post('/api/login/', {'email': 'member@example.com', 'password': password}, format='json')
+
+    def test_login_rehashes_when_the_work_factor_changes(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            self.member.set_password('correct horse battery')
+            self.member.save()
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.login('wrong password').status_code, 400)
+            self.member.refresh_from_db()
+            self.assertIn('$1000$', self.member.password)
+
+            self.assertEqual(self.login('correct horse battery').status_code, 200)
+            self.member.refresh_from_db()
+            self.assertTrue(self.member.password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_model_backend_sessions_stay_logged_in(self):
+        self.client.force_login(self.member, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertEqual(self.client.get('/api/users/current_user/').json()['email'], 'member@example.com')
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_rejected_passwords_are_hashed_once(self):
+        self.member.set_password('correct horse battery')
+        self.member.save()
+        with mock.patch('api.backends.verify_password', wraps=verify_password) as verify, \
+                mock.patch('django.contrib.auth.base_user.check_password') as check:
+            self.assertEqual(self.login('wrong password').status_code, 400)
+        self.assertEqual(verify.call_count, 1)
+        check.assert_not_called()
+
+    def test_login_is_refused_when_the_hashing_pool_is_full(self):
+        pool = HashingPool(workers=1, backlog=0, timeout=0)
+        release = threading.Event()
+        pool.submit(release.wait)
+        try:
+            with mock.patch('api.backends.hashing_pool', return_value=pool):
+                response = self.login('anything')
+        finally:
+            release.set()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+
+    def test_benchmark_reports_every_scenario(self):
+        out = StringIO()
+        call_command('benchmark_auth', requests=2, stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
+        self.assertFalse(User.objects.filter(email='auth-benchmark@example.invalid').exists())
+
+        out = StringIO()
+        call_command('benchmark_hashers', iterations='1000', seconds=0.1, stdout=out)
+        self.assertIn('pbkdf2_sha256 1000', out.getvalue())
+
+        with mock.patch('api.management.commands.benchmark_hashers.verify_password', return_value=(False, False)):
+            with self.assertRaises(CommandError):
+                call_command('benchmark_hashers', iterations='1000', seconds=0.1, stdout=StringIO())
+
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = make_user('staff@example.com', 'STAFF')
+        self.member = make_user('member@example.com')
+        for i in range(3):
+            book = make_book(isbn=f'978000000000{i}')
+            BookIssue.objects.create(book=book, user=self.member)
+            Notification.objects.create(user=self.member, message=f'Note {i}', notification_type='ISSUED')
+        self.client = APIClient()
+
+    def compare(self, user, path, **params):
+        self.client.force_login(user)
+        expected = self.client.get(f'/api/{path}', params)
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            response = self.client.get(f'/api/{path}', params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+        return response.json()
+
+    def test_responses_match_the_drf_views(self):
+        book_id = Book.objects.order_by('pk').first().pk
+        self.compare(self.member, 'books/', page_size=2)
+        self.compare(self.member, f'books/{book_id}/')
+        self.compare(self.member, 'books/999999/')
+        self.compare(self.member, 'book-issues/my_issues/')
+        self.compare(self.member, 'book-issues/my_issues/', page_size='all')
+        self.compare(self.member, 'notifications/')
+        self.compare(self.member, 'dashboard-stats/')
+        self.compare(self.staff, 'dashboard-stats/')
+
+    def test_cursor_links_page_through_async_views(self):
+        first = self.compare(self.member, 'books/', page_size=2)
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            second = self.client.get(first['next']).json()
+        self.assertEqual(len(first['results']) + len(second['results']), 3)
+        self.assertIsNone(second['next'])
+
+    def test_book_views_share_the_book_cache(self):
+        book_id = Book.objects.order_by('pk').first().pk
+        self.compare(self.member, 'books/', page_size=2)
+        self.compare(self.member, f'books/{book_id}/')
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF), CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/books/', {'page_size': 2})
+            self.client.get(f'/api/books/{book_id}/')
+        self.assertFalse([q for q in ctx.captured_queries if 'api_book"' in q['sql']])
+
+    @override_settings(ROOT_URLCONF=ASYNC_URLCONF)
+    def test_authentication_and_writes(self):
+        self.assertEqual(self.client.get('/api/books/').status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.post('/api/books/', {
+            'title': 'Dune', 'author': 'Frank Herbert', 'isbn': '9780441172719',
+            'publication_date': '1965-08-01', 'genre': 'Science Fiction'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get(f"/api/books/{response.json()['id']}/").json()['title'], 'Dune')
+
+
+@override_settings(ROOT_URLCONF=ASYNC_URLCONF)
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.member = make_user('member@example.com')
+        self.staff = make_user('staff@example.com', 'STAFF')
+
+    def notify(self, user, message):
+        with self.captureOnCommitCallbacks(execute=True):
+            return notify(user, message, 'ISSUED')
+
+    async def open_stream(self, user, **headers):
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get('/api/notifications/stream/', headers=headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        self.assertEqual(await anext(events), b'retry: 5000\n\n')
+        return events
+
+    async def next_event(self, events):
+        event = (await asyncio.wait_for(anext(events), 2)).decode()
+        fields = dict(line.split(': ', 1) for line in event.strip().splitlines())
+        return fields['id'], json.loads(fields['data'])
+
+    async def test_new_notifications_are_pushed_to_the_recipient(self):
+        events = await self.open_stream(self.member)
+        notification = await sync_to_async(self.notify)(self.member, 'Your book is ready')
+        await sync_to_async(self.notify)(self.staff, 'Not for the member')
+
+        event_id, data = await self.next_event(events)
+        self.assertEqual(event_id, str(notification.pk))
+        self.assertEqual(data['message'], 'Your book is ready')
+        await events.aclose()
+
+    async def test_in_process_pubsub_drops_closed_subscriptions(self):
+        pubsub = InProcessPubSub()
+        subscription = await pubsub.subscribe('channel')
+        pubsub.publish('channel', {'id': 1})
+        self.assertEqual(await subscription.get(), {'id': 1})
+        await subscription.close()
+        self.assertEqual(pubsub.subscribers, {})
+
+    async def test_bulk_fan_out_reaches_staff_streams(self):
+        events = await self.open_stream(self.staff)
+
+        def request_issue():
+            with self.captureOnCommitCallbacks(execute=True):
+                notify_staff('New request', 'ISSUE_REQUEST')
+        await sync_to_async(request_issue)()
+
+        _, data = await self.next_event(events)
+        self.assertEqual(data['message'], 'New request')
+        await events.aclose()
+
+    async def test_reconnect_replays_missed_notifications(self):
+        first = await sync_to_async(self.notify)(self.member, 'First')
+        await sync_to_async(self.notify)(self.member, 'Second')
+
+        events = await self.open_stream(self.member, **{'Last-Event-ID': str(first.pk)})
+        _, data = await self.next_event(events)
+        self.assertEqual(data['message'], 'Second')
+        await events.aclose()
+
+
+class NotificationSyncTests(TestCase):
+    def setUp(self):
+        self.member = make_user('member@example.com')
+        self.notifications = [notify(self.member, f'Note {i}', 'ISSUED') for i in range(5)]
+        self.client = APIClient()
+        self.client.force_login(self.member)
+
+    def unread(self):
+        self.member.refresh_from_db()
+        return self.member.unread_notification_count
+
+    def test_counter_follows_create_read_and_delete(self):
+        self.assertEqual(self.unread(), 5)
+        notify_bulk([Notification(user=self.member, message='Bulk', notification_type='ISSUED')])
+        self.assertEqual(self.unread(), 6)
+
+        pk = self.notifications[0].pk
+        self.client.post(f'/api/notifications/{pk}/mark_as_read/')
+        self.client.post(f'/api/notifications/{pk}/mark_as_read/')
+        self.assertEqual(self.unread(), 5)
+
+        self.notifications[1].delete()
+        self.assertEqual(self.unread(), 4)
+
+        self.client.post('/api/notifications/mark_all_as_read/')
+        self.assertEqual(self.unread(), 0)
+        self.assertFalse(Notification.objects.filter(user=self.member, is_read=False).exists())
+
+    def test_unread_count_is_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/notifications/unread_count/')
+        self.assertEqual(response.json(), {'unread_count': 5})
+        self.assertEqual(len([q for q in ctx.captured_queries if 'api_notification' in q['sql']]), 0)
+
+    def test_sync_pages_forward_from_a_cursor(self):
+        first = self.client.get('/api/notifications/sync/', {'since': 0, 'limit': 3}).json()
+        self.assertEqual([n['message'] for n in first['results']], ['Note 0', 'Note 1', 'Note 2'])
+        self.assertTrue(first['has_more'])
+        self.assertEqual(first['unread_count'], 5)
+
+        rest = self.client.get('/api/notifications/sync/', {'since': first['cursor']}).json()
+        self.assertEqual([n['message'] for n in rest['results']], ['Note 3', 'Note 4'])
+        self.assertFalse(rest['has_more'])
+
+        empty = self.client.get('/api/notifications/sync/', {'since': rest['cursor']}).json()
+        self.assertEqual(empty['results'], [])
+        self.assertEqual(empty['cursor'], rest['cursor'])
+
+    def test_sync_by_time_and_validation(self):
+        since_time = self.notifications[2].created_at.isoformat()
+        response = self.client.get('/api/notifications/sync/', {'since_time': since_time}).json()
+        self.assertEqual([n['message'] for n in response['results']], ['Note 3', 'Note 4'])
+        self.assertEqual(self.client.get('/api/notifications/sync/', {'since': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/notifications/sync/', {'since_time': 'x'}).status_code, 400)
+
+
+class LoanCounterTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('staff@example.com', 'STAFF')
+        self.member = make_user('member@example.com')
+        self.other = make_user('other@example.com')
+
+    def request(self, user=None, **kwargs):
+        return BookIssue.objects.create(
+            book=make_book(isbn=f'978{BookIssue.objects.count():010d}'), user=user or self.member, **kwargs
+        )
+
+    def counts(self, user=None):
+        user = User.objects.get(pk=(user or self.member).pk)
+        return (
+            user.requested_loan_count, user.issued_loan_count,
+            user.overdue_loan_count, user.returned_loan_count
+        )
+
+    def test_transitions_move_loans_between_counters(self):
+        first, second, third = self.request(), self.request(), self.request()
+        self.assertEqual(self.counts(), (3, 0, 0, 0))
+
+        first.issue_book(self.staff)
+        second.reject_request()
+        self.assertEqual(self.counts(), (1, 1, 0, 0))
+
+        first.due_date = timezone.now() - datetime.timedelta(days=1)
+        first.save()
+        self.assertTrue(first.check_if_overdue())
+        self.assertEqual(self.counts(), (1, 0, 1, 0))
+
+        first.return_book()
+        third.delete()
+        self.assertEqual(self.counts(), (0, 0, 0, 1))
+        with self.assertRaises(ValueError):
+            second.reject_request()
+        self.assertEqual(self.counts(), (0, 0, 0, 1))
+
+    def test_bulk_transitions_and_sweep_adjust_each_user(self):
+        mine = [self.request() for _ in range(3)]
+        theirs = [self.request(self.other) for _ in range(2)]
+
+        BookIssue.bulk_issue([issue.pk for issue in mine[:2] + theirs], self.staff)
+        BookIssue.bulk_reject([mine[2].pk])
+        self.assertEqual(self.counts(), (0, 2, 0, 0))
+        self.assertEqual(self.counts(self.other), (0, 2, 0, 0))
+
+        BookIssue.objects.filter(pk=mine[0].pk).update(due_date=timezone.now() - datetime.timedelta(days=1))
+        BookIssue.sweep_overdue()
+        self.assertEqual(self.counts(), (0, 1, 1, 0))
+
+        BookIssue.bulk_return([issue.pk for issue in mine + theirs[:1]])
+        self.assertEqual(self.counts(), (0, 0, 0, 2))
+        self.assertEqual(self.counts(self.other), (0, 1, 0, 1))
+
+    def test_loan_limit_counts_active_loans(self):
+        self.request()
+        self.request(status='RETURNED')
+        client = APIClient()
+        client.force_login(self.member)
+        with override_settings(MEMBER_LOAN_LIMIT=1):
+            response = client.post(f'/api/books/{make_book().pk}/request_issue/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at most 1', response.json()['error'])
+
+    def test_reconcile_reports_and_corrects_drift(self):
+        self.request()
+        self.request(self.other, status='ISSUED')
+        User.objects.filter(pk=self.member.pk).update(requested_loan_count=5, returned_loan_count=2)
+
+        out = StringIO()
+        call_command('reconcile_loan_counts', dry_run=True, batch=2, stdout=out)
+        self.assertIn('requested_loan_count 5 -> 1', out.getvalue())
+        self.assertIn('found drift on 1', out.getvalue())
+        self.assertEqual(self.counts(), (5, 0, 0, 2))
+
+        call_command('reconcile_loan_counts', batch=2, stdout=StringIO())
+        self.assertEqual(self.counts(), (1, 0, 0, 0))
+        self.assertEqual(self.counts(self.other), (0, 1, 0, 0))
+
+
+class HoldQueueTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('staff@example.com', 'STAFF')
+        self.book = make_book(total_copies=1, available_copies=0)
+        self.borrower = make_user('borrower@example.com')
+        self.loan = BookIssue.objects.create(
+            book=self.book, user=self.borrower, status='ISSUED', due_date=timezone.now()
+        )
+        self.first = make_user('first@example.com')
+        self.second = make_user('second@example.com')
+
+    def request(self, user):
+        client = APIClient()
+        client.force_login(user)
+        return client, client.post(f'/api/books/{self.book.pk}/request_issue/')
+
+    def test_unavailable_requests_join_the_queue_in_order(self):
+        _, response = self.request(self.first)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['hold']['position'], 1)
+
+        client, response = self.request(self.second)
+        self.assertEqual(response.json()['hold']['position'], 2)
+        _, response = self.request(self.second)
+        self.assertEqual(response.json()['hold']['position'], 2)
+        self.assertEqual(Hold.objects.count(), 2)
+
+        [hold] = client.get('/api/holds/').json()['results']
+        self.assertEqual(hold['position'], 2)
+        self.assertEqual(client.delete(f"/api/holds/{hold['id']}/").status_code, 204)
+        self.assertFalse(Hold.objects.filter(user=self.second).exists())
+
+    def test_return_issues_the_copy_to_the_oldest_hold(self):
+        self.request(self.first)
+        self.request(self.second)
+
+        self.loan.return_book()
+
+        promoted = BookIssue.objects.get(user=self.first, book=self.book)
+        self.assertEqual(promoted.status, 'ISSUED')
+        self.assertEqual(Book.objects.get(pk=self.book.pk).available_copies, 0)
+        self.assertEqual(Hold.objects.with_position().get(user=self.second).position, 1)
+        self.assertEqual(User.objects.get(pk=self.first.pk).issued_loan_count, 1)
+        self.assertTrue(Notification.objects.filter(user=self.first, book_issue=promoted).exists())
+
+        promoted.return_book()
+        self.assertEqual(BookIssue.objects.get(user=self.second, book=self.book).status, 'ISSUED')
+        BookIssue.objects.get(user=self.second, book=self.book).return_book()
+        self.assertEqual(Book.objects.get(pk=self.book.pk).available_copies, 1)
+
+    def test_bulk_return_serves_holds_and_skips_members_with_a_loan(self):
+        Book.objects.filter(pk=self.book.pk).update(total_copies=3)
+        BookIssue.objects.create(book=self.book, user=self.second, status='ISSUED')
+        third_loan = BookIssue.objects.create(book=self.book, user=make_user('third@example.com'), status='ISSUED')
+        self.request(self.first)
+        Hold.objects.create(book=self.book, user=self.second)
+
+        BookIssue.bulk_return([self.loan.pk, third_loan.pk])
+
+        self.assertTrue(BookIssue.objects.filter(user=self.first, book=self.book, status='ISSUED').exists())
+        self.assertFalse(Hold.objects.exists())
+        # One copy went to the first hold; the second holder already has the
+        # book, so they left the queue and the other copy went back into stock
+        self.assertEqual(Book.objects.get(pk=self.book.pk).available_copies, 1)
+
+
+    @override_settings(MEMBER_LOAN_LIMIT=1)
+    def test_holds_count_toward_the_loan_limit(self):
+        client, response = self.request(self.first)
+        self.assertEqual(response.status_code, 202)
+        # Asking again for the held book only reports the place in the queue
+        self.assertEqual(self.request(self.first)[1].status_code, 202)
+        response = client.post(f'/api/books/{make_book(isbn="9780441013593").pk}/request_issue/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('holds', response.json()['error'])
+
+    def test_holders_at_the_limit_keep_their_place(self):
+        self.request(self.first)
+        self.request(self.second)
+        BookIssue.objects.create(book=make_book(isbn='9780441013593'), user=self.first, status='ISSUED')
+
+        with override_settings(MEMBER_LOAN_LIMIT=1):
+            self.loan.return_book()
+
+        self.assertEqual(BookIssue.objects.get(user=self.second, book=self.book).status, 'ISSUED')
+        self.assertEqual(Hold.objects.with_position().get(user=self.first).position, 1)
+        self.assertFalse(BookIssue.objects.filter(user=self.first, book=self.book).exists())
+
+    def test_copies_added_by_staff_serve_the_queue(self):
+        self.request(self.first)
+        self.request(self.second)
+        client = APIClient()
+        client.force_login(self.staff)
+
+        response = client.patch(
+            f'/api/books/{self.book.pk}/', {'total_copies': 2, 'available_copies': 1}, format='json'
+        )
+        self.assertEqual(response.json()['available_copies'], 0)
+        self.assertEqual(BookIssue.objects.get(user=self.first, book=self.book).status, 'ISSUED')
+        self.assertEqual(Hold.objects.with_position().get(user=self.second).position, 1)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).available_copies, 0)
+        self.assertEqual(CatalogStat.objects.get(dimension='all').available_copies, 0)
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.staff = make_user('staff@example.com', 'STAFF')
+        make_book()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_login(user)
+        return client
+
+    def test_records_histograms_per_view_and_serves_them(self):
+        client = self.client_for(self.staff)
+        client.get('/api/books/')
+        client.get('/api/books/')
+        client.get('/api/no-such-page/')
+
+        response = client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('lms_requests_total{view="book-list",method="GET",status="200"} 2', text)
+        self.assertIn('lms_requests_total{view="unmatched",method="GET",status="404"} 1', text)
+        self.assertIn('lms_request_duration_seconds_count{view="book-list",method="GET"} 2', text)
+        self.assertIn('lms_response_bytes_bucket{view="book-list",method="GET",le="+Inf"} 2', text)
+        queries = [line for line in text.splitlines() if line.startswith('lms_request_queries_sum{view="book-list"')]
+        self.assertEqual(len(queries), 1)
+        self.assertGreater(float(queries[0].split()[-1]), 0)
+
+    def test_metrics_need_an_allowed_address_or_staff(self):
+        with override_settings(REQUEST_METRICS_ALLOWED_IPS=[]):
+            self.assertEqual(self.client_for(make_user('member@example.com')).get('/api/metrics/').status_code, 403)
+            self.assertEqual(self.client_for(self.staff).get('/api/metrics/').status_code, 200)
+
+    @override_settings(REQUEST_METRICS_SLOW_MS=0)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs('api.metrics', 'WARNING') as logs:
+            self.client_for(self.staff).get('/api/books/')
+        self.assertIn('Slow request GET /api/books/ (book-list)', logs.output[0])
+        self.assertIn('FROM "api_book"', logs.output[0])
+
+
+class NotificationRetentionTests(TestCase):
+    def setUp(self):
+        self.member = make_user('member@example.com')
+        self.other = make_user('other@example.com')
+        self.old = timezone.now() - datetime.timedelta(days=100)
+
+    def add(self, user, count, is_read=False, created_at=None):
+        notifications = notify_bulk([
+            Notification(user=user, message=f'Note {i}', notification_type='ISSUED', is_read=is_read)
+            for i in range(count)
+        ])
+        if created_at:
+            Notification.objects.filter(pk__in=[n.pk for n in notifications]).update(created_at=created_at)
+        return notifications
+
+    def purge(self, **options):
+        out = StringIO()
+        call_command('purge_notifications', stdout=out, **options)
+        return out.getvalue()
+
+    def test_expires_old_read_notifications_into_an_archive(self):
+        old_read = self.add(self.member, 5, is_read=True, created_at=self.old)
+        self.add(self.member, 2, created_at=self.old)
+        self.add(self.member, 3, is_read=True)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            out = self.purge(days=90, max_per_user=0, batch=2, archive_dir=tmp)
+            self.assertIn('Removed 5 read notifications', out)
+            [name] = os.listdir(tmp)
+            with gzip.open(os.path.join(tmp, name), 'rt') as f:
+                archived = [json.loads(line) for line in f]
+
+        self.assertCountEqual([row['id'] for row in archived], [n.pk for n in old_read])
+        self.assertEqual(archived[0]['user_id'], self.member.pk)
+        self.assertEqual(Notification.objects.filter(user=self.member).count(), 5)
+
+    def test_caps_notifications_per_user_and_settles_unread_counts(self):
+        self.add(self.member, 4, created_at=self.old)
+        newest = self.add(self.member, 3)
+        self.add(self.other, 2)
+
+        out = self.purge(max_per_user=3, batch=3, no_archive=True)
+        self.assertIn('Removed 4 notifications from 1 users over 3', out)
+        self.assertCountEqual(
+            Notification.objects.filter(user=self.member).values_list('pk', flat=True), [n.pk for n in newest]
+        )
+        self.assertEqual(Notification.objects.filter(user=self.other).count(), 2)
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.unread_notification_count, 3)
+
+
+    def assertSingleDelete(self, ctx):
+        queries = [q['sql'] for q in ctx.captured_queries]
+        self.assertEqual(len([sql for sql in queries if sql.startswith('DELETE FROM "api_notification"')]), 1)
+        # No rows loaded for a per-row delete signal
+        self.assertFalse([sql for sql in queries if sql.startswith('SELECT "api_notification"."id", ')])
+
+    def test_purges_and_cascades_are_single_deletes(self):
+        notifications = self.add(self.member, 3)
+        with CaptureQueriesContext(connection) as ctx:
+            remove_notifications([n.pk for n in notifications[:2]])
+        self.assertSingleDelete(ctx)
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.unread_notification_count, 1)
+
+        # A deleted loan takes its notifications along, settling the counters
+        loan = BookIssue.objects.create(book=make_book(), user=self.member)
+        self.add(self.other, 1)
+        notify_bulk([Notification(user=self.other, message='New', notification_type='ISSUE_REQUEST', book_issue=loan)])
+        with CaptureQueriesContext(connection) as ctx:
+            loan.delete()
+        self.assertSingleDelete(ctx)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.unread_notification_count, 1)
+
+class BookSearchTests(TestCase):
+    def setUp(self):
+        self.member = make_user('member@example.com')
+        self.client = APIClient()
+        self.client.force_login(self.member)
+        self.hobbit = make_book()
+        self.dragons = make_book(
+            title='A History of Dragons', author='Jane Smith', isbn='9780000000001',
+            genre='History', description='Includes a chapter on the hobbit legends.',
+            available_copies=0
+        )
+        self.lotr = make_book(
+            title='The Fellowship of the Ring', author='J.R.R. Tolkien', isbn='9780547928210',
+            genre='Fantasy'
+        )
+
+    def search(self, **params):
+        response = self.client.get('/api/books/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def titles(self, data):
+        return [book['title'] for book in data['results']]
+
+    def test_title_match_ranks_above_description_match(self):
+        data = self.search(q='hobbit')
+        self.assertEqual(self.titles(data), ['The Hobbit', 'A History of Dragons'])
+        self.assertEqual(data['count'], 2)
+
+    def test_every_page_agrees_with_the_count(self):
+        pages = [self.search(q='the', limit=1, offset=offset) for offset in range(4)]
+        self.assertEqual([page['count'] for page in pages], [3, 3, 3, 3])
+        self.assertEqual(sum((self.titles(page) for page in pages[:3]), []), self.titles(self.search(q='the')))
+        self.assertEqual(self.titles(pages[3]), [])
+
+    def test_prefix_and_isbn_matching(self):
+        self.assertCountEqual(self.titles(self.search(q='tolk')), ['The Fellowship of the Ring', 'The Hobbit'])
+        self.assertEqual(self.titles(self.search(q='9780547928227')), ['The Hobbit'])
+        self.assertCountEqual(self.titles(self.search(q='978054792')), ['The Fellowship of the Ring', 'The Hobbit'])
+
+    def test_filters_and_facets(self):
+        data = self.search(q='hobbit', available='true')
+        self.assertEqual(self.titles(data), ['The Hobbit'])
+        self.assertEqual(data['facets'], {
+            'genre': [{'value': 'Fantasy', 'count': 1}, {'value': 'History', 'count': 1}],
+            'availability': {'available': 1, 'unavailable': 1},
+        })
+        self.assertEqual(self.titles(self.search(q='hobbit', genre='History')), ['A History of Dragons'])
+
+    def test_index_follows_book_changes(self):
+        self.hobbit.title = 'There and Back Again'
+        self.hobbit.save()
+        self.lotr.delete()
+        self.assertEqual(self.titles(self.search(q='there')), ['There and Back Again'])
+        self.assertEqual(self.titles(self.search(q='tolkien')), ['There and Back Again'])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.titles(self.search(q='"hobbit* (dragons')), ['A History of Dragons'])
+        self.assertEqual(self.client.get('/api/books/search/', {'q': ''}).status_code, 400)
+
+    @override_settings(BOOK_SEARCH_BACKEND='api.search.ORMSearchBackend')
+    def test_orm_backend_matches_same_books(self):
+        data = self.search(q='hobbit')
+        self.assertEqual(set(self.titles(data)), {'The Hobbit', 'A History of Dragons'})
+        self.assertEqual(data['facets']['availability'], {'available': 1, 'unavailable': 1})
+
+
+class CatalogStatsTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('staff@example.com', 'STAFF')
+        self.member = make_user('member@example.com')
+        self.hobbit = make_book(total_copies=2, available_copies=1)
+        self.dune = make_book(
+            title='Dune', author='Frank Herbert', isbn='9780441013593', genre='Science Fiction',
+            total_copies=1, available_copies=1
+        )
+
+    def snapshot(self):
+        return {
+            (row.dimension, row.key): (row.books, row.available_books, row.total_copies, row.available_copies)
+            for row in CatalogStat.objects.all()
+        }
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        rebuild_catalog_stats()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_changes_are_applied_incrementally(self):
+        self.assertEqual(self.snapshot()[('all', '')], (2, 2, 3, 2))
+        self.assertMatchesRebuild()
+
+        loan = BookIssue.objects.create(book=self.dune, user=self.member)
+        loan.issue_book(self.staff)
+        self.assertEqual(self.snapshot()[('genre', 'Science Fiction')], (1, 0, 1, 0))
+        self.assertMatchesRebuild()
+
+        Hold.objects.create(book=self.dune, user=make_user('holder@example.com'))
+        loan.return_book()
+        self.assertMatchesRebuild()
+        BookIssue.objects.get(book=self.dune, status='ISSUED').return_book()
+        self.assertEqual(self.snapshot()[('genre', 'Science Fiction')], (1, 1, 1, 1))
+
+        requests = [BookIssue.objects.create(book=self.hobbit, user=self.member)]
+        BookIssue.bulk_issue([loan.pk for loan in requests], self.staff)
+        self.assertEqual(self.snapshot()[('author', 'J.R.R. Tolkien')], (1, 0, 2, 0))
+        BookIssue.bulk_return([loan.pk for loan in requests])
+        self.assertMatchesRebuild()
+
+        self.hobbit.genre = 'Classics'
+        self.hobbit.save()
+        self.assertNotIn(('genre', 'Fantasy'), self.snapshot())
+        self.assertMatchesRebuild()
+
+        # Stale stock on the instance isn't written by an update_fields save
+        self.dune.available_copies = 0
+        self.dune.title = 'Dune Messiah'
+        self.dune.save(update_fields=['title'])
+        self.assertMatchesRebuild()
+
+        self.dune.delete()
+        self.assertNotIn(('author', 'Frank Herbert'), self.snapshot())
+        self.assertEqual(self.snapshot()[('all', '')], (1, 1, 2, 1))
+        self.assertMatchesRebuild()
+
+    def test_rollups_read_only_the_summary_table(self):
+        Book.objects.filter(pk=self.dune.pk).update(available_copies=0)
+        call_command('rebuild_catalog_stats', stdout=StringIO())
+        client = APIClient()
+        client.force_login(self.member)
+
+        with CaptureQueriesContext(connection) as ctx:
+            genres = client.get('/api/catalog-stats/').json()['results']
+            authors = client.get('/api/catalog-stats/?dimension=author&available=false').json()['results']
+            totals = client.get('/api/catalog-stats/totals/').json()
+        self.assertFalse([q for q in ctx.captured_queries if '"api_book"' in q['sql']])
+
+        self.assertEqual([(row['key'], row['available_books']) for row in genres], [
+            ('Fantasy', 1), ('Science Fiction', 0)
+        ])
+        self.assertEqual([row['key'] for row in authors], ['Frank Herbert'])
+        self.assertEqual((totals['books'], totals['available_books'], totals['total_copies']), (2, 1, 3))
+        self.assertEqual(client.get('/api/catalog-stats/?dimension=all').status_code, 400)
+
+
+class CirculationAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = make_user('staff@example.com', 'STAFF')
+        first, second = make_user('first@example.com'), make_user('second@example.com')
+        self.hobbit = make_book()
+        self.dune = make_book(title='Dune', author='Frank Herbert', isbn='9780441013593', genre='Science Fiction')
+        day = lambda month, d: datetime.datetime(2025, month, d, 12, tzinfo=datetime.timezone.utc)
+        for book, user, status, issued, returned, reissues in [
+            (self.hobbit, first, 'RETURNED', day(3, 1), day(3, 11), 0),
+            (self.hobbit, second, 'RETURNED', day(3, 20), day(4, 10), 1),
+            # Past due but not swept yet: still counts as overdue
+            (self.dune, first, 'ISSUED', day(4, 5), None, 2),
+            (self.dune, second, 'REQUESTED', None, None, 0),
+        ]:
+            BookIssue.objects.create(
+                book=book, user=user, status=status, issue_date=issued, return_date=returned,
+                due_date=issued and issued + datetime.timedelta(days=14), reissue_count=reissues
+            )
+
+    def test_numpy_and_pure_python_reports_match(self):
+        self.assertIsNotNone(analytics.numpy, 'numpy is in requirements.txt')
+        with mock.patch.object(analytics.CirculationReport, 'add_rows', side_effect=AssertionError):
+            report = analytics.circulation_report(top=1, chunk_size=3)
+        self.assertEqual(report, {
+            'requests': 4,
+            'loans': 3,
+            'statuses': {'REQUESTED': 1, 'ISSUED': 1, 'RETURNED': 2},
+            'average_loan_days': 15.5,
+            'overdue_rate': 0.6667,
+            'reissues': {'0': 1, '1': 1, '2': 1},
+            'months': [{'month': '2025-03', 'loans': 2}, {'month': '2025-04', 'loans': 1}],
+            'titles': [{'book': self.hobbit.pk, 'title': 'The Hobbit', 'loans': 2}],
+            'genres': [{'genre': 'Fantasy', 'loans': 2}, {'genre': 'Science Fiction', 'loans': 1}],
+        })
+        with mock.patch('api.analytics.numpy', None), \
+                mock.patch.object(analytics.CirculationReport, 'add_vectorized', side_effect=AssertionError):
+            self.assertEqual(analytics.circulation_report(top=1, chunk_size=3), report)
+
+    def test_endpoint_is_staff_only_cached_and_filtered(self):
+        client = APIClient()
+        client.force_login(make_user('member@example.com'))
+        self.assertEqual(client.get('/api/analytics/circulation/').status_code, 403)
+
+        client.force_login(self.staff)
+        self.assertEqual(client.get('/api/analytics/circulation/').json()['loans'], 3)
+        with CaptureQueriesContext(connection) as ctx:
+            client.get('/api/analytics/circulation/')
+        self.assertFalse([q for q in ctx.captured_queries if 'api_bookissue' in q['sql']])
+
+        # Loans were all requested today, so a range ending yesterday is empty
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        self.assertEqual(client.get(f'/api/analytics/circulation/?until={yesterday}').json()['requests'], 0)
+        self.assertEqual(client.get('/api/analytics/circulation/?since=March').status_code, 400)
+
+    def assertReturnDays(self, returned):
+        self.assertEqual(
+            [datetime.datetime.fromtimestamp(value, datetime.timezone.utc).day for value in returned[:2]], [11, 10]
+        )
+        self.assertTrue(math.isnan(returned[3]))
+
+    def test_export_writes_one_file_per_column(self):
+        for numpy in [analytics.numpy, None]:
+            with self.subTest(numpy=numpy is not None), tempfile.TemporaryDirectory() as path, \
+                    mock.patch('api.analytics.numpy', numpy):
+                self.assertEqual(analytics.export_columns(path, chunk_size=3), 4)
+                with open(os.path.join(path, 'schema.json')) as f:
+                    schema = json.load(f)
+                self.assertEqual(schema['rows'], 4)
+                returned = array('d')
+                with open(os.path.join(path, 'return_date.bin'), 'rb') as f:
+                    returned.fromfile(f, 4)
+                self.assertReturnDays(returned)
+
+    def test_export_writes_parquet(self):
+        import pyarrow.parquet
+
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, 'loans.parquet')
+            self.assertEqual(analytics.export_loans(filename, chunk_size=3), 4)
+            table = pyarrow.parquet.read_table(filename)
+        self.assertEqual(table.column_names, [name for name, _, _ in analytics.COLUMNS])
+        self.assertEqual(str(table.schema.field('status').type), 'int8')
+        self.assertReturnDays(table.column('return_date').to_pylist())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('staff@example.com', 'STAFF')
+        self.member = make_user('member@example.com')
+        self.books = [
+            make_book(isbn=f'978000000000{i}', genre='Fantasy' if i % 2 else 'Poetry', available_copies=i % 3)
+            for i in range(5)
+        ]
+        for book in self.books:
+            BookIssue.objects.create(book=book, user=self.member, status='RETURNED')
+        BookIssue.objects.create(
+            book=self.books[0], user=self.member, status='ISSUED', due_date=timezone.now() - datetime.timedelta(days=1)
+        )
+        self.client = APIClient()
+        self.client.force_login(self.staff)
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_streams_every_row_in_chunks(self):
+        with mock.patch('api.exports.EXPORT_CHUNK_SIZE', 2), CaptureQueriesContext(connection) as ctx:
+            lines = self.export('/api/book-issues/export/').splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['id', 'book', 'book_title', 'isbn'])
+        self.assertEqual(len(lines), 7)
+        # Three chunks of two plus the empty one that ends the export
+        self.assertEqual(len([q for q in ctx.captured_queries if 'api_bookissue' in q['sql']]), 4)
+
+    def test_filters_and_json_lines(self):
+        call_command('sweep_overdue', stdout=StringIO())
+        rows = [json.loads(line) for line in self.export('/api/book-issues/export/?output=jsonl&overdue=true').splitlines()]
+        self.assertEqual([(row['book'], row['status']) for row in rows], [(self.books[0].pk, 'OVERDUE')])
+        self.assertEqual(len(self.export(f'/api/book-issues/export/?status=returned&book={self.books[1].pk}').splitlines()), 2)
+
+        books = self.export('/api/books/export/?genre=Fantasy&available=true').splitlines()
+        self.assertEqual([line.split(',')[0] for line in books[1:]], [str(self.books[1].pk)])
+        users = self.export('/api/users/export/?user_type=member&output=jsonl').splitlines()
+        self.assertEqual([json.loads(line)['email'] for line in users], ['member@example.com'])
+
+    async def test_asgi_streams_chunk_by_chunk(self):
+        fetched = []
+        chunks = exports.chunks
+
+        def counted_chunks(*args):
+            for chunk in chunks(*args):
+                fetched.append(len(chunk))
+                yield chunk
+
+        await self.async_client.aforce_login(self.staff)
+        with mock.patch('api.exports.EXPORT_CHUNK_SIZE', 2), mock.patch('api.exports.chunks', counted_chunks):
+            response = await self.async_client.get('/api/book-issues/export/')
+            self.assertTrue(response.is_async)
+            lines = aiter(response.streaming_content)
+            header, first = await anext(lines), await anext(lines)
+            # Only the first chunk has been read when it goes out
+            self.assertEqual(fetched, [2])
+            rest = [piece async for piece in lines]
+        self.assertEqual(fetched, [2, 2, 2])
+        self.assertTrue(header.startswith(b'id,book,'))
+        self.assertEqual(len(b''.join([first, *rest]).splitlines()), 6)
+
+    def test_csv_cells_are_not_formulas(self):
+        User.objects.filter(pk=self.member.pk).update(first_name='=HYPERLINK("http://example.com")', last_name='-1')
+        rows = list(csv.reader(self.export('/api/users/export/?user_type=member').splitlines()))
+        self.assertEqual(rows[1][2:4], ['\'=HYPERLINK("http://example.com")', "'-1"])
+        rows = [json.loads(line) for line in self.export('/api/users/export/?user_type=member&output=jsonl').splitlines()]
+        self.assertEqual(rows[0]['last_name'], '-1')
+
+    def test_staff_only_and_validation(self):
+        self.assertEqual(self.client.get('/api/books/export/?output=xml').status_code, 400)
+        self.assertEqual(self.client.get('/api/book-issues/export/?user=me').status_code, 400)
+        response = self.client.get('/api/users/export/')
+        self.assertRegex(response['Content-Disposition'], r'attachment; filename="users-\d{8}\.csv"')
+
+        self.client.force_login(self.member)
+        for url in ['/api/book-issues/export/', '/api/books/export/', '/api/users/export/']:
+            self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='x', first_name='Test', last_name='Admin'
+        )
+        self.member = make_user('member@example.com')
+        self.other = make_user('other@example.com')
+        self.hobbit = make_book()
+        self.dune = make_book(title='Dune', author='Frank Herbert', isbn='9780441013593', genre='Science Fiction')
+        for user in [self.member, self.other]:
+            for book in [self.hobbit, self.dune]:
+                BookIssue.objects.create(book=book, user=user, status='RETURNED')
+        self.client.force_login(self.admin)
+
+    def changelist(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.changelist('/admin/api/bookissue/')
+        with CaptureQueriesContext(connection) as ctx:
+            self.changelist('/admin/api/bookissue/')
+        for i in range(5):
+            BookIssue.objects.create(book=self.dune, user=make_user(f'reader{i}@example.com'), status='RETURNED')
+        with self.assertNumQueries(len(ctx.captured_queries)):
+            cl = self.changelist('/admin/api/bookissue/')
+        self.assertEqual(len(cl.result_list), 9)
+        self.assertFalse([q for q in ctx.captured_queries if 'django_datetime_trunc' in q['sql']])
+
+    def test_email_and_isbn_searches_are_exact(self):
+        with CaptureQueriesContext(connection) as ctx:
+            cl = self.changelist('/admin/api/bookissue/?q=member@example.com')
+        self.assertEqual({loan.user for loan in cl.result_list}, {self.member})
+        self.assertFalse([q for q in ctx.captured_queries if 'LIKE' in q['sql'] and 'api_bookissue' in q['sql']])
+
+        cl = self.changelist('/admin/api/bookissue/?q=978-0-441-01359-3')
+        self.assertEqual({loan.book for loan in cl.result_list}, {self.dune})
+        # An ISBN-10 finds the stored ISBN-13
+        cl = self.changelist('/admin/api/book/?q=0-441-01359-7')
+        self.assertEqual(list(cl.result_list), [self.dune])
+        self.assertEqual(len(self.changelist('/admin/api/user/?q=member@').result_list), 0)
+
+    def test_other_terms_search_the_book(self):
+        cl = self.changelist('/admin/api/bookissue/?q=herbert')
+        self.assertEqual(cl.result_count, 2)
+        self.assertEqual({loan.book for loan in cl.result_list}, {self.dune})
+        self.assertEqual(self.changelist('/admin/api/hold/?q=hobbit').result_count, 0)
+
+    def test_autocomplete(self):
+        response = self.client.get(
+            '/admin/autocomplete/', {'app_label': 'api', 'model_name': 'bookissue', 'field_name': 'user', 'term': 'other@example.com'}
+        )
+        self.assertEqual([result['id'] for result in response.json()['results']], [str(self.other.pk)])
+
+    def test_estimated_count_paginator(self):
+        loans = BookIssue.objects.order_by('-request_date', '-pk')
+        with mock.patch.object(EstimatedCountPaginator, 'count_limit', 2):
+            # Unfiltered: the highest primary key on SQLite
+            self.assertEqual(EstimatedCountPaginator(loans, 2).count, loans.order_by('-pk')[0].pk)
+            # Filtered: counted up to the limit
+            self.assertEqual(EstimatedCountPaginator(loans.filter(status='RETURNED'), 2).count, 2)
+            self.assertEqual(EstimatedCountPaginator(loans.filter(user=self.member), 1).count, 2)
+        paginator = EstimatedCountPaginator(loans, 3)
+        self.assertEqual(paginator.count, 4)
+        self.assertEqual(list(paginator.page(2).object_list), list(loans)[3:])
+
+
+class ImportBooksTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def run_import(self, path, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_books', path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_normalize_isbn(self):
+        self.assertEqual(normalize_isbn('978-0-547-92822-7'), '9780547928227')
+        self.assertEqual(normalize_isbn('0-306-40615-2'), '9780306406157')
+        for bad in ['9780547928228', '0306406153', '12345', '']:
+            with self.assertRaises(InvalidRecord):
+                normalize_isbn(bad)
+
+    def test_copy_counts(self):
+        record = {'title': 'The Hobbit', 'author': 'J.R.R. Tolkien', 'isbn': '9780547928227', 'publication_date': '1937'}
+        self.assertEqual(build_book(record, default_copies=3).total_copies, 3)
+        self.assertEqual(build_book({**record, 'total_copies': None}, default_copies=3).total_copies, 3)
+        book = build_book({**record, 'total_copies': 0}, default_copies=3)
+        self.assertEqual((book.total_copies, book.available_copies), (0, 0))
+        for bad in [-1, '-2', 'two']:
+            with self.assertRaises(InvalidRecord):
+                build_book({**record, 'total_copies': bad})
+
+    def test_csv_import_upserts_metadata_but_keeps_copies(self):
+        make_book(title='Old Title', total_copies=5, available_copies=2)
+        path = self.write('books.csv', (
+            'title,author,isbn,publication_date,genre,total_copies\n'
+            'The Hobbit,J.R.R. Tolkien,978-0-547-92822-7,1937-09-21,Fantasy,9\n'
+            'Bad Book,Nobody,9780547928228,2001,Fiction,1\n'
+            'Dune,Frank Herbert,0441013597,1965,Science Fiction,3\n'
+        ))
+        out, err = self.run_import(path)
+
+        self.assertIn('Imported 2 books from 3 records (1 invalid)', out)
+        self.assertIn('Record 2: Bad ISBN-13 check digit', err)
+        hobbit = Book.objects.get(isbn='9780547928227')
+        self.assertEqual((hobbit.title, hobbit.total_copies, hobbit.available_copies), ('The Hobbit', 5, 2))
+        dune = Book.objects.get(isbn='9780441013593')
+        self.assertEqual((dune.publication_date, dune.available_copies), (datetime.date(1965, 1, 1), 3))
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+    def test_marc_import(self):
+        path = self.write('books.mrk', (
+            '=LDR  00000nam a2200000 a 4500\n'
+            '=020  \\\\$a9780547928227 (pbk.)\n'
+            '=100  1\\$aTolkien, J. R. R.,\n'
+            '=245  14$aThe hobbit :$bor there and back again /$cJ.R.R. Tolkien.\n'
+            '=264  \\1$aBoston :$bHoughton Mifflin,$c1937.\n'
+            '=650  \\0$aFantasy fiction.\n'
+            '=520  \\\\$aBilbo goes on an adventure.\n'
+        ))
+        self.run_import(path)
+        book = Book.objects.get(isbn='9780547928227')
+        self.assertEqual(book.title, 'The hobbit : or there and back again')
+        self.assertEqual(book.author, 'Tolkien, J. R. R.')
+        self.assertEqual(book.genre, 'Fantasy fiction')
+        self.assertEqual(book.publication_date, datetime.date(1937, 1, 1))
+
+    def test_resume_from_checkpoint(self):
+        records = [
+            {'title': f'Book {n}', 'author': 'A', 'isbn': isbn, 'publication_date': '2001'}
+            for n, isbn in enumerate(['9780547928227', '9780441013593', '9780306406157'])
+        ]
+        path = self.write('books.jsonl', '\n'.join(json.dumps(r) for r in records) + '\nnot json\n')
+        with open(path + '.checkpoint', 'w') as f:
+            json.dump({'path': path, 'size': os.path.getsize(path), 'position': 2}, f)
+
+        out, err = self.run_import(path, batch=1)
+        self.assertIn('Resuming after record 2', out)
+        self.assertIn('Record 4: Invalid JSON', err)
+        self.assertEqual(list(Book.objects.values_list('isbn', flat=True)), ['9780306406157'])
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        self.member = make_user('member@example.com')
+        for i in range(5):
+            BookIssue.objects.create(book=make_book(isbn=f'978000000000{i}'), user=self.member)
+        self.client = APIClient()
+        self.client.force_login(self.member)
+
+    def test_cursor_pages_follow_request_date_ordering(self):
+        first = self.client.get('/api/book-issues/', {'page_size': 2}).json()
+        self.assertEqual(len(first['results']), 2)
+        self.assertIsNone(first['previous'])
+
+        seen = [issue['id'] for issue in first['results']]
+        next_url = first['next']
+        while next_url:
+            page = self.client.get(next_url).json()
+            seen += [issue['id'] for issue in page['results']]
+            next_url = page['next']
+
+        expected = list(BookIssue.objects.order_by('-request_date').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_all_mode_returns_unpaginated_list(self):
+        response = self.client.get('/api/book-issues/my_issues/', {'page_size': 'all'})
+        self.assertEqual(len(response.json()), 5)
+
+
+class StaffNotificationTests(TestCase):
+    def setUp(self):
+        self.member = make_user('member@example.com')
+        self.client = APIClient()
+        self.client.force_login(self.member)
+        self.client.get('/api/users/current_user/')
+        self.next_isbn = 9780000000000
+
+    def add_staff(self, count):
+        for i in range(User.objects.count(), User.objects.count() + count):
+            make_user(f'staff{i}@example.com', 'STAFF')
+
+    def request_issue(self):
+        self.next_isbn += 1
+        book = make_book(isbn=str(self.next_isbn))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f'/api/books/{book.pk}/request_issue/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_request_issue_queries_independent_of_staff_count(self):
+        self.add_staff(2)
+        small = self.request_issue()
+        self.add_staff(30)
+        large = self.request_issue()
+        self.assertEqual(small, large)
+        self.assertEqual(Notification.objects.filter(notification_type='ISSUE_REQUEST').count(), 2 + 32)
+
+    @override_settings(NOTIFICATION_QUEUE_FANOUT=True)
+    def test_queued_fan_out_is_processed_by_worker(self):
+        self.add_staff(3)
+        self.request_issue()
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual(NotificationFanout.objects.count(), 1)
+
+        call_command('process_notification_queue', stdout=StringIO())
+        self.assertEqual(NotificationFanout.objects.count(), 0)
+        self.assertEqual(
+            set(Notification.objects.values_list('user__email', flat=True)),
+            set(User.objects.filter(user_type='STAFF').values_list('email', flat=True))
+        )
+
+
+class ConcurrentIssueReturnTests(TransactionTestCase):
+    """Stress issue/return on a single title from many threads at once."""
+
+    copies = 10
+    members = 40
+
+    def setUp(self):
+        self.staff = make_user('staff@example.com', 'STAFF')
+        self.book = make_book(total_copies=self.copies, available_copies=self.copies)
+        self.issues = [
+            BookIssue.objects.create(book=self.book, user=make_user(f'member{i}@example.com'))
+            for i in range(self.members)
+        ]
+
+    def assertNoDrift(self):
+        self.book.refresh_from_db()
+        active = BookIssue.objects.filter(book=self.book, status__in=['ISSUED', 'OVERDUE']).count()
+        self.assertEqual(self.book.available_copies, self.book.total_copies - active)
+        self.assertGreaterEqual(self.book.available_copies, 0)
+
+    def test_concurrent_approvals_never_over_issue(self):
+        results = run_concurrently([
+            lambda issue=issue: issue.issue_book(self.staff) for issue in self.issues
+        ])
+
+        self.assertEqual(results.count(True), self.copies)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results if r is not True))
+        self.assertNoDrift()
+
+    def test_stale_reissue_does_not_reopen_a_returned_loan(self):
+        issue = self.issues[0]
+        issue.issue_book(self.staff)
+        stale = BookIssue.objects.get(pk=issue.pk)
+        BookIssue.objects.get(pk=issue.pk).return_book()
+
+        with self.assertRaisesMessage(ValueError, 'Book not issued or already returned'):
+            stale.reissue_book()
+        issue.refresh_from_db()
+        self.assertEqual((issue.status, issue.reissue_count), ('RETURNED', 0))
+        member = User.objects.get(pk=issue.user_id)
+        self.assertEqual((member.issued_loan_count, member.returned_loan_count), (0, 1))
+        self.assertNoDrift()
+
+    def test_concurrent_reissues_stop_at_the_limit(self):
+        issue = self.issues[0]
+        issue.issue_book(self.staff)
+        due_date = BookIssue.objects.get(pk=issue.pk).due_date
+        results = run_concurrently([BookIssue.objects.get(pk=issue.pk).reissue_book for _ in range(6)])
+
+        self.assertEqual(results.count(True), 3)
+        issue.refresh_from_db()
+        self.assertEqual(issue.reissue_count, 3)
+        self.assertEqual(issue.due_date, due_date + datetime.timedelta(days=21))
+
+    def test_concurrent_duplicate_approvals_and_returns(self):
+        issued = self.issues[:self.copies]
+        for issue in issued:
+            issue.issue_book(self.staff)
+
+        # Every loan is returned twice and every pending request approved twice
+        targets = []
+        for issue in issued:
+            targets.append(BookIssue.objects.get(pk=issue.pk).return_book)
+            targets.append(BookIssue.objects.get(pk=issue.pk).return_book)
+        for issue in self.issues[self.copies:]:
+            targets.append(lambda issue=issue: BookIssue.objects.get(pk=issue.pk).issue_book(self.staff))
+            targets.append(lambda issue=issue: BookIssue.objects.get(pk=issue.pk).issue_book(self.staff))
+        results = run_concurrently(targets)
+
+        self.assertTrue(all(r is True or isinstance(r, ValueError) for r in results))
+        self.assertEqual(BookIssue.objects.filter(status='RETURNED').count(), self.copies)
+        self.assertNoDrift()
@@ -1,14 +1,19 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
+from .metrics import metrics_view
 from .views import (
-    UserViewSet, BookViewSet, BookIssueViewSet, NotificationViewSet,
-    LoginView, LogoutView, GetCSRFToken, dashboard_stats
+    UserViewSet, BookViewSet, BookIssueViewSet, CatalogStatViewSet, HoldViewSet, NotificationViewSet,
+    LoginView, LogoutView, GetCSRFToken, circulation_stats, dashboard_stats
 )
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
 router.register(r'books', BookViewSet)
 router.register(r'book-issues', BookIssueViewSet, basename='book-issue')
+router.register(r'holds', HoldViewSet, basename='hold')
+router.register(r'catalog-stats', CatalogStatViewSet, basename='catalog-stat')
 router.register(r'notifications', NotificationViewSet, basename='notification')
 
 urlpatterns = [
@@ -17,4 +22,19 @@ urlpatterns = [
     path('logout/', LogoutView.as_view(), name='logout'),
     path('csrf-token/', GetCSRFToken.as_view(), name='csrf'),
     path('dashboard-stats/', dashboard_stats, name='dashboard-stats'),
-] 
\ No newline at end of file
+    path('analytics/circulation/', circulation_stats, name='circulation-stats'),
+    path('metrics/', metrics_view, name='metrics'),
+]
+
+async_urlpatterns = [
+    path('books/', async_views.book_list),
+    path('books/<int:pk>/', async_views.book_detail),
+    path('book-issues/my_issues/', async_views.my_issues),
+    path('notifications/', async_views.notification_list),
+    path('notifications/stream/', async_views.notification_stream),
+    path('dashboard-stats/', async_views.dashboard_stats),
+]
+
+if settings.ASYNC_READ_VIEWS:
+    # Listed before the router so these paths resolve to the async views
+    urlpatterns = async_urlpatterns + urlpatterns
@@ -1,19 +1,35 @@
+from collections import OrderedDict
+
 from django.shortcuts import render
-from rest_framework import viewsets, permissions, status, generics
+from rest_framework import viewsets, permissions, status, generics, mixins
 from rest_framework.decorators import action, api_view, permission_classes, authentication_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
 from django.contrib.auth import login, logout
-from django.db.models import Q
-from django.utils import timezone
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.dateparse import parse_datetime
 from django.shortcuts import get_object_or_404
+from django.http import Http404
 
-from .models import User, Book, BookIssue, Notification
+from .models import User, Book, BookIssue, CatalogStat, Hold, Notification, over_loan_limit
 from .serializers import (
-    UserSerializer, BookSerializer, BookIssueSerializer, 
+    UserSerializer, BookSerializer, BookIssueSerializer, CatalogStatSerializer, HoldSerializer,
     NotificationSerializer, LoginSerializer
 )
-from .authentication import CsrfExemptSessionAuthentication
+from .analytics import circulation_report, start_of_day
+from .authentication import API_AUTHENTICATION_CLASSES, SignedTokenAuthentication
+from .exports import BOOK_COLUMNS, EXPORT_FORMATS, LOAN_COLUMNS, USER_COLUMNS, export_response
+from .cache import (
+    STAFF_STATS_KEY, book_listing_key, get_book_listing, get_book_payloads,
+    set_book_listing, set_book_payloads, staff_stats_timeout
+)
+from .hashers import HashingPoolBusy
+from .notifications import mark_as_read, notify, notify_bulk, notify_staff, unread_count
+from .search import get_search_backend
 
 # Custom permissions
 class IsAdminUser(permissions.BasePermission):
@@ -32,29 +48,40 @@ class IsOwnerOrStaff(permissions.BasePermission):
 
 # Authentication views
 class LoginView(APIView):
-    authentication_classes = [CsrfExemptSessionAuthentication]
+    authentication_classes = API_AUTHENTICATION_CLASSES
     permission_classes = [permissions.AllowAny]
     
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
-        if serializer.is_valid():
+        try:
+            valid = serializer.is_valid()
+        except HashingPoolBusy:
+            return Response(
+                {'error': 'Too many logins in progress, please try again shortly'}, 
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '5'}
+            )
+        if valid:
             user = serializer.validated_data['user']
             login(request, user)
-            return Response({
+            data = {
                 'user': UserSerializer(user).data,
                 'message': 'Login successful'
-            })
+            }
+            if settings.SIGNED_TOKEN_AUTH:
+                data['token'] = SignedTokenAuthentication.issue_token(user)
+            return Response(data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class LogoutView(APIView):
-    authentication_classes = [CsrfExemptSessionAuthentication]
+    authentication_classes = API_AUTHENTICATION_CLASSES
     
     def post(self, request):
         logout(request)
         return Response({'message': 'Logout successful'})
 
 class GetCSRFToken(APIView):
-    authentication_classes = [CsrfExemptSessionAuthentication]
+    authentication_classes = API_AUTHENTICATION_CLASSES
     permission_classes = [permissions.AllowAny]
     
     def get(self, request):
@@ -63,14 +90,14 @@ class GetCSRFToken(APIView):
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    authentication_classes = [CsrfExemptSessionAuthentication]
+    authentication_classes = API_AUTHENTICATION_CLASSES
     
     def get_permissions(self):
         if self.action in ['create']:
             permission_classes = [permissions.AllowAny]
         elif self.action in ['update', 'partial_update', 'destroy']:
             permission_classes = [IsAdminUser]
-        elif self.action == 'list':
+        elif self.action in ['list', 'export']:
             permission_classes = [IsStaffUser]
         else:
             permission_classes = [permissions.IsAuthenticated]
@@ -88,31 +115,136 @@ class UserViewSet(viewsets.ModelViewSet):
     def current_user(self, request):
         serializer = UserSerializer(request.user)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        users = User.objects.all()
+        user_type = request.query_params.get('user_type')
+        if user_type:
+            users = users.filter(user_type=user_type.upper())
+        return export_view(request, users, USER_COLUMNS, 'users')
 
 # Book management views
+def book_payloads(ids):
+    """Serialized books for ids, in order, read through the book cache."""
+    payloads, misses = get_book_payloads(ids)
+    if misses:
+        books = Book.objects.in_bulk(list(misses))
+        fresh = {book_id: dict(BookSerializer(book).data) for book_id, book in books.items()}
+        set_book_payloads(misses, fresh)
+        payloads.update(fresh)
+    return [payloads[book_id] for book_id in ids if book_id in payloads]
+
+def book_listing(request, queryset, paginator, view=None):
+    """
+    One page of books as ``{'ids', 'next', 'previous'}``, read through the
+    listing cache; None when the request opts out of pagination. Pages are
+    cached as ids; the books themselves come from the payload cache.
+    """
+    key = book_listing_key(request.build_absolute_uri())
+    page = get_book_listing(key)
+    if page is None:
+        books = paginator.paginate_queryset(queryset, request, view)
+        if books is None:
+            return None
+        page = {
+            'ids': [book.pk for book in books],
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+        }
+        set_book_listing(key, page)
+    return page
+
 class BookViewSet(viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
-    authentication_classes = [CsrfExemptSessionAuthentication]
+    authentication_classes = API_AUTHENTICATION_CLASSES
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'export']:
             permission_classes = [IsStaffUser]
         else:
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
     
+    def perform_update(self, serializer):
+        book = serializer.save()
+        # Copies added by hand go to the hold queue first, like returned ones
+        book.serve_holds()
+    
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = book_listing(request, queryset, self.paginator, self)
+        if page is None:
+            return Response(self.get_serializer(queryset, many=True).data)
+        
+        return Response(OrderedDict([
+            ('next', page['next']),
+            ('previous', page['previous']),
+            ('results', book_payloads(page['ids'])),
+        ]))
+    
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            book_id = int(kwargs['pk'])
+        except ValueError:
+            raise Http404
+        payloads = book_payloads([book_id])
+        if not payloads:
+            raise Http404
+        return Response(payloads[0])
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'Search query (q) is required'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        available = request.query_params.get('available')
+        if available is not None:
+            available = available.lower() in ['true', '1', 'yes']
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            return Response(
+                {'error': 'limit and offset must be integers'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        backend = get_search_backend()
+        ids, count = backend.search(
+            query,
+            genre=request.query_params.get('genre') or None,
+            available=available,
+            limit=limit,
+            offset=offset
+        )
+        data = {
+            'count': count,
+            'results': book_payloads(ids),
+        }
+        if request.query_params.get('facets', 'true').lower() not in ['false', '0', 'no']:
+            data['facets'] = backend.facets(query)
+        return Response(data)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        # Same genre and availability filters as search
+        available = request.query_params.get('available')
+        if available is not None:
+            available = available.lower() in ['true', '1', 'yes']
+        books = get_search_backend().filtered_books(request.query_params.get('genre') or None, available)
+        return export_view(request, books, BOOK_COLUMNS, 'books')
+    
     @action(detail=True, methods=['post'])
     def request_issue(self, request, pk=None):
         book = self.get_object()
         user = request.user
         
-        if book.available_copies <= 0:
-            return Response(
-                {'error': 'No copies available for issue'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-            
         # Check if user already has an active request or issue for this book
         existing_issues = BookIssue.objects.filter(
             user=user, 
@@ -126,37 +258,115 @@ class BookViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        book_issue = BookIssue.objects.create(
-            book=book,
-            user=user,
-            status='REQUESTED'
-        )
+        # Holds count too: each one becomes a loan when a copy comes back
+        if over_loan_limit(user.pk, book.pk):
+            return Response(
+                {'error': f'You can have at most {settings.MEMBER_LOAN_LIMIT} active requests, loans and holds'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Create notification for staff
-        staff_users = User.objects.filter(user_type__in=['STAFF', 'ADMIN'])
-        for staff in staff_users:
-            Notification.objects.create(
-                user=staff,
-                message=f"{user.get_full_name()} has requested '{book.title}'",
-                notification_type='ISSUE_REQUEST',
-                book_issue=book_issue
+        if book.available_copies <= 0:
+            with transaction.atomic():
+                # Re-read under the lock return_book takes before serving the
+                # queue, so a copy can't go back into stock behind a new hold
+                available = Book.objects.select_for_update().values_list(
+                    'available_copies', flat=True
+                ).get(pk=book.pk)
+                if available <= 0:
+                    hold, _ = Hold.objects.get_or_create(book=book, user=user)
+            if available <= 0:
+                # Queued rather than refused: the next returned copy is issued
+                # to the oldest hold. Repeating the request only reports the
+                # member's place in the queue.
+                hold = Hold.objects.select_related('book').with_position().get(pk=hold.pk)
+                return Response({'hold': HoldSerializer(hold).data}, status=status.HTTP_202_ACCEPTED)
+        
+        try:
+            with transaction.atomic():
+                book_issue = BookIssue.objects.create(
+                    book=book,
+                    user=user,
+                    status='REQUESTED'
+                )
+        except IntegrityError:
+            # A concurrent request won the unique_active_loan_per_user_book race
+            return Response(
+                {'error': 'You already have an active request or issue for this book'}, 
+                status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Create notification for staff
+        notify_staff(
+            f"{user.get_full_name()} has requested '{book.title}'",
+            'ISSUE_REQUEST',
+            book_issue=book_issue
+        )
+        
         return Response(BookIssueSerializer(book_issue).data)
 
+class HoldViewSet(mixins.DestroyModelMixin, viewsets.ReadOnlyModelViewSet):
+    """A member's holds with their queue positions; DELETE leaves the queue."""
+    serializer_class = HoldSerializer
+    authentication_classes = API_AUTHENTICATION_CLASSES
+    
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Hold.objects.select_related('book').with_position()
+        if user.user_type in ['STAFF', 'ADMIN']:
+            return queryset
+        return queryset.filter(user=user)
+
+class CatalogStatViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Genre and author rollups, read from the catalog summary table only.
+    ``?dimension=genre|author`` picks the rollup (genre by default) and
+    ``?available=true|false`` keeps the rows with or without a copy on the
+    shelf; ``totals`` is the same counts for the whole catalog.
+    """
+    serializer_class = CatalogStatSerializer
+    authentication_classes = API_AUTHENTICATION_CLASSES
+    ordering = 'key'
+    
+    def get_queryset(self):
+        queryset = CatalogStat.objects.filter(dimension=self.request.query_params.get('dimension', 'genre'))
+        available = self.request.query_params.get('available')
+        if available is not None:
+            if available.lower() in ['true', '1', 'yes']:
+                queryset = queryset.filter(available_books__gt=0)
+            else:
+                queryset = queryset.filter(available_books=0)
+        return queryset
+    
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('dimension', 'genre') not in ['genre', 'author']:
+            return Response(
+                {'error': 'dimension must be genre or author'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return super().list(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['get'])
+    def totals(self, request):
+        row = CatalogStat.objects.filter(dimension='all').first() or CatalogStat(dimension='all')
+        return Response(CatalogStatSerializer(row).data)
+
 # Book Issue views
+MAX_BULK_IDS = 1000
+
 class BookIssueViewSet(viewsets.ModelViewSet):
     serializer_class = BookIssueSerializer
-    authentication_classes = [CsrfExemptSessionAuthentication]
+    authentication_classes = API_AUTHENTICATION_CLASSES
     
     def get_queryset(self):
         user = self.request.user
+        # BookIssueSerializer reads book.title and user.get_full_name per row
+        queryset = BookIssue.objects.select_related('book', 'user')
         if user.user_type in ['STAFF', 'ADMIN']:
-            return BookIssue.objects.all()
-        return BookIssue.objects.filter(user=user)
+            return queryset
+        return queryset.filter(user=user)
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'export']:
             permission_classes = [IsStaffUser]
         else:
             permission_classes = [permissions.IsAuthenticated, IsOwnerOrStaff]
@@ -176,10 +386,10 @@ class BookIssueViewSet(viewsets.ModelViewSet):
             book_issue.issue_book(request.user)
             
             # Create notification for the user
-            Notification.objects.create(
-                user=book_issue.user,
-                message=f"Your request for '{book_issue.book.title}' has been approved",
-                notification_type='ISSUED',
+            notify(
+                book_issue.user,
+                f"Your request for '{book_issue.book.title}' has been approved",
+                'ISSUED',
                 book_issue=book_issue
             )
             
@@ -197,20 +407,16 @@ class BookIssueViewSet(viewsets.ModelViewSet):
             
         book_issue = self.get_object()
         
-        if book_issue.status != 'REQUESTED':
-            return Response(
-                {'error': 'Only requested books can be rejected'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-            
-        book_issue.status = 'REJECTED'
-        book_issue.save()
+        try:
+            book_issue.reject_request()
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Create notification for the user
-        Notification.objects.create(
-            user=book_issue.user,
-            message=f"Your request for '{book_issue.book.title}' has been rejected",
-            notification_type='ISSUE_REQUEST',
+        notify(
+            book_issue.user,
+            f"Your request for '{book_issue.book.title}' has been rejected",
+            'ISSUE_REQUEST',
             book_issue=book_issue
         )
             
@@ -230,10 +436,10 @@ class BookIssueViewSet(viewsets.ModelViewSet):
             book_issue.return_book()
             
             # Create notification for the user
-            Notification.objects.create(
-                user=book_issue.user,
-                message=f"You have returned '{book_issue.book.title}'",
-                notification_type='RETURNED',
+            notify(
+                book_issue.user,
+                f"You have returned '{book_issue.book.title}'",
+                'RETURNED',
                 book_issue=book_issue
             )
             
@@ -255,10 +461,10 @@ class BookIssueViewSet(viewsets.ModelViewSet):
             book_issue.reissue_book()
             
             # Create notification for the user
-            Notification.objects.create(
-                user=book_issue.user,
-                message=f"'{book_issue.book.title}' has been reissued. New due date: {book_issue.due_date.strftime('%Y-%m-%d')}",
-                notification_type='ISSUED',
+            notify(
+                book_issue.user,
+                f"'{book_issue.book.title}' has been reissued. New due date: {book_issue.due_date.strftime('%Y-%m-%d')}",
+                'ISSUED',
                 book_issue=book_issue
             )
             
@@ -266,11 +472,87 @@ class BookIssueViewSet(viewsets.ModelViewSet):
         except ValueError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
+    def paginated_response(self, queryset):
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(BookIssueSerializer(page, many=True).data)
+        return Response(BookIssueSerializer(queryset, many=True).data)
+    
+    def bulk_action(self, request, forbidden, apply, message, notification_type):
+        """
+        Apply a set-based BookIssue operation to ``{"ids": [...]}`` and
+        report a result per id. The operation and its notifications commit
+        together; pushes to open streams wait for the commit.
+        """
+        if request.user.user_type not in ['STAFF', 'ADMIN']:
+            return Response(
+                {'error': forbidden}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        ids = request.data.get('ids')
+        if (not isinstance(ids, list) or not ids or len(ids) > MAX_BULK_IDS
+                or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids)):
+            return Response(
+                {'error': f'ids must be a list of 1 to {MAX_BULK_IDS} book issue ids'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        ids = list(dict.fromkeys(ids))
+        existing = set(BookIssue.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        with transaction.atomic():
+            succeeded, errors = apply([pk for pk in ids if pk in existing])
+            
+            issues = BookIssue.objects.select_related('book', 'user').in_bulk(succeeded)
+            notify_bulk([
+                Notification(
+                    user_id=issue.user_id,
+                    message=message(issue),
+                    notification_type=notification_type,
+                    book_issue=issue
+                )
+                for issue in issues.values()
+            ])
+        
+        results = []
+        for pk in ids:
+            if pk in issues:
+                results.append({'id': pk, 'success': True, 'issue': BookIssueSerializer(issues[pk]).data})
+            else:
+                results.append({'id': pk, 'success': False, 'error': errors.get(pk, 'Book issue not found')})
+        return Response({'results': results})
+    
+    @action(detail=False, methods=['post'])
+    def bulk_approve(self, request):
+        return self.bulk_action(
+            request, 'You do not have permission to approve book issues',
+            lambda ids: BookIssue.bulk_issue(ids, request.user),
+            lambda issue: f"Your request for '{issue.book.title}' has been approved",
+            'ISSUED'
+        )
+    
+    @action(detail=False, methods=['post'])
+    def bulk_reject(self, request):
+        return self.bulk_action(
+            request, 'You do not have permission to reject book issues',
+            BookIssue.bulk_reject,
+            lambda issue: f"Your request for '{issue.book.title}' has been rejected",
+            'ISSUE_REQUEST'
+        )
+    
+    @action(detail=False, methods=['post'])
+    def bulk_return(self, request):
+        return self.bulk_action(
+            request, 'You do not have permission to mark books as returned',
+            BookIssue.bulk_return,
+            lambda issue: f"You have returned '{issue.book.title}'",
+            'RETURNED'
+        )
+    
     @action(detail=False, methods=['get'])
     def my_issues(self, request):
-        queryset = BookIssue.objects.filter(user=request.user)
-        serializer = BookIssueSerializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = BookIssue.objects.select_related('book', 'user').filter(user=request.user)
+        return self.paginated_response(queryset)
     
     @action(detail=False, methods=['get'])
     def overdue(self, request):
@@ -280,24 +562,54 @@ class BookIssueViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        now = timezone.now()
-        overdue_issues = BookIssue.objects.filter(
-            status='ISSUED',
-            due_date__lt=now
+        # Read-only: `manage.py sweep_overdue` keeps OVERDUE current, so the
+        # list agrees with dashboard_stats and pages through the
+        # (status, due_date) index, longest overdue first.
+        self.ordering = 'due_date'
+        overdue_issues = BookIssue.objects.select_related('book', 'user').filter(status='OVERDUE')
+        return self.paginated_response(overdue_issues)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        The loan history, filtered by ``status`` (comma-separated), ``user``,
+        ``book`` and ``overdue=true`` (the overdue listing).
+        """
+        loans = BookIssue.objects.all()
+        statuses = request.query_params.get('status')
+        if statuses:
+            loans = loans.filter(status__in=statuses.upper().split(','))
+        if request.query_params.get('overdue', '').lower() in ['true', '1', 'yes']:
+            loans = loans.filter(status='OVERDUE')
+        try:
+            for field in ['user', 'book']:
+                if request.query_params.get(field):
+                    loans = loans.filter(**{f'{field}_id': int(request.query_params[field])})
+        except ValueError:
+            return Response(
+                {'error': 'user and book must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return export_view(request, loans, LOAN_COLUMNS, 'book-issues')
+
+def export_view(request, queryset, columns, name):
+    """Stream ``queryset`` in the ``?output=`` format (csv by default); see api/exports.py."""
+    output = request.query_params.get('output', 'csv')
+    if output not in EXPORT_FORMATS:
+        return Response(
+            {'error': f"output must be one of {', '.join(EXPORT_FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST
         )
-        
-        # Update status to OVERDUE
-        for issue in overdue_issues:
-            issue.check_if_overdue()
-        
-        overdue_issues = BookIssue.objects.filter(status='OVERDUE')
-        serializer = BookIssueSerializer(overdue_issues, many=True)
-        return Response(serializer.data)
+    # Under ASGI a synchronous stream would be read whole before sending
+    asynchronous = isinstance(request._request, ASGIRequest)
+    return export_response(queryset, columns, name, output, asynchronous)
 
 # Notification views
+MAX_SYNC_LIMIT = 500
+
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
-    authentication_classes = [CsrfExemptSessionAuthentication]
+    authentication_classes = API_AUTHENTICATION_CLASSES
     
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
@@ -305,45 +617,135 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         notification = self.get_object()
+        mark_as_read(request.user, [notification.pk])
         notification.is_read = True
-        notification.save()
         return Response(NotificationSerializer(notification).data)
     
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
-        notifications = self.get_queryset()
-        notifications.update(is_read=True)
+        mark_as_read(request.user)
         return Response({'message': 'All notifications marked as read'})
+    
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread_count': unread_count(request.user)})
+    
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """
+        Notifications created after a cursor, oldest first.
+        
+        Pass the previous response's ``cursor`` as ``since`` (a notification
+        id), or ``since_time`` (ISO 8601) for the first sync; repeat while
+        ``has_more`` is true.
+        """
+        notifications = self.get_queryset()
+        since = request.query_params.get('since')
+        since_time = request.query_params.get('since_time')
+        try:
+            limit = min(max(int(request.query_params.get('limit', 100)), 1), MAX_SYNC_LIMIT)
+            if since is not None:
+                since = int(since)
+                notifications = notifications.filter(pk__gt=since)
+            elif since_time is not None:
+                parsed = parse_datetime(since_time)
+                if parsed is None:
+                    raise ValueError
+                notifications = notifications.filter(created_at__gt=parsed)
+        except ValueError:
+            return Response(
+                {'error': 'since and limit must be integers and since_time an ISO 8601 datetime'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = list(notifications.order_by('pk')[:limit + 1])
+        has_more = len(results) > limit
+        results = results[:limit]
+        return Response({
+            'results': NotificationSerializer(results, many=True).data,
+            'cursor': results[-1].pk if results else since,
+            'has_more': has_more,
+            'unread_count': unread_count(request.user),
+        })
 
 # Dashboard statistics
 @api_view(['GET'])
-@authentication_classes([CsrfExemptSessionAuthentication])
+@authentication_classes(API_AUTHENTICATION_CLASSES)
 @permission_classes([permissions.IsAuthenticated])
 def dashboard_stats(request):
     user = request.user
     
     if user.user_type in ['STAFF', 'ADMIN']:
-        # Staff/Admin stats
-        total_books = Book.objects.count()
-        total_users = User.objects.filter(user_type='MEMBER').count()
-        pending_requests = BookIssue.objects.filter(status='REQUESTED').count()
-        overdue_books = BookIssue.objects.filter(status='OVERDUE').count()
-        
-        return Response({
-            'total_books': total_books,
-            'available_books': Book.objects.filter(available_copies__gt=0).count(),
-            'total_users': total_users,
-            'pending_requests': pending_requests,
-            'issued_books': BookIssue.objects.filter(status='ISSUED').count(),
-            'overdue_books': overdue_books
-        })
+        # Staff/Admin stats, shared by every staff member
+        stats = cache.get_or_set(STAFF_STATS_KEY, staff_dashboard_stats, staff_stats_timeout())
+        return Response(stats)
     else:
-        # Member stats
-        my_books = BookIssue.objects.filter(user=user)
-        
-        return Response({
-            'total_issued': my_books.filter(status='ISSUED').count(),
-            'total_requested': my_books.filter(status='REQUESTED').count(),
-            'total_returned': my_books.filter(status='RETURNED').count(),
-            'overdue_books': my_books.filter(status='OVERDUE').count()
-        })
+        # Member stats, from the loan counters on the user row
+        stats = User.objects.filter(pk=user.pk).values(**member_stat_fields()).first()
+        return Response(stats)
+
+@api_view(['GET'])
+@authentication_classes(API_AUTHENTICATION_CLASSES)
+@permission_classes([IsStaffUser])
+def circulation_stats(request):
+    """
+    Circulation report (see api/analytics.py) over loans requested between
+    ``since`` and ``until`` (ISO dates, both optional), with the ``top``
+    most-borrowed titles. Cached for CIRCULATION_REPORT_CACHE_TIMEOUT.
+    """
+    try:
+        since = start_of_day(request.query_params.get('since'))
+        until = start_of_day(request.query_params.get('until'))
+        top = min(max(int(request.query_params.get('top', 20)), 1), 100)
+    except ValueError:
+        return Response(
+            {'error': 'since and until must be ISO 8601 dates and top an integer'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    report = cache.get_or_set(
+        f"circulation-report:{since and since.date()}:{until and until.date()}:{top}",
+        lambda: circulation_report(since, until, top),
+        settings.CIRCULATION_REPORT_CACHE_TIMEOUT
+    )
+    return Response(report)
+
+# Stat expressions shared with the async dashboard in async_views.py
+def member_stat_fields():
+    return {
+        'total_issued': F('issued_loan_count'),
+        'total_requested': F('requested_loan_count'),
+        'total_returned': F('returned_loan_count'),
+        'overdue_books': F('overdue_loan_count'),
+    }
+
+def catalog_totals():
+    # The catalog summary row rather than a count over api_book
+    return CatalogStat.objects.filter(dimension='all').values('books', 'available_books')
+
+def issue_stat_counts():
+    return {
+        'pending_requests': Count('pk', filter=Q(status='REQUESTED')),
+        'issued_books': Count('pk', filter=Q(status='ISSUED')),
+        'overdue_books': Count('pk', filter=Q(status='OVERDUE')),
+    }
+
+def staff_stats(books, issues, total_users):
+    # books is None until the summary table has its first row
+    books = books or {'books': 0, 'available_books': 0}
+    return {
+        'total_books': books['books'],
+        'available_books': books['available_books'],
+        'total_users': total_users,
+        'pending_requests': issues['pending_requests'],
+        'issued_books': issues['issued_books'],
+        'overdue_books': issues['overdue_books']
+    }
+
+def staff_dashboard_stats():
+    # One query per table; book counts come from the catalog summary row
+    return staff_stats(
+        catalog_totals().first(),
+        BookIssue.objects.aggregate(**issue_stat_counts()),
+        User.objects.filter(user_type='MEMBER').count()
+    )
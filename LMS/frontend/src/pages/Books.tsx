@@ -25,14 +25,17 @@ const Books: React.FC = () => {
   const [error, setError] = useState<string | null>(null);
   const [searchTerm, setSearchTerm] = useState('');
   const [requestingBookId, setRequestingBookId] = useState<number | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchBooks = async () => {
       try {
         setIsLoading(true);
-        const booksData = await bookService.getAllBooks();
-        setBooks(booksData);
-        setFilteredBooks(booksData);
+        const page = await bookService.getBooks();
+        setBooks(page.results);
+        setFilteredBooks(page.results);
+        setNextCursor(page.next);
       } catch (error) {
         setError('Failed to fetch books. Please try again later.');
         console.error('Error fetching books:', error);
@@ -44,18 +47,35 @@ const Books: React.FC = () => {
     fetchBooks();
   }, []);
 
+  const handleLoadMore = async () => {
+    try {
+      setIsLoadingMore(true);
+      const page = await bookService.getBooks(nextCursor);
+      setBooks(prev => [...prev, ...page.results]);
+      setNextCursor(page.next);
+    } catch (error) {
+      console.error('Error fetching books:', error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
-    if (searchTerm) {
-      const filtered = books.filter(
-        (book) =>
-          book.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-          book.author.toLowerCase().includes(searchTerm.toLowerCase()) ||
-          book.genre.toLowerCase().includes(searchTerm.toLowerCase())
-      );
-      setFilteredBooks(filtered);
-    } else {
+    if (!searchTerm.trim()) {
       setFilteredBooks(books);
+      return;
     }
+
+    // Search server-side once the user pauses typing
+    const timeout = setTimeout(async () => {
+      try {
+        const data = await bookService.searchBooks(searchTerm);
+        setFilteredBooks(data.results);
+      } catch (error) {
+        console.error('Error searching books:', error);
+      }
+    }, 250);
+    return () => clearTimeout(timeout);
   }, [searchTerm, books]);
 
   const handleRequestBook = async (bookId: number) => {
@@ -63,7 +83,13 @@ const Books: React.FC = () => {
 
     try {
       setRequestingBookId(bookId);
-      await bookService.requestBook(bookId);
+      const data = await bookService.requestBook(bookId);
+      
+      if (data.hold) {
+        // No copies left: the request joined the book's hold queue
+        alert(`You are number ${data.hold.position} in the queue. The next returned copy goes to the first hold.`);
+        return;
+      }
       
       // Update the book's available copies locally
       setBooks(books.map(book => {
@@ -105,7 +131,7 @@ const Books: React.FC = () => {
 
       <div className="mb-6">
         <Input
-          placeholder="Search by title, author, or genre..."
+          placeholder="Search by title, author, ISBN, or genre..."
           value={searchTerm}
           onChange={(e) => setSearchTerm(e.target.value)}
           className="max-w-md"
@@ -138,14 +164,14 @@ const Books: React.FC = () => {
               <CardFooter>
                 {user?.user_type === 'MEMBER' && (
                   <Button
-                    disabled={book.available_copies <= 0 || requestingBookId === book.id}
+                    disabled={requestingBookId === book.id}
                     onClick={() => handleRequestBook(book.id)}
                     className="w-full"
                   >
                     {requestingBookId === book.id
                       ? 'Requesting...'
                       : book.available_copies <= 0
-                      ? 'Not Available'
+                      ? 'Place Hold'
                       : 'Request Book'}
                   </Button>
                 )}
@@ -162,6 +188,14 @@ const Books: React.FC = () => {
           ))}
         </div>
       )}
+
+      {!searchTerm.trim() && nextCursor && (
+        <div className="mt-6 text-center">
+          <Button variant="outline" disabled={isLoadingMore} onClick={handleLoadMore}>
+            {isLoadingMore ? 'Loading...' : 'Load more'}
+          </Button>
+        </div>
+      )}
     </div>
   );
 };
@@ -28,8 +28,9 @@ const Dashboard: React.FC = () => {
         setStats(statsData);
 
         if (user?.user_type !== 'MEMBER') {
-          const overdueData = await bookIssueService.getOverdueBooks();
-          setOverdueIssues(overdueData);
+          // The first page only: the longest overdue loans come first
+          const overduePage = await bookIssueService.getOverdueBooks();
+          setOverdueIssues(overduePage.results);
         }
       } catch (error) {
         console.error('Error fetching dashboard data:', error);
@@ -54,13 +54,16 @@ const ManageUsers: React.FC = () => {
   });
   const [deleteConfirmOpen, setDeleteConfirmOpen] = useState<boolean>(false);
   const [userToDelete, setUserToDelete] = useState<User | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState<boolean>(false);
 
   useEffect(() => {
     const fetchUsers = async () => {
       setIsLoading(true);
       try {
-        const data = await userService.getAllUsers();
-        setUsers(data);
+        const page = await userService.getUsers();
+        setUsers(page.results);
+        setNextCursor(page.next);
       } catch (error) {
         console.error('Error fetching users:', error);
         toast.error('Failed to load users');
@@ -72,6 +75,20 @@ const ManageUsers: React.FC = () => {
     fetchUsers();
   }, [refreshTrigger]);
 
+  const handleLoadMore = async () => {
+    setIsLoadingMore(true);
+    try {
+      const page = await userService.getUsers(nextCursor);
+      setUsers(prev => [...prev, ...page.results]);
+      setNextCursor(page.next);
+    } catch (error) {
+      console.error('Error fetching users:', error);
+      toast.error('Failed to load users');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const handleInputChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     const { name, value } = e.target;
     setFormData(prev => ({ ...prev, [name]: value }));
@@ -231,6 +248,14 @@ const ManageUsers: React.FC = () => {
         </div>
       </div>
 
+      {nextCursor && (
+        <div className="mt-6 text-center">
+          <Button variant="outline" disabled={isLoadingMore} onClick={handleLoadMore}>
+            {isLoadingMore ? 'Loading...' : 'Load more'}
+          </Button>
+        </div>
+      )}
+
       {/* Add/Edit User Modal */}
       <Dialog open={isModalOpen} onOpenChange={setIsModalOpen}>
         <DialogContent>
@@ -17,13 +17,16 @@ const MyIssues: React.FC = () => {
   const [issues, setIssues] = useState<BookIssue[]>([]);
   const [isLoading, setIsLoading] = useState<boolean>(true);
   const [refreshTrigger, setRefreshTrigger] = useState<number>(0);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState<boolean>(false);
 
   useEffect(() => {
     const fetchIssues = async () => {
       setIsLoading(true);
       try {
-        const data = await bookIssueService.getMyIssues();
-        setIssues(data);
+        const page = await bookIssueService.getMyIssues();
+        setIssues(page.results);
+        setNextCursor(page.next);
       } catch (error) {
         console.error('Error fetching issues:', error);
         toast.error('Failed to load your book issues');
@@ -35,6 +38,20 @@ const MyIssues: React.FC = () => {
     fetchIssues();
   }, [refreshTrigger]);
 
+  const handleLoadMore = async () => {
+    setIsLoadingMore(true);
+    try {
+      const page = await bookIssueService.getMyIssues(nextCursor);
+      setIssues(prev => [...prev, ...page.results]);
+      setNextCursor(page.next);
+    } catch (error) {
+      console.error('Error fetching issues:', error);
+      toast.error('Failed to load your book issues');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const handleReissue = async (issueId: number) => {
     try {
       await bookIssueService.reissueBook(issueId);
@@ -126,6 +143,14 @@ const MyIssues: React.FC = () => {
           </div>
         </div>
       )}
+
+      {nextCursor && (
+        <div className="mt-6 text-center">
+          <Button variant="outline" disabled={isLoadingMore} onClick={handleLoadMore}>
+            {isLoadingMore ? 'Loading...' : 'Load more'}
+          </Button>
+        </div>
+      )}
     </div>
   );
 };
@@ -22,6 +22,19 @@ api.interceptors.response.use(
   }
 );
 
+// List endpoints are cursor-paginated. Pages fetch one page at a time and pass
+// back its `next` link as the cursor to load more; null means the list is done.
+export interface Page<T = any> {
+  results: T[];
+  next: string | null;
+}
+
+const getPage = async (url: string, cursor?: string | null): Promise<Page> => {
+  // The cursor is the absolute `next` URL, which axios requests as is
+  const response = await api.get(cursor || url);
+  return { results: response.data.results, next: response.data.next };
+};
+
 // Authentication Services
 export const authService = {
   login: async (email: string, password: string) => {
@@ -47,8 +60,12 @@ export const authService = {
 
 // Book Services
 export const bookService = {
-  getAllBooks: async () => {
-    const response = await api.get('/books/');
+  getBooks: async (cursor?: string | null) => {
+    return getPage('/books/', cursor);
+  },
+  
+  searchBooks: async (query: string, limit = 50) => {
+    const response = await api.get('/books/search/', { params: { q: query, limit } });
     return response.data;
   },
   
@@ -80,14 +97,12 @@ export const bookService = {
 
 // Book Issue Services
 export const bookIssueService = {
-  getMyIssues: async () => {
-    const response = await api.get('/book-issues/my_issues/');
-    return response.data;
+  getMyIssues: async (cursor?: string | null) => {
+    return getPage('/book-issues/my_issues/', cursor);
   },
   
-  getAllIssues: async () => {
-    const response = await api.get('/book-issues/');
-    return response.data;
+  getIssues: async (cursor?: string | null) => {
+    return getPage('/book-issues/', cursor);
   },
   
   approveIssue: async (issueId: number) => {
@@ -110,17 +125,30 @@ export const bookIssueService = {
     return response.data;
   },
   
-  getOverdueBooks: async () => {
-    const response = await api.get('/book-issues/overdue/');
+  bulkApprove: async (issueIds: number[]) => {
+    const response = await api.post('/book-issues/bulk_approve/', { ids: issueIds });
+    return response.data;
+  },
+  
+  bulkReject: async (issueIds: number[]) => {
+    const response = await api.post('/book-issues/bulk_reject/', { ids: issueIds });
+    return response.data;
+  },
+  
+  bulkReturn: async (issueIds: number[]) => {
+    const response = await api.post('/book-issues/bulk_return/', { ids: issueIds });
     return response.data;
   },
+  
+  getOverdueBooks: async (cursor?: string | null) => {
+    return getPage('/book-issues/overdue/', cursor);
+  },
 };
 
 // User Management Services
 export const userService = {
-  getAllUsers: async () => {
-    const response = await api.get('/users/');
-    return response.data;
+  getUsers: async (cursor?: string | null) => {
+    return getPage('/users/', cursor);
   },
   
   getUser: async (id: number) => {
@@ -160,9 +188,8 @@ export const dashboardService = {
 
 // Notification Services
 export const notificationService = {
-  getNotifications: async () => {
-    const response = await api.get('/notifications/');
-    return response.data;
+  getNotifications: async (cursor?: string | null) => {
+    return getPage('/notifications/', cursor);
   },
   
   markAsRead: async (id: number) => {
@@ -174,6 +201,26 @@ export const notificationService = {
     const response = await api.post('/notifications/mark_all_as_read/');
     return response.data;
   },
+  
+  getUnreadCount: async () => {
+    const response = await api.get('/notifications/unread_count/');
+    return response.data.unread_count;
+  },
+  
+  // Notifications created after `since` (the cursor from the previous sync)
+  sync: async (since: number = 0) => {
+    const response = await api.get('/notifications/sync/', { params: { since } });
+    return response.data;
+  },
+  
+  // Server-sent events from the ASGI deployment; returns a function that closes the stream
+  subscribe: (onNotification: (notification: any) => void) => {
+    const source = new EventSource(`${API_URL}/notifications/stream/`, { withCredentials: true });
+    source.addEventListener('notification', (event) => {
+      onNotification(JSON.parse((event as MessageEvent).data));
+    });
+    return () => source.close();
+  },
 };
 
 export default api; 
\ No newline at end of file
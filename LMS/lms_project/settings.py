@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    'api.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -84,9 +86,45 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Take the write lock when a transaction starts, so transactions that
+        # read before writing wait on the busy timeout instead of failing
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Concurrency tests need a file-backed database: SQLite's in-memory
+        # shared cache fails fast with "table is locked" instead of waiting.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# Seconds staff dashboard totals may be served from cache; any Book or
+# BookIssue change invalidates them sooner
+DASHBOARD_STATS_CACHE_TIMEOUT = 30
+
+# Seconds a circulation report (/api/analytics/circulation/) is served from
+# cache. Reports scan the whole loan history, so they are not invalidated on
+# each change.
+CIRCULATION_REPORT_CACHE_TIMEOUT = 15 * 60
+
+# Cache alias and timeout (seconds) for serialized books and catalog pages.
+# Entries are retired by version bumps on every change, so the timeout only
+# bounds memory use. LocMemCache is per process: with several workers, point
+# this alias at a shared backend (Redis, Memcached) so bumps reach them all.
+BOOK_CACHE_ALIAS = 'default'
+BOOK_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -149,7 +187,47 @@ CSRF_COOKIE_SECURE = False  # Set to True in production with HTTPS
 # Session settings
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# cached_db serves sessions from CACHES and only falls back to the table on
+# a miss. 'django.contrib.sessions.backends.signed_cookies' removes the
+# session store entirely, at the cost of not being able to revoke a session
+# server-side before it expires.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Serves the per-request user lookup from CACHES and hashes login passwords
+# on a bounded thread pool (see api/backends.py and api/hashers.py).
+# ModelBackend is kept so sessions started through it stay logged in.
+AUTHENTICATION_BACKENDS = [
+    'api.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+USER_CACHE_TIMEOUT = 60
+
+# The first hasher hashes new passwords; the others only verify existing
+# hashes, which are rehashed with the first one on the next successful login.
+# Put TunableArgon2PasswordHasher first (pip install argon2-cffi) to switch to
+# Argon2id. Lowering the cost speeds up logins but weakens stored hashes.
+# Note a rehash changes the session auth hash, ending the user's other sessions.
+PASSWORD_HASHERS = [
+    'api.hashers.TunablePBKDF2PasswordHasher',
+    'api.hashers.TunableArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_PBKDF2_ITERATIONS = None  # None uses Django's default
+PASSWORD_ARGON2_PARAMS = {}  # e.g. {'time_cost': 2, 'memory_cost': 102400, 'parallelism': 8}
+
+# Concurrent hashes (None = one per CPU), how many more may queue, and how
+# long (seconds) a login waits for a queue slot before getting a 503
+PASSWORD_HASHING_WORKERS = None
+PASSWORD_HASHING_BACKLOG = 64
+PASSWORD_HASHING_TIMEOUT = 5
+
+# Stateless `Authorization: Bearer <token>` authentication for API clients.
+# When enabled, the login response includes a signed token valid for
+# SIGNED_TOKEN_MAX_AGE seconds; changing the password revokes it.
+SIGNED_TOKEN_AUTH = False
+SIGNED_TOKEN_MAX_AGE = 60 * 60 * 24
 
 # REST Framework settings
 REST_FRAMEWORK = {
@@ -159,6 +237,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 # Default primary key field type
@@ -168,3 +248,50 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Custom User model
 AUTH_USER_MODEL = 'api.User'
+
+# Loans
+# Most REQUESTED + ISSUED + OVERDUE loans a member may hold at once; None for
+# no limit. Checked against the counters on User (see reconcile_loan_counts).
+MEMBER_LOAN_LIMIT = None
+
+# Notifications
+# When True, staff-wide notifications are queued and expanded by
+# `python manage.py process_notification_queue --loop` instead of in the request.
+NOTIFICATION_QUEUE_FANOUT = False
+
+# Retention, enforced by `python manage.py purge_notifications --loop`: read
+# notifications older than NOTIFICATION_RETENTION_DAYS are removed, as is
+# anything beyond each user's newest NOTIFICATION_MAX_PER_USER (0 = no cap).
+# Removed rows are appended to gzip JSON-lines files in NOTIFICATION_ARCHIVE_DIR
+# (None deletes without archiving).
+NOTIFICATION_RETENTION_DAYS = 90
+NOTIFICATION_MAX_PER_USER = 1000
+NOTIFICATION_ARCHIVE_DIR = BASE_DIR / 'archive'
+
+# Pub/sub behind the /api/notifications/stream/ SSE endpoint (ASGI profile
+# only). InProcessPubSub only reaches streams in the same process; with
+# several workers use 'api.pubsub.RedisPubSub' and set NOTIFICATION_PUBSUB_URL.
+NOTIFICATION_PUBSUB_BACKEND = 'api.pubsub.InProcessPubSub'
+NOTIFICATION_PUBSUB_URL = None
+# Seconds between keepalive comments, and before a stream is closed so the
+# client reconnects (with Last-Event-ID) and is re-authenticated
+NOTIFICATION_STREAM_KEEPALIVE = 15
+NOTIFICATION_STREAM_TIMEOUT = 300
+
+# Request metrics (api/metrics.py): per-view histograms of wall time, query
+# count, database time and response size, served at /api/metrics/ in the
+# Prometheus text format to REQUEST_METRICS_ALLOWED_IPS and staff users.
+# Requests slower than REQUEST_METRICS_SLOW_MS (None to disable) are logged
+# with their SQL to the 'api.metrics' logger.
+REQUEST_METRICS = True
+REQUEST_METRICS_SLOW_MS = 500
+REQUEST_METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Serve the read-heavy endpoints from api/async_views.py. Only worth it under
+# ASGI; lms_project/asgi.py enables it through settings_asgi.py.
+ASYNC_READ_VIEWS = False
+
+# Book search
+# Dotted path to a api.search.BaseSearchBackend subclass; None picks SQLite
+# FTS5 or PostgreSQL full-text search from the database engine.
+BOOK_SEARCH_BACKEND = None
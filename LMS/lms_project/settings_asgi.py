@@ -0,0 +1,13 @@
+"""
+Settings for serving the project under ASGI, e.g.
+
+    uvicorn lms_project.asgi:application
+
+Read endpoints run as async views; everything else is the WSGI settings.
+Run one worker process unless NOTIFICATION_PUBSUB_BACKEND is RedisPubSub:
+InProcessPubSub only reaches notification streams in its own process.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+ASYNC_READ_VIEWS = True